@@ -1,20 +1,65 @@
 """API endpoints for the Grafana Copilot prototype.
 
 Endpoints implemented (minimal, prototype-ready):
+- GET /api/admin/sources (active sources snapshot, ETag/If-None-Match)
 - POST /api/admin/sources
+- POST /api/admin/sources/bulk (JSON array or NDJSON, upsert on url)
+- GET /api/admin/sources/all (keyset-paginated)
+- GET /api/admin/usage-events (keyset-paginated)
+- GET/POST /api/admin/usage-events/retention
+- GET /api/analytics (from per-minute/per-day rollups)
 - POST /api/query
+- POST /api/query/stream (SSE)
 - POST /api/telemetry
-- GET /api/health
-
-These handlers rely on the services in `backend/src/services` and fall back to
-in-memory behavior if DB or services are unavailable.
+- POST /api/telemetry/batch (JSON array or NDJSON)
+- GET /api/health (liveness), GET /api/ready (readiness), GET /api/health/db
+- GET /metrics (Prometheus text format)
+- GET/DELETE /api/admin/cache
+- GET /api/admin/index, POST /api/admin/index/rebuild, POST /api/admin/index/recrawl, GET /api/admin/index/search
+- GET /api/admin/http/pool
+- GET /api/admin/db/pool
+- GET /api/admin/agent/backend
+- GET /api/admin/telemetry/queue
+- GET /api/admin/query/coalescing
+- GET /api/admin/agent/executor
+- GET /api/admin/traces (recent spans, TRACING_EXPORTER=memory)
+- GET /api/admin/profiles, GET /api/admin/profiles/{request_id} (PROFILING_ENABLED)
+- POST /api/threads
+- GET /api/admin/threads/pool
+
+These handlers rely on the services in `backend/src/services`, which are
+imported once, with this module, and fall back to in-memory behavior if the
+DB is unavailable.
 """
 
-from fastapi import APIRouter, Header, HTTPException, status, Request
+from fastapi import APIRouter, Header, HTTPException, Query, status, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Any, List, Optional
 import os
 
+from backend.src import db, http_client
+from backend.src.metrics import collect
+from backend.src.observability import recent_traces, tracing_status
+from backend.src.profiling import get_profile, list_profiles, profiling_enabled
+from backend.src.services import analytics_service
+from backend.src.services.agent_backends import backend_status
+from backend.src.services.agent_executor import AgentOverloadedError, get_agent_executor
+from backend.src.services.cache_service import get_answer_cache, make_cache_key
+from backend.src.services.docs_index import get_docs_indexer
+from backend.src.services.foundry_threads import get_thread_pool
+from backend.src.services.query_service import create_thread, query_coalescing_stats, run_query, stream_query
+from backend.src.services.source_registry import get_source_registry
+from backend.src.services.sources_service import add_source, list_sources_page, upsert_sources, validate_source_url
+from backend.src.services.telemetry_service import (
+    get_telemetry_writer,
+    list_events_page,
+    normalize_event,
+    record_event,
+    record_events,
+)
+from backend.src.services.usage_retention import maintenance_status, run_maintenance
+
 router = APIRouter()
 
 
@@ -51,15 +96,68 @@ class ThreadCreateRequest(BaseModel):
     pseudo_user_id: Optional[str] = None
 
 
-@router.post("/api/admin/sources")
-async def post_admin_sources(payload: AdminSourceRequest, x_api_key: Optional[str] = Header(None)) -> Any:
+def _require_admin_key(x_api_key: Optional[str]) -> None:
     admin_key = os.environ.get("ADMIN_API_KEY")
     if admin_key and x_api_key != admin_key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
 
+
+async def _read_json_or_ndjson(request: Request, max_items: int) -> List[Any]:
+    """Parse a request body that is either a JSON array or newline-delimited JSON."""
+    import json
+
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    try:
+        # UnicodeDecodeError is a ValueError, so a non-UTF-8 body is a 400 as well
+        text = body.decode("utf-8")
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            items = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            items = json.loads(text)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON body: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array or NDJSON body")
+    if len(items) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {max_items} items per request",
+        )
+    return items
+
+
+@router.get("/api/admin/sources")
+async def get_admin_sources(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    x_api_key: Optional[str] = Header(None),
+) -> Any:
+    """Serve the worker's priority-ordered snapshot of active sources (no DB query).
+
+    Returns 304 when the client's `If-None-Match` matches the snapshot's ETag.
+    """
+    _require_admin_key(x_api_key)
+    registry = get_source_registry()
+    await registry.ensure_loaded()
+    etag = registry.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return {"version": registry.version, "sources": list(registry.snapshot())}
+
+
+@router.post("/api/admin/sources")
+async def post_admin_sources(payload: AdminSourceRequest, x_api_key: Optional[str] = Header(None)) -> Any:
+    _require_admin_key(x_api_key)
+    try:
+        payload.url = validate_source_url(payload.url)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Prefer using the sources_service if available
     try:
-        from backend.src.services.sources_service import add_source
         created = await add_source(payload)
         return created
     except Exception:
@@ -69,11 +167,229 @@ async def post_admin_sources(payload: AdminSourceRequest, x_api_key: Optional[st
         return {"id": str(uuid.uuid4()), "url": payload.url, "title": payload.title, "priority": payload.priority}
 
 
+@router.post("/api/admin/sources/bulk")
+async def post_admin_sources_bulk(request: Request, x_api_key: Optional[str] = Header(None)) -> dict:
+    """Upsert many sources on `url` in one statement and report the outcome of every row.
+
+    Invalid rows are reported by index as `rejected` and skipped.
+    """
+    _require_admin_key(x_api_key)
+    items = await _read_json_or_ndjson(request, int(os.environ.get("SOURCES_BULK_MAX_ITEMS", "5000")))
+
+    valid = []
+    results: List[Optional[dict]] = [None] * len(items)
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("source must be a JSON object")
+            src = AdminSourceRequest(**item)
+            valid.append((index, {"url": validate_source_url(src.url), "title": src.title, "priority": src.priority}))
+        except Exception as e:
+            results[index] = {"index": index, "status": "rejected", "error": str(e)}
+
+    outcomes = await upsert_sources([row for _, row in valid]) if valid else []
+    for (index, _), outcome in zip(valid, outcomes):
+        results[index] = {"index": index, **outcome}
+
+    counts = {"created": 0, "updated": 0, "superseded": 0, "rejected": 0}
+    for r in results:
+        counts[r["status"]] += 1
+    return {**counts, "results": results}
+
+
+@router.get("/api/admin/sources/all")
+async def get_admin_sources_all(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    active: Optional[bool] = None,
+    x_api_key: Optional[str] = Header(None),
+) -> dict:
+    """List sources by (priority, id), including inactive ones; pass `next_cursor` back as `cursor`."""
+    _require_admin_key(x_api_key)
+    try:
+        return await list_sources_page(limit, cursor=cursor, active=active)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/api/admin/usage-events")
+async def get_admin_usage_events(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    event_type: Optional[str] = None,
+    pseudo_user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    x_api_key: Optional[str] = Header(None),
+) -> dict:
+    """List usage events newest first, filtered by type/user and [since, until)."""
+    _require_admin_key(x_api_key)
+    try:
+        return await list_events_page(
+            limit, cursor=cursor, event_type=event_type, pseudo_user_id=pseudo_user_id, since=since, until=until
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/api/admin/usage-events/retention")
+async def get_admin_usage_events_retention(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Return retention settings and the result of the last partition maintenance run."""
+    _require_admin_key(x_api_key)
+    return maintenance_status()
+
+
+@router.post("/api/admin/usage-events/retention")
+async def post_admin_usage_events_retention(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Create upcoming partitions and drop expired ones now."""
+    _require_admin_key(x_api_key)
+    return await run_maintenance()
+
+
+@router.get("/api/analytics")
+async def get_analytics(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    granularity: str = "auto",
+    event_type: Optional[str] = None,
+    top: int = Query(10, ge=0, le=100),
+    x_api_key: Optional[str] = Header(None),
+) -> dict:
+    """Event counts by type, fallback rate, confidence histogram and top query hashes over [since, until)."""
+    _require_admin_key(x_api_key)
+    try:
+        return await analytics_service.get_analytics(since, until, granularity=granularity, event_type=event_type, top=top)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """Prometheus scrape endpoint (all workers when METRICS_DIR is set)."""
+    return PlainTextResponse(await collect(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/api/admin/cache")
+async def get_admin_cache(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Return answer cache hit/miss/eviction counters."""
+    _require_admin_key(x_api_key)
+    return get_answer_cache().stats()
+
+
+@router.delete("/api/admin/cache")
+async def delete_admin_cache(
+    query: Optional[str] = None,
+    section_id: Optional[str] = None,
+    x_api_key: Optional[str] = Header(None),
+) -> dict:
+    """Invalidate one cached answer (when `query` is given) or the whole cache."""
+    _require_admin_key(x_api_key)
+    key = None
+    if query is not None:
+        key = make_cache_key({"query": query, "page_context": {"sectionId": section_id} if section_id else None})
+    removed = await get_answer_cache().invalidate(key)
+    return {"status": "invalidated", "removed": removed}
+
+
+@router.get("/api/admin/index")
+async def get_admin_index(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Return local docs index size, last build summary and search latency."""
+    _require_admin_key(x_api_key)
+    return get_docs_indexer().stats()
+
+
+@router.post("/api/admin/index/rebuild")
+async def post_admin_index_rebuild(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Fetch and re-index all active sources now; updates `last_indexed`."""
+    _require_admin_key(x_api_key)
+    return await get_docs_indexer().build()
+
+
+@router.post("/api/admin/index/recrawl")
+async def post_admin_index_recrawl(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Re-crawl active sources with conditional requests; only changed pages are re-indexed."""
+    _require_admin_key(x_api_key)
+    return await get_docs_indexer().recrawl()
+
+
+@router.get("/api/admin/index/search")
+async def get_admin_index_search(q: str, k: int = Query(3, ge=1, le=50), x_api_key: Optional[str] = Header(None)) -> dict:
+    """Debug view of the passages `/api/query` would ground on."""
+    _require_admin_key(x_api_key)
+    return {"query": q, "hits": get_docs_indexer().search(q, k)}
+
+
+@router.get("/api/admin/http/pool")
+async def get_admin_http_pool(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Return connection pool usage/saturation of the shared agent HTTP client."""
+    _require_admin_key(x_api_key)
+    return http_client.pool_stats()
+
+
+@router.get("/api/admin/db/pool")
+async def get_admin_db_pool(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Return DB pool settings, in-use/overflow counts and checkout latency."""
+    _require_admin_key(x_api_key)
+    return db.pool_stats()
+
+
+@router.get("/api/admin/agent/backend")
+async def get_admin_agent_backend(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Report which agent backend is active and why others were skipped."""
+    _require_admin_key(x_api_key)
+    return backend_status()
+
+
+@router.get("/api/admin/query/coalescing")
+async def get_admin_query_coalescing(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Return single-flight counters: shared agent runs, waiters and coalescing ratio."""
+    _require_admin_key(x_api_key)
+    return query_coalescing_stats()
+
+
+@router.get("/api/admin/agent/executor")
+async def get_admin_agent_executor(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Return agent pool concurrency, queue depth, wait times and rejections."""
+    _require_admin_key(x_api_key)
+    return get_agent_executor().stats()
+
+
+@router.get("/api/admin/traces")
+async def get_admin_traces(limit: int = Query(20, ge=1, le=200), x_api_key: Optional[str] = Header(None)) -> dict:
+    """Return recent traces from the in-memory span exporter (TRACING_EXPORTER=memory)."""
+    _require_admin_key(x_api_key)
+    return {"tracing": tracing_status(), "traces": recent_traces(limit)}
+
+
+@router.get("/api/admin/profiles")
+async def get_admin_profiles(x_api_key: Optional[str] = Header(None)) -> dict:
+    """List stored request profiles (newest first), without their stacks."""
+    _require_admin_key(x_api_key)
+    return {"enabled": profiling_enabled(), "profiles": list_profiles()}
+
+
+@router.get("/api/admin/profiles/{request_id}")
+async def get_admin_profile(
+    request_id: str,
+    format: str = Query("folded"),
+    x_api_key: Optional[str] = Header(None),
+) -> Any:
+    """Return one request's profile as folded stacks (flamegraph.pl / speedscope input) or as JSON."""
+    _require_admin_key(x_api_key)
+    if format not in ("folded", "json"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="format must be folded or json")
+    profile = get_profile(request_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    if format == "json":
+        return profile
+    return PlainTextResponse(profile["folded"])
+
+
 @router.post("/api/query", response_model=QueryResponse)
 async def post_query(payload: QueryRequest) -> QueryResponse:
     # Run query via service (stubbed if STUB_MODE=true)
     try:
-        from backend.src.services.query_service import run_query
         try:
             payload_data = payload.model_dump()
         except Exception:
@@ -82,30 +398,141 @@ async def post_query(payload: QueryRequest) -> QueryResponse:
         res = await run_query(payload_data)
         # Minimal validation happens via response_model
         return QueryResponse(**res)
+    except AgentOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         # If something is misconfigured, expose a clear error in prototype
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/api/query/stream")
+async def post_query_stream(payload: QueryRequest) -> StreamingResponse:
+    """Stream the answer as Server-Sent Events.
+
+    Emits `event: token` frames with `{"text": ...}` as the agent produces
+    output, then a single `event: final` frame with the answer, citations,
+    confidence and fallback flag (or `event: error` on failure).
+    """
+    try:
+        payload_data = payload.model_dump()
+    except Exception:
+        # Fallback for Pydantic v1 compatibility
+        payload_data = payload.dict()
+
+    frames = stream_query(payload_data)
+    try:
+        # Pull the first frame eagerly so overload can still become a 503
+        first = await frames.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except AgentOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    def to_sse(frame: dict) -> str:
+        import json
+
+        kind = frame.pop("type")
+        return f"event: {kind}\ndata: {json.dumps(frame)}\n\n"
+
+    async def event_source():
+        if first is None:
+            return
+        yield to_sse(first)
+        async for frame in frames:
+            yield to_sse(frame)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/api/telemetry")
 async def post_telemetry(payload: dict) -> dict:
+    """Record one usage event; 400 if it does not validate as a `UsageEvent`."""
+    try:
+        event = normalize_event(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     # Try to record telemetry via telemetry_service, fall back to console log
     try:
-        from backend.src.services.telemetry_service import record_event
-        await record_event(payload)
-        return {"status": "accepted"}
+        accepted = await record_event(event)
+        return {"status": "accepted" if accepted else "dropped"}
     except Exception:
         import logging
 
-        logging.info("Telemetry event (console): %s", payload)
+        logging.info("Telemetry event (console): %s", event)
         return {"status": "accepted"}
 
 
+@router.post("/api/telemetry/batch")
+async def post_telemetry_batch(request: Request) -> dict:
+    """Accept many usage events at once and persist them in a single round trip.
+
+    Each item is validated against `UsageEvent`; invalid items are reported by
+    index and skipped, the rest are recorded together.
+    """
+    items = await _read_json_or_ndjson(request, int(os.environ.get("TELEMETRY_BATCH_MAX_EVENTS", "1000")))
+
+    events = []
+    rejected = []
+    for index, item in enumerate(items):
+        try:
+            events.append(normalize_event(item))
+        except Exception as e:
+            rejected.append({"index": index, "error": str(e)})
+
+    accepted = await record_events(events) if events else 0
+    return {"accepted": accepted, "dropped": len(events) - accepted, "rejected": rejected}
+
+
+@router.get("/api/admin/telemetry/queue")
+async def get_admin_telemetry_queue(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Return queue depth, drop and flush counters of the background telemetry writer."""
+    _require_admin_key(x_api_key)
+    return get_telemetry_writer().stats()
+
+
 @router.get("/api/health")
 async def health() -> dict:
     return {"status": "ok"}
 
 
+@router.get("/api/ready")
+async def ready(request: Request, response: Response) -> dict:
+    """Readiness: 503 until the lifespan has created shared resources, and again once shutdown starts."""
+    state = request.app.state.startup
+    if state is None or not state.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return state.as_dict() if state is not None else {"status": "starting"}
+
+
+@router.get("/api/health/db")
+async def health_db(request: Request) -> dict:
+    """Return the DB initialization status recorded during startup.
+
+    Example return:
+      {"db_init": {"sources": "created", "usage_events": "already_existed"},
+       "startup": {"status": "ok", "configured": true, "ms": 41.2}}
+
+    `db_init` is null when DATABASE_URL is not set or the DB step failed.
+    """
+    state = request.app.state.startup
+    return {
+        "db_init": getattr(request.app.state, "db_init_status", None),
+        "startup": state.steps.get("db") if state is not None else None,
+    }
+
+
 @router.post("/api/threads")
 async def post_create_thread(payload: ThreadCreateRequest) -> Any:
     """Create a Foundry thread and return its id.
@@ -114,22 +541,20 @@ async def post_create_thread(payload: ThreadCreateRequest) -> Any:
     in subsequent `/api/query` requests.
     """
     try:
-        from backend.src.services.query_service import create_thread
-
         res = await create_thread(payload.pseudo_user_id)
         return res
+    except AgentOverloadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# @router.get("/api/health/db")
-# async def health_db(request: Request) -> dict:
-#     """Return DB initialization status set during startup.
-
-#     Example return:
-#       {"db_init": {"sources": "created", "usage_events": "already_existed"}}
-#     """
-#     status_info = getattr(request.app.state, "db_init_status", None)
-#     if status_info is None:
-#         return {"db": "unknown", "tables": None}
-#     return {"db_init": status_info}
+@router.get("/api/admin/threads/pool")
+async def get_admin_threads_pool(x_api_key: Optional[str] = Header(None)) -> dict:
+    """Return pre-warmed thread pool size and hit rate."""
+    _require_admin_key(x_api_key)
+    return get_thread_pool().stats()
@@ -8,27 +8,58 @@ from typing import Optional, List, Dict, Any
 
 
 async def create_source(url: str, title: Optional[str] = None, priority: int = 100) -> Dict[str, Any]:
+    """Create a source, or update title/priority of the existing source with the same URL."""
+    results = await upsert_sources_bulk([{"url": url, "title": title, "priority": priority}])
+    return results[0]["source"]
+
+
+async def upsert_sources_bulk(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Upsert sources on `url` with one INSERT ... ON CONFLICT statement.
+
+    `rows` must have unique URLs (ON CONFLICT cannot touch one row twice).
+    Returns `{"status": "created" | "updated", "source": {...}}` per input row, in order.
+    """
+    if not rows:
+        return []
     from backend.src.db import get_sessionmaker
 
     SessionLocal = get_sessionmaker()
     if not SessionLocal:
         raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
 
-    from backend.src.db.models import Source as ORMSource
-
     async with SessionLocal() as session:
-        src = ORMSource(url=url, title=title, priority=priority)
-        session.add(src)
+        result = await session.execute(_upsert_sources_stmt(rows))
+        returned = {r.url: r for r in result.all()}
         await session.commit()
-        await session.refresh(src)
-        return {
-            "id": str(src.id),
-            "url": src.url,
-            "title": src.title,
-            "priority": src.priority,
-            "last_indexed": None,
-            "active": src.active,
-        }
+    return [
+        {"status": "created" if returned[r["url"]].inserted else "updated", "source": _source_dict(returned[r["url"]])}
+        for r in rows
+    ]
+
+
+def _upsert_sources_stmt(rows: List[Dict[str, Any]]):
+    from sqlalchemy import literal_column
+    from sqlalchemy.dialects.postgresql import insert
+    from backend.src.db.models import Source as ORMSource
+
+    values = [
+        {"url": r["url"], "title": r.get("title"), "priority": 100 if r.get("priority") is None else r["priority"], "active": True}
+        for r in rows
+    ]
+    stmt = insert(ORMSource).values(values)
+    return stmt.on_conflict_do_update(
+        index_elements=[ORMSource.url],
+        set_={"title": stmt.excluded.title, "priority": stmt.excluded.priority, "active": stmt.excluded.active},
+    ).returning(
+        ORMSource.id,
+        ORMSource.url,
+        ORMSource.title,
+        ORMSource.priority,
+        ORMSource.last_indexed,
+        ORMSource.active,
+        # xmax is 0 only for rows this statement inserted
+        literal_column("(xmax = 0)").label("inserted"),
+    )
 
 
 async def get_source_by_id(source_id: str) -> Optional[Dict[str, Any]]:
@@ -87,6 +118,67 @@ async def list_sources_db(limit: int = 100) -> List[Dict[str, Any]]:
         ]
 
 
+async def list_active_sources() -> List[Dict[str, Any]]:
+    """All active sources ordered by (priority, id), for the in-process source registry."""
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from backend.src.db.models import Source as ORMSource
+    from sqlalchemy import select
+
+    async with SessionLocal() as session:
+        result = await session.execute(
+            select(ORMSource).where(ORMSource.active.is_(True)).order_by(ORMSource.priority, ORMSource.id)
+        )
+        return [_source_dict(r) for r in result.scalars().all()]
+
+
+def _source_dict(r) -> Dict[str, Any]:
+    return {
+        "id": str(r.id),
+        "url": r.url,
+        "title": r.title,
+        "priority": r.priority,
+        "last_indexed": r.last_indexed.isoformat() if r.last_indexed else None,
+        "active": r.active,
+    }
+
+
+def _sources_page_stmt(limit: int, after: Optional[list] = None, active: Optional[bool] = None):
+    """Keyset query ordered by (priority, id); served by ix_sources_priority_id."""
+    import uuid
+    from sqlalchemy import select, tuple_
+    from backend.src.db.models import Source as ORMSource
+
+    stmt = select(ORMSource)
+    if active is not None:
+        stmt = stmt.where(ORMSource.active == active)
+    if after is not None:
+        stmt = stmt.where(tuple_(ORMSource.priority, ORMSource.id) > tuple_(int(after[0]), uuid.UUID(str(after[1]))))
+    return stmt.order_by(ORMSource.priority, ORMSource.id).limit(limit + 1)
+
+
+async def list_sources_page(
+    limit: int = 100, after: Optional[list] = None, active: Optional[bool] = None
+) -> Dict[str, Any]:
+    """One page of sources after the (priority, id) key `after`; see `backend.src.pagination`."""
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from backend.src.pagination import build_page
+
+    async with SessionLocal() as session:
+        result = await session.execute(_sources_page_stmt(limit, after=after, active=active))
+        rows = [_source_dict(r) for r in result.scalars().all()]
+    return build_page(rows, limit, lambda r: [r["priority"], r["id"]])
+
+
 async def update_source(source_id: str, **updates) -> Optional[Dict[str, Any]]:
     from backend.src.db import get_sessionmaker
 
@@ -122,6 +214,26 @@ async def update_source(source_id: str, **updates) -> Optional[Dict[str, Any]]:
         }
 
 
+async def mark_sources_indexed(source_ids: List[str], when) -> None:
+    """Set `last_indexed` for many sources with one UPDATE."""
+    if not source_ids:
+        return
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    import uuid
+    from sqlalchemy import update
+    from backend.src.db.models import Source as ORMSource
+
+    ids = [uuid.UUID(i) for i in source_ids]
+    async with SessionLocal() as session:
+        await session.execute(update(ORMSource).where(ORMSource.id.in_(ids)).values(last_indexed=when))
+        await session.commit()
+
+
 async def delete_source(source_id: str) -> bool:
     from backend.src.db import get_sessionmaker
 
@@ -145,25 +257,180 @@ async def delete_source(source_id: str) -> bool:
 
 
 # Usage events CRUD
-async def create_usage_event(event: dict) -> Dict[str, Any]:
+def _usage_event_row(event: dict) -> Dict[str, Any]:
+    row = {
+        "pseudo_user_id": event.get("pseudo_user_id"),
+        "event_type": event.get("event_type") or event.get("event", "event"),
+        "query_hash": event.get("query_hash"),
+        "confidence": event.get("confidence"),
+        "citations": event.get("citations"),
+        "anchors": event.get("anchors"),
+        "metadata": event.get("payload") or event.get("metadata"),
+    }
+    if event.get("event_time") is not None:
+        row["event_time"] = event["event_time"]
+    return row
+
+
+async def create_usage_events_bulk(events: List[dict], rollups=None) -> int:
+    """Insert many usage events with one multi-row INSERT (no per-row refresh).
+
+    `rollups` (an `analytics_service.RollupDelta`) is added to the analytics
+    rollup tables in the same transaction.
+    """
+    if not events:
+        return 0
     from backend.src.db import get_sessionmaker
 
     SessionLocal = get_sessionmaker()
     if not SessionLocal:
         raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
 
+    async with SessionLocal() as session:
+        await session.execute(_usage_events_insert_stmt(events))
+        if rollups:
+            for stmt in _usage_rollup_stmts(rollups):
+                await session.execute(stmt)
+        await session.commit()
+    return len(events)
+
+
+def _usage_events_insert_stmt(events: List[dict]):
+    from sqlalchemy import insert
     from backend.src.db.models import UsageEvent as ORMUsageEvent
 
+    rows = [_usage_event_row(e) for e in events]
+    # A multi-row VALUES list needs the same keys on every row
+    if any("event_time" in r for r in rows):
+        import datetime
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for r in rows:
+            r.setdefault("event_time", now)
+    return insert(ORMUsageEvent).values(rows)
+
+
+def _usage_rollup_stmts(rollups) -> list:
+    """Additive upserts adding one batch's rollup increments."""
+    from sqlalchemy import text
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from backend.src.db.models import UsageQueryRollup, UsageRollup
+
+    stmt = pg_insert(UsageRollup).values(rollups.rows())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UsageRollup.bucket_size, UsageRollup.bucket_start, UsageRollup.event_type],
+        set_={
+            "events": UsageRollup.events + stmt.excluded.events,
+            "fallbacks": UsageRollup.fallbacks + stmt.excluded.fallbacks,
+            "confidence_count": UsageRollup.confidence_count + stmt.excluded.confidence_count,
+            "confidence_sum": UsageRollup.confidence_sum + stmt.excluded.confidence_sum,
+            # Element-wise sum of the two histograms
+            "confidence_hist": text(
+                "ARRAY(SELECT t.a + t.b FROM unnest(usage_rollups.confidence_hist, excluded.confidence_hist) "
+                "WITH ORDINALITY AS t(a, b, i) ORDER BY t.i)"
+            ),
+        },
+    )
+    stmts = [stmt]
+
+    query_rows = rollups.query_rows()
+    if query_rows:
+        stmt = pg_insert(UsageQueryRollup).values(query_rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UsageQueryRollup.bucket_start, UsageQueryRollup.query_hash],
+            set_={"events": UsageQueryRollup.events + stmt.excluded.events},
+        )
+        stmts.append(stmt)
+    return stmts
+
+
+async def query_usage_rollups(bucket_size: str, since, until, event_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Rollup rows of one bucket size in [since, until) (a primary-key range scan)."""
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from sqlalchemy import select
+    from backend.src.db.models import UsageRollup
+
+    stmt = select(UsageRollup).where(
+        UsageRollup.bucket_size == bucket_size,
+        UsageRollup.bucket_start >= since,
+        UsageRollup.bucket_start < until,
+    )
+    if event_type is not None:
+        stmt = stmt.where(UsageRollup.event_type == event_type)
+    async with SessionLocal() as session:
+        result = await session.execute(stmt)
+        return [
+            {
+                "bucket_start": r.bucket_start,
+                "event_type": r.event_type,
+                "events": r.events,
+                "fallbacks": r.fallbacks,
+                "confidence_count": r.confidence_count,
+                "confidence_sum": r.confidence_sum,
+                "confidence_hist": list(r.confidence_hist or []),
+            }
+            for r in result.scalars().all()
+        ]
+
+
+async def top_query_hashes(since, until, limit: int = 10) -> List[tuple]:
+    """(query_hash, events) pairs with the most events over the per-day query rollups."""
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from sqlalchemy import func, select
+    from backend.src.db.models import UsageQueryRollup
+
+    total = func.sum(UsageQueryRollup.events).label("events")
+    stmt = (
+        select(UsageQueryRollup.query_hash, total)
+        .where(UsageQueryRollup.bucket_start >= since, UsageQueryRollup.bucket_start < until)
+        .group_by(UsageQueryRollup.query_hash)
+        .order_by(total.desc(), UsageQueryRollup.query_hash)
+        .limit(limit)
+    )
+    async with SessionLocal() as session:
+        result = await session.execute(stmt)
+        return [(h, int(n)) for h, n in result.all()]
+
+
+async def delete_usage_rollups_before(bucket_size: str, before) -> int:
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from sqlalchemy import delete
+    from backend.src.db.models import UsageRollup
+
     async with SessionLocal() as session:
-        ue = ORMUsageEvent(
-            pseudo_user_id=event.get("pseudo_user_id"),
-            event_type=event.get("event", "event"),
-            query_hash=event.get("query_hash"),
-            confidence=event.get("confidence"),
-            citations=event.get("citations"),
-            anchors=event.get("anchors"),
-            metadata=event.get("payload") or event.get("metadata"),
+        result = await session.execute(
+            delete(UsageRollup).where(UsageRollup.bucket_size == bucket_size, UsageRollup.bucket_start < before)
         )
+        await session.commit()
+        return result.rowcount or 0
+
+
+async def create_usage_event(event: dict) -> Dict[str, Any]:
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from backend.src.db.models import UsageEvent as ORMUsageEvent
+
+    async with SessionLocal() as session:
+        ue = ORMUsageEvent(**_usage_event_row(event))
         session.add(ue)
         await session.commit()
         await session.refresh(ue)
@@ -201,6 +468,76 @@ async def list_usage_events(limit: int = 100) -> List[Dict[str, Any]]:
         ]
 
 
+def _usage_event_dict(r) -> Dict[str, Any]:
+    return {
+        "id": str(r.id),
+        "pseudo_user_id": r.pseudo_user_id,
+        "event_time": r.event_time.isoformat() if r.event_time else None,
+        "event_type": r.event_type,
+        "metadata": r.metadata,
+    }
+
+
+def _usage_events_page_stmt(
+    limit: int,
+    after: Optional[list] = None,
+    event_type: Optional[str] = None,
+    pseudo_user_id: Optional[str] = None,
+    since=None,
+    until=None,
+):
+    """Keyset query ordered by (event_time, id) DESC.
+
+    Each filter combination has a matching composite index (see `models.UsageEvent`),
+    so a page is an index seek plus `limit` rows, however deep the cursor is.
+    """
+    import uuid
+    from sqlalchemy import select, tuple_
+    from backend.src.db.models import UsageEvent as ORMUsageEvent
+    from backend.src.pagination import parse_time
+
+    stmt = select(ORMUsageEvent)
+    if event_type is not None:
+        stmt = stmt.where(ORMUsageEvent.event_type == event_type)
+    if pseudo_user_id is not None:
+        stmt = stmt.where(ORMUsageEvent.pseudo_user_id == pseudo_user_id)
+    if since is not None:
+        stmt = stmt.where(ORMUsageEvent.event_time >= parse_time(since))
+    if until is not None:
+        stmt = stmt.where(ORMUsageEvent.event_time < parse_time(until))
+    if after is not None:
+        stmt = stmt.where(
+            tuple_(ORMUsageEvent.event_time, ORMUsageEvent.id) < tuple_(parse_time(after[0]), uuid.UUID(str(after[1])))
+        )
+    return stmt.order_by(ORMUsageEvent.event_time.desc(), ORMUsageEvent.id.desc()).limit(limit + 1)
+
+
+async def list_usage_events_page(
+    limit: int = 100,
+    after: Optional[list] = None,
+    event_type: Optional[str] = None,
+    pseudo_user_id: Optional[str] = None,
+    since=None,
+    until=None,
+) -> Dict[str, Any]:
+    """One page of usage events, newest first, after the (event_time, id) key `after`."""
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from backend.src.pagination import build_page
+
+    stmt = _usage_events_page_stmt(
+        limit, after=after, event_type=event_type, pseudo_user_id=pseudo_user_id, since=since, until=until
+    )
+    async with SessionLocal() as session:
+        result = await session.execute(stmt)
+        rows = [_usage_event_dict(r) for r in result.scalars().all()]
+    return build_page(rows, limit, lambda r: [r["event_time"], r["id"]])
+
+
 async def delete_usage_event(event_id: str) -> bool:
     from backend.src.db import get_sessionmaker
     import uuid
@@ -220,3 +557,97 @@ async def delete_usage_event(event_id: str) -> bool:
         await session.execute(delete(ORMUsageEvent).where(ORMUsageEvent.id == pk))
         await session.commit()
         return True
+
+
+async def truncate_usage_events() -> None:
+    """Remove every usage event and its analytics rollups in one statement, regardless of table size."""
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from sqlalchemy import text
+
+    async with SessionLocal() as session:
+        await session.execute(text("TRUNCATE TABLE usage_events, usage_rollups, usage_query_rollups"))
+        await session.commit()
+
+
+# Answer cache (shared tier)
+async def get_cached_answer(key: str) -> Optional[Dict[str, Any]]:
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from backend.src.db.models import AnswerCacheEntry
+    from sqlalchemy import select, func
+
+    async with SessionLocal() as session:
+        result = await session.execute(
+            select(AnswerCacheEntry.response).where(
+                AnswerCacheEntry.key == key, AnswerCacheEntry.expires_at > func.now()
+            )
+        )
+        return result.scalar_one_or_none()
+
+
+async def put_cached_answer(key: str, response: Dict[str, Any], ttl_seconds: float = 3600.0) -> None:
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    async with SessionLocal() as session:
+        await session.execute(_put_cached_answer_stmt(key, response, ttl_seconds))
+        await session.commit()
+
+
+def _put_cached_answer_stmt(key: str, response: Dict[str, Any], ttl_seconds: float):
+    import datetime
+    from sqlalchemy.dialects.postgresql import insert
+    from backend.src.db.models import AnswerCacheEntry
+
+    expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=ttl_seconds)
+    stmt = insert(AnswerCacheEntry).values(key=key, response=response, expires_at=expires_at)
+    return stmt.on_conflict_do_update(
+        index_elements=[AnswerCacheEntry.key],
+        set_={"response": stmt.excluded.response, "expires_at": stmt.excluded.expires_at},
+    )
+
+
+async def delete_cached_answers(key: Optional[str] = None) -> None:
+    """Delete one cached answer, or all of them when `key` is None."""
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from sqlalchemy import delete
+    from backend.src.db.models import AnswerCacheEntry
+
+    stmt = delete(AnswerCacheEntry)
+    if key is not None:
+        stmt = stmt.where(AnswerCacheEntry.key == key)
+    async with SessionLocal() as session:
+        await session.execute(stmt)
+        await session.commit()
+
+
+async def purge_expired_cached_answers() -> None:
+    from backend.src.db import get_sessionmaker
+
+    SessionLocal = get_sessionmaker()
+    if not SessionLocal:
+        raise RuntimeError("DATABASE_URL not configured for DB-backed persistence")
+
+    from sqlalchemy import delete, func
+    from backend.src.db.models import AnswerCacheEntry
+
+    async with SessionLocal() as session:
+        await session.execute(delete(AnswerCacheEntry).where(AnswerCacheEntry.expires_at <= func.now()))
+        await session.commit()
@@ -2,13 +2,15 @@
 
 - `Source` table mirrors `data-model.md` `sources`
 - `UsageEvent` table mirrors `data-model.md` `usage_events`
+- `AnswerCacheEntry` backs the shared tier of the answer cache
+- `UsageRollup` / `UsageQueryRollup` hold the analytics rollups of `usage_events`
 
 These are the canonical DB models used by Alembic and SQLAlchemy.
 """
 
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, Text, Boolean, DateTime, Float
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy import BigInteger, Column, Index, Integer, Text, Boolean, DateTime, Float
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, JSONB
 from sqlalchemy.sql import func, text
 
 Base = declarative_base()
@@ -16,6 +18,12 @@ Base = declarative_base()
 
 class Source(Base):
     __tablename__ = "sources"
+    __table_args__ = (
+        # Keyset pagination order for the admin listing
+        Index("ix_sources_priority_id", "priority", "id"),
+        # Upsert target for POST /api/admin/sources[/bulk]
+        Index("ux_sources_url", "url", unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     url = Column(Text, nullable=False)
@@ -27,13 +35,56 @@ class Source(Base):
 
 class UsageEvent(Base):
     __tablename__ = "usage_events"
+    __table_args__ = (
+        # Keyset pagination (event_time DESC, id DESC), unfiltered and per filter;
+        # btree indexes are scanned backwards for the DESC order
+        Index("ix_usage_events_event_time_id", "event_time", "id"),
+        Index("ix_usage_events_type_time_id", "event_type", "event_time", "id"),
+        Index("ix_usage_events_user_time_id", "pseudo_user_id", "event_time", "id"),
+        # Monthly range partitions are managed by services/usage_retention.py
+        {"postgresql_partition_by": "RANGE (event_time)"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
     pseudo_user_id = Column(Text, nullable=True)
-    event_time = Column(DateTime(timezone=True), server_default=func.now())
+    # Part of the primary key because it is the partition key
+    event_time = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     event_type = Column(Text, nullable=False)
     query_hash = Column(Text, nullable=True)
     confidence = Column(Float, nullable=True)
     citations = Column(JSONB, nullable=True)
     anchors = Column(JSONB, nullable=True)
     metadata = Column(JSONB, nullable=True)
+
+
+class UsageRollup(Base):
+    """Per-minute / per-day counters of usage_events, maintained as events are written."""
+
+    __tablename__ = "usage_rollups"
+
+    bucket_size = Column(Text, primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    event_type = Column(Text, primary_key=True)
+    events = Column(BigInteger, nullable=False, default=0)
+    fallbacks = Column(BigInteger, nullable=False, default=0)
+    confidence_count = Column(BigInteger, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    # CONFIDENCE_BINS equal-width bins over [0, 1]
+    confidence_hist = Column(ARRAY(BigInteger), nullable=False)
+
+
+class UsageQueryRollup(Base):
+    __tablename__ = "usage_query_rollups"
+
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    query_hash = Column(Text, primary_key=True)
+    events = Column(BigInteger, nullable=False, default=0)
+
+
+class AnswerCacheEntry(Base):
+    __tablename__ = "answer_cache"
+
+    key = Column(Text, primary_key=True)
+    response = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
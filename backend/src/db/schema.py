@@ -0,0 +1,76 @@
+"""DDL that `Base.metadata.create_all()` does not emit.
+
+The models describe the tables and their indexes (including `ux_sources_url`
+and the `PARTITION BY RANGE (event_time)` clause of `usage_events`). On top of
+that the schema needs:
+
+- the `sources_changed` NOTIFY triggers, which every worker LISTENs to
+  (`services/source_registry.py`);
+- the DEFAULT partition of `usage_events`, plus the current month's and
+  USAGE_EVENTS_PARTITIONS_AHEAD future monthly partitions
+  (`services/usage_retention.py` keeps creating them afterwards).
+
+Partitions are only created when `usage_events` is actually partitioned; an
+existing non-partitioned table is left as is.
+"""
+
+import datetime
+from typing import List, Optional
+
+# One NOTIFY per statement that changes sources. The payload is the operation,
+# or "INDEXED" for statements that only set `last_indexed` (every crawl does),
+# so workers can refresh their snapshot without clearing their answer cache.
+SOURCES_NOTIFY_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION notify_sources_changed() RETURNS trigger AS $$
+    BEGIN
+      PERFORM pg_notify('sources_changed', COALESCE(TG_ARGV[0], TG_OP));
+      RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS sources_changed ON sources",
+    "DROP TRIGGER IF EXISTS sources_changed_update ON sources",
+    "DROP TRIGGER IF EXISTS sources_indexed ON sources",
+    """
+    CREATE TRIGGER sources_changed
+      AFTER INSERT OR DELETE OR TRUNCATE ON sources
+      FOR EACH STATEMENT EXECUTE FUNCTION notify_sources_changed()
+    """,
+    """
+    CREATE TRIGGER sources_changed_update
+      AFTER UPDATE OF url, title, priority, active ON sources
+      FOR EACH STATEMENT EXECUTE FUNCTION notify_sources_changed('UPDATE')
+    """,
+    """
+    CREATE TRIGGER sources_indexed
+      AFTER UPDATE OF last_indexed ON sources
+      FOR EACH STATEMENT EXECUTE FUNCTION notify_sources_changed('INDEXED')
+    """,
+]
+
+USAGE_EVENTS_DEFAULT_PARTITION_DDL = "CREATE TABLE IF NOT EXISTS usage_events_default PARTITION OF usage_events DEFAULT"
+
+USAGE_EVENTS_RELKIND_SQL = "SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass('usage_events')"
+
+
+def extra_ddl(usage_events_partitioned: bool, now: Optional[datetime.datetime] = None) -> List[str]:
+    """Statements to run, one at a time, after the tables exist."""
+    from backend.src.services.usage_retention import upcoming_partitions_ddl
+
+    statements = list(SOURCES_NOTIFY_DDL)
+    if usage_events_partitioned:
+        statements.append(USAGE_EVENTS_DEFAULT_PARTITION_DDL)
+        statements.extend(upcoming_partitions_ddl(now))
+    return statements
+
+
+async def apply_extra_ddl(conn) -> List[str]:
+    """Run `extra_ddl` on a SQLAlchemy async connection; returns the statements run."""
+    from sqlalchemy import text
+
+    partitioned = (await conn.scalar(text(USAGE_EVENTS_RELKIND_SQL))) == "p"
+    statements = extra_ddl(partitioned)
+    for statement in statements:
+        await conn.execute(text(statement))
+    return statements
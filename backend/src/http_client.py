@@ -0,0 +1,121 @@
+"""Shared HTTP client helper: one pooled `httpx.AsyncClient` for outbound agent calls.
+
+The client is created once in the app lifespan (`init_http_client`) and closed
+on shutdown (`close_http_client`), so REST calls to AI_FOUNDRY_ENDPOINT reuse
+keep-alive connections instead of paying a TCP+TLS handshake per query.
+`get_http_client()` creates the client lazily when the lifespan did not run
+(e.g. scripts or a TestClient used without a `with` block).
+
+Settings (environment variables):
+- AGENT_HTTP_MAX_CONNECTIONS (default 100)
+- AGENT_HTTP_MAX_KEEPALIVE (default 20)
+- AGENT_HTTP_KEEPALIVE_EXPIRY seconds (default 30)
+- AGENT_HTTP_HTTP2 (default false; needs the `h2` package)
+- AGENT_HTTP_CONNECT_TIMEOUT / AGENT_HTTP_READ_TIMEOUT / AGENT_HTTP_WRITE_TIMEOUT /
+  AGENT_HTTP_POOL_TIMEOUT seconds (defaults 5 / 60 / 30 / 5)
+"""
+
+import contextlib
+import importlib.util
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_http_client = None
+_max_connections = 0
+_stats = {"requests_total": 0, "in_flight": 0, "peak_in_flight": 0, "pool_timeouts": 0, "errors": 0}
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.environ.get(name, default))
+
+
+def _build_client():
+    try:
+        import httpx
+    except Exception:
+        raise RuntimeError("httpx is required for non-stub REST requests. Install with: pip install httpx")
+
+    global _max_connections
+    _max_connections = int(os.environ.get("AGENT_HTTP_MAX_CONNECTIONS", "100"))
+    limits = httpx.Limits(
+        max_connections=_max_connections,
+        max_keepalive_connections=int(os.environ.get("AGENT_HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=_env_float("AGENT_HTTP_KEEPALIVE_EXPIRY", "30"),
+    )
+    timeout = httpx.Timeout(
+        connect=_env_float("AGENT_HTTP_CONNECT_TIMEOUT", "5"),
+        read=_env_float("AGENT_HTTP_READ_TIMEOUT", "60"),
+        write=_env_float("AGENT_HTTP_WRITE_TIMEOUT", "30"),
+        pool=_env_float("AGENT_HTTP_POOL_TIMEOUT", "5"),
+    )
+    http2 = os.environ.get("AGENT_HTTP_HTTP2", "false").lower() in ("1", "true", "yes")
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("AGENT_HTTP_HTTP2 requested but the 'h2' package is not installed; using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+async def init_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        return
+    _http_client = _build_client()
+
+
+def get_http_client():
+    global _http_client
+    if _http_client is None:
+        _http_client = _build_client()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    client, _http_client = _http_client, None
+    if client is not None:
+        await client.aclose()
+
+
+@contextlib.asynccontextmanager
+async def track_request() -> AsyncIterator[None]:
+    """Count an outbound request for the pool saturation metrics."""
+    _stats["requests_total"] += 1
+    _stats["in_flight"] += 1
+    if _stats["in_flight"] > _stats["peak_in_flight"]:
+        _stats["peak_in_flight"] = _stats["in_flight"]
+    try:
+        yield
+    except Exception as e:
+        if type(e).__name__ == "PoolTimeout":
+            _stats["pool_timeouts"] += 1
+        else:
+            _stats["errors"] += 1
+        raise
+    finally:
+        _stats["in_flight"] -= 1
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Return connection pool usage and saturation for the shared client."""
+    connections: Optional[int] = None
+    idle: Optional[int] = None
+    if _http_client is not None:
+        # httpx does not expose pool internals publicly; read httpcore's pool best-effort
+        try:
+            pool = _http_client._transport._pool
+            conns = list(pool.connections)
+            connections = len(conns)
+            idle = sum(1 for c in conns if c.is_idle())
+        except Exception:
+            pass
+    return {
+        "open": _http_client is not None,
+        "max_connections": _max_connections,
+        "connections": connections,
+        "idle_connections": idle,
+        **_stats,
+        "saturation": (_stats["in_flight"] / _max_connections) if _max_connections else 0.0,
+    }
@@ -0,0 +1,543 @@
+"""Prometheus metrics for `/metrics`.
+
+Recording is a dict lookup plus an in-place add on the event loop thread. It
+takes no locks and formats no label strings, so it is cheap enough for every
+request. The text exposition format is only produced when `/metrics` is
+scraped.
+
+Instruments:
+
+- `http_request_duration_seconds{method,route,status}`: recorded by
+  `MetricsMiddleware`, using the route template (not the raw path).
+- `agent_call_duration_seconds{backend,mode,outcome}` and
+  `agent_stream_first_token_seconds{backend}`: recorded around agent calls
+  in `query_service`.
+- `db_pool_checkout_seconds` and `db_query_duration_seconds`: recorded by
+  `db.TimedQueuePool` and by engine cursor events.
+- Gauges and counters read from existing stats at scrape time: telemetry
+  queue depth and drops, answer-cache hits, misses and hit ratio, DB pool
+  and HTTP client usage.
+
+Under multi-worker uvicorn or gunicorn, set METRICS_DIR to a directory that
+every worker can reach, ideally a tmpfs. Each worker writes its snapshot to
+`metrics-<pid>.json` every METRICS_SNAPSHOT_INTERVAL seconds, with an atomic
+rename. A scrape served by any worker first refreshes that worker's own
+snapshot, then merges every snapshot updated within METRICS_SNAPSHOT_TTL:
+
+- counters and histograms are summed across workers;
+- gauges get a `pid` label.
+
+A worker that exits must not make the summed counters go down. On shutdown a
+worker folds its final counters and histograms into `accumulated.json` and
+removes its snapshot. A snapshot older than METRICS_SNAPSHOT_TTL (a worker
+that crashed or was killed) is folded in the same way by the next scrape.
+Only gauges expire. This mirrors prometheus_client's multiprocess mode.
+Writing and folding hold an exclusive `flock` on the directory's lock file,
+so two workers never fold the same snapshot twice. A worker that stalled
+past the TTL finds its file gone on its next write. From then on it writes
+only what it counted since the fold, so nothing is counted twice. A
+leftover file from an earlier process with the same pid is folded, not
+overwritten.
+
+The registry is snapshotted on the event loop thread, which is the thread
+that records into it. Only the resulting dict goes to a worker thread for
+the file I/O.
+"""
+
+import asyncio
+import bisect
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def samples(self) -> List[list]:
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "help": self.help, "labelnames": list(self.labelnames)}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        # [count per bucket..., count above the last bucket, sum]
+        series = self._values.get(labels)
+        if series is None:
+            series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def describe(self) -> Dict[str, Any]:
+        return dict(super().describe(), buckets=list(self.buckets))
+
+
+class Callback(_Metric):
+    """Gauge or counter whose values are read from existing stats at snapshot time."""
+
+    def __init__(self, name: str, help: str, kind: str, fn: Callable[[], Dict[Tuple[str, ...], float]], labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self) -> List[list]:
+        try:
+            return [[list(labels), float(value)] for labels, value in self.fn().items() if value is not None]
+        except Exception as e:
+            logger.debug("Metric callback %s failed: %s", self.name, e)
+            return []
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "time": time.time(),
+            "metrics": {name: dict(m.describe(), samples=m.samples()) for name, m in self.metrics.items()},
+        }
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(
+    Histogram("http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"))
+)
+AGENT_CALLS = REGISTRY.register(
+    Histogram("agent_call_duration_seconds", "Agent call latency by backend", ("backend", "mode", "outcome"))
+)
+AGENT_FIRST_TOKEN = REGISTRY.register(
+    Histogram("agent_stream_first_token_seconds", "Time to the first streamed agent token", ("backend",))
+)
+DB_CHECKOUT = REGISTRY.register(
+    Histogram("db_pool_checkout_seconds", "Time to check a connection out of the DB pool", buckets=DB_BUCKETS)
+)
+DB_QUERY = REGISTRY.register(Histogram("db_query_duration_seconds", "DB statement execution time", buckets=DB_BUCKETS))
+
+
+def _telemetry_queue() -> Dict[Tuple[str, ...], float]:
+    from backend.src.services import telemetry_service
+
+    writer = telemetry_service._WRITER
+    return {(): writer.stats()["queue_depth"]} if writer is not None else {}
+
+
+def _telemetry_dropped() -> Dict[Tuple[str, ...], float]:
+    from backend.src.services import telemetry_service
+
+    writer = telemetry_service._WRITER
+    return {(): writer.dropped} if writer is not None else {}
+
+
+def _cache_lookups() -> Dict[Tuple[str, ...], float]:
+    from backend.src.services.cache_service import get_answer_cache
+
+    stats = get_answer_cache().stats()
+    return {("local_hit",): stats["local_hits"], ("shared_hit",): stats["shared_hits"], ("miss",): stats["misses"]}
+
+
+def _cache_hit_ratio() -> Dict[Tuple[str, ...], float]:
+    from backend.src.services.cache_service import get_answer_cache
+
+    return {(): get_answer_cache().stats()["hit_ratio"]}
+
+
+def _db_pool() -> Dict[Tuple[str, ...], float]:
+    from backend.src.db import pool_stats
+
+    stats = pool_stats()
+    return {(k,): stats[k] for k in ("size", "checked_out", "overflow") if k in stats}
+
+
+def _http_pool() -> Dict[Tuple[str, ...], float]:
+    from backend.src.http_client import pool_stats
+
+    stats = pool_stats()
+    return {("in_flight",): stats.get("in_flight"), ("connections",): stats.get("connections")}
+
+
+for _metric in (
+    Callback("telemetry_queue_depth", "Events waiting in the telemetry writer queue", "gauge", _telemetry_queue),
+    Callback("telemetry_dropped_total", "Telemetry events dropped because the queue was full", "counter", _telemetry_dropped),
+    Callback("answer_cache_lookups_total", "Answer cache lookups by result", "counter", _cache_lookups, ("result",)),
+    Callback("answer_cache_hit_ratio", "Answer cache hit ratio since start", "gauge", _cache_hit_ratio),
+    Callback("db_pool_connections", "DB pool connections by state", "gauge", _db_pool, ("state",)),
+    Callback("http_client_connections", "Shared agent HTTP client usage", "gauge", _http_pool, ("state",)),
+):
+    REGISTRY.register(_metric)
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+# ASGI scope extension marking the app's own startup warm-up request, which is not timed
+WARMUP_EXTENSION = "warmup"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request, labelled by its route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or WARMUP_EXTENSION in scope.get("extensions", ()):
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Route templates keep the label set bounded; unknown paths share one label
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUESTS.observe(time.perf_counter() - start, scope["method"], route, str(status_code))
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement executed through a SQLAlchemy (async) engine."""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if starts:
+            DB_QUERY.observe(time.perf_counter() - starts.pop())
+
+
+# ---------------------------------------------------------------------------
+# Exposition and multi-worker aggregation
+# ---------------------------------------------------------------------------
+
+def _settings() -> Dict[str, Any]:
+    interval = float(os.environ.get("METRICS_SNAPSHOT_INTERVAL", "5"))
+    return {
+        "dir": os.environ.get("METRICS_DIR"),
+        "interval_s": interval,
+        "ttl_s": float(os.environ.get("METRICS_SNAPSHOT_TTL", str(max(60.0, interval * 6)))),
+    }
+
+
+ACCUMULATED_FILE = "accumulated.json"
+_LOCK_FILE = "metrics.lock"
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(data, fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+_LOCK = threading.Lock()
+# Per METRICS_DIR: "written" holds the cumulative counter and histogram values in
+# this worker's snapshot file, "folded" the part of them already in ACCUMULATED_FILE
+_STATE: Dict[str, Dict[str, Any]] = {}
+
+
+@contextlib.contextmanager
+def _locked(directory: str):
+    """Exclusive lock across threads and workers for writing, reading and folding snapshots."""
+    with _LOCK:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(directory, _LOCK_FILE), "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _cumulative(snapshot: Dict[str, Any]) -> Dict[Tuple[str, Tuple[str, ...]], Any]:
+    return {
+        (name, tuple(labels)): value
+        for name, m in snapshot["metrics"].items()
+        if m["kind"] != "gauge"
+        for labels, value in m["samples"]
+    }
+
+
+def _minus(snapshot: Dict[str, Any], folded: Dict[Tuple[str, Tuple[str, ...]], Any]) -> Dict[str, Any]:
+    """`snapshot` less the counter and histogram values already folded into ACCUMULATED_FILE."""
+    if not folded:
+        return snapshot
+    metrics = {}
+    for name, m in snapshot["metrics"].items():
+        samples = []
+        for labels, value in m["samples"]:
+            base = folded.get((name, tuple(labels))) if m["kind"] != "gauge" else None
+            if base is not None:
+                value = [a - b for a, b in zip(value, base)] if m["kind"] == "histogram" else value - base
+            samples.append([labels, value])
+        metrics[name] = dict(m, samples=samples)
+    return dict(snapshot, metrics=metrics)
+
+
+def _own_path(directory: str) -> str:
+    return os.path.join(directory, f"metrics-{os.getpid()}.json")
+
+
+def _fold_into_accumulated(directory: str, snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    path = os.path.join(directory, ACCUMULATED_FILE)
+    accumulated = _fold(_read_json(path), snapshots)
+    _write_json(path, accumulated)
+    return accumulated
+
+
+def _own_state(directory: str) -> Dict[str, Any]:
+    """This worker's fold state, caught up with scrapes that folded its file; call with the lock held."""
+    state = _STATE.setdefault(directory, {"written": None, "folded": {}})
+    path = _own_path(directory)
+    if state["written"] is not None:
+        if not os.path.exists(path):
+            # A scrape folded our last snapshot: we stalled for longer than the TTL
+            state["folded"] = state["written"]
+    elif os.path.exists(path):
+        # Left behind by an earlier process with the same pid
+        snap = _read_json(path)
+        if snap is not None:
+            _fold_into_accumulated(directory, [snap])
+    return state
+
+
+def write_snapshot(directory: str, snapshot: Optional[Dict[str, Any]] = None) -> str:
+    """Write this worker's snapshot; pass one taken on the event loop when calling from a thread."""
+    snapshot = snapshot if snapshot is not None else REGISTRY.snapshot()
+    path = _own_path(directory)
+    with _locked(directory):
+        state = _own_state(directory)
+        _write_json(path, _minus(snapshot, state["folded"]))
+        state["written"] = _cumulative(snapshot)
+    return path
+
+
+def _fold(accumulated: Optional[Dict[str, Any]], snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum the counters and histograms of `snapshots` into the accumulated snapshot; drop gauges."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snap in ([accumulated] if accumulated else []) + snapshots:
+        _merge(merged, snap, gauges=False)
+    return {
+        "pid": "accumulated",
+        "time": time.time(),
+        "metrics": {
+            name: dict(m, samples=[[list(key), value] for key, value in m["samples"].items()])
+            for name, m in merged.items()
+        },
+    }
+
+
+def read_snapshots(directory: str, ttl_s: float) -> List[Dict[str, Any]]:
+    """Live worker snapshots plus the accumulated totals of workers that are gone.
+
+    Snapshots older than `ttl_s` are folded into ACCUMULATED_FILE and removed.
+    """
+    snapshots, expired = [], []
+    now = time.time()
+    with _locked(directory):
+        for name in os.listdir(directory):
+            if not (name.startswith("metrics-") and name.endswith(".json")):
+                continue
+            path = os.path.join(directory, name)
+            snap = _read_json(path)
+            if snap is None:
+                continue
+            if now - snap.get("time", 0) <= ttl_s:
+                snapshots.append(snap)
+            else:
+                expired.append((path, snap))
+
+        if expired:
+            accumulated = _fold_into_accumulated(directory, [snap for _, snap in expired])
+            for path, _ in expired:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+        else:
+            accumulated = _read_json(os.path.join(directory, ACCUMULATED_FILE))
+    return ([accumulated] if accumulated else []) + snapshots
+
+
+def retire_snapshot(directory: str, snapshot: Optional[Dict[str, Any]] = None) -> None:
+    """Fold this worker's final counters and histograms into ACCUMULATED_FILE and remove its snapshot."""
+    snapshot = snapshot if snapshot is not None else REGISTRY.snapshot()
+    with _locked(directory):
+        state = _own_state(directory)
+        _fold_into_accumulated(directory, [_minus(snapshot, state["folded"])])
+        with contextlib.suppress(OSError):
+            os.remove(_own_path(directory))
+        state["written"], state["folded"] = None, _cumulative(snapshot)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: List[str], values: List[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_float(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _merge(merged: Dict[str, Dict[str, Any]], snap: Dict[str, Any], gauges: bool = True) -> None:
+    """Add one snapshot to `merged`: sum counters and histograms, key gauges by pid."""
+    pid = str(snap.get("pid"))
+    for name, m in snap["metrics"].items():
+        if m["kind"] == "gauge" and not gauges:
+            continue
+        entry = merged.setdefault(name, dict(m, samples={}))
+        for labels, value in m["samples"]:
+            if m["kind"] == "gauge":
+                entry["samples"][tuple(labels) + (pid,)] = value
+                continue
+            key = tuple(labels)
+            if m["kind"] == "histogram":
+                prev = entry["samples"].get(key)
+                entry["samples"][key] = [a + b for a, b in zip(prev, value)] if prev else list(value)
+            else:
+                entry["samples"][key] = entry["samples"].get(key, 0.0) + value
+
+
+def render(snapshots: List[Dict[str, Any]]) -> str:
+    """Merge worker snapshots into the Prometheus text exposition format."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snap in snapshots:
+        _merge(merged, snap)
+
+    lines: List[str] = []
+    for name in sorted(merged):
+        m = merged[name]
+        names = m["labelnames"]
+        lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['kind']}")
+        for key in sorted(m["samples"]):
+            value = m["samples"][key]
+            if m["kind"] == "gauge":
+                lines.append(f"{name}{_labels(names, list(key[:-1]), ('pid', key[-1]))} {_format_float(value)}")
+            elif m["kind"] == "histogram":
+                labels = list(key)
+                cumulative = 0
+                for bound, count in zip(m["buckets"] + [float("inf")], value[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(names, labels, ('le', _format_float(bound)))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(names, labels)} {_format_float(value[-1])}")
+                lines.append(f"{name}_count{_labels(names, labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_labels(names, list(key))} {_format_float(value)}")
+    return "\n".join(lines) + "\n"
+
+
+async def collect() -> str:
+    """Exposition text for this worker, or for all workers (live and exited) when METRICS_DIR is set."""
+    settings = _settings()
+    if not settings["dir"]:
+        return render([REGISTRY.snapshot()])
+    # Snapshot here on the loop: from a worker thread it would race with recording
+    await asyncio.to_thread(write_snapshot, settings["dir"], REGISTRY.snapshot())
+    return render(await asyncio.to_thread(read_snapshots, settings["dir"], settings["ttl_s"]))
+
+
+_TASK: Optional[asyncio.Task] = None
+
+
+async def _snapshot_loop(directory: str, interval: float) -> None:
+    while True:
+        try:
+            await asyncio.to_thread(write_snapshot, directory, REGISTRY.snapshot())
+        except Exception as e:
+            logger.warning("Could not write metrics snapshot to %s: %s", directory, e)
+        await asyncio.sleep(interval)
+
+
+async def start_metrics() -> None:
+    global _TASK
+    settings = _settings()
+    if settings["dir"] and (_TASK is None or _TASK.done()):
+        os.makedirs(settings["dir"], exist_ok=True)
+        _TASK = asyncio.create_task(_snapshot_loop(settings["dir"], settings["interval_s"]), name="metrics-snapshot")
+
+
+async def stop_metrics() -> None:
+    global _TASK
+    task, _TASK = _TASK, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # Final values go into the accumulated totals, so summed counters never drop
+        try:
+            retire_snapshot(_settings()["dir"], REGISTRY.snapshot())
+        except Exception as e:
+            logger.warning("Could not retire metrics snapshot: %s", e)
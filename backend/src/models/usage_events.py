@@ -22,3 +22,13 @@ class UsageEvent(BaseModel):
 
 def serialize_usage_event(row: dict) -> dict:
     return {**row}
+
+
+def usage_event_from_telemetry(payload: dict) -> UsageEvent:
+    """Validate a `/api/telemetry`-style body (`event`, `payload`) or a native UsageEvent dict."""
+    data = dict(payload)
+    if "event_type" not in data and "event" in data:
+        data["event_type"] = data.pop("event")
+    if "metadata" not in data and "payload" in data:
+        data["metadata"] = data.pop("payload")
+    return UsageEvent(**data)
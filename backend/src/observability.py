@@ -1,11 +1,50 @@
-"""Minimal observability helpers for prototype.
+"""Logging and OpenTelemetry tracing.
 
-- Configure Python logging (JSON-friendly formatting)
-- Optional: wire AppInsights exporter when `APPINSIGHTS_CONNECTION_STRING` is present
+- `configure_logging()` sets up Python logging.
+- `configure_tracing(app)` installs a `TracerProvider` and instruments the
+  FastAPI app (one server span per request, named by route template).
+
+Child spans come from the code paths where query latency goes:
+
+- `agent.invoke` / `agent.stream`, one per backend tried (`query_service`);
+- `agent.http` for the REST fallback, which also forwards `traceparent`;
+- `agent.thread.create` and `agent.run` (Foundry), `thread_pool.acquire`;
+- one span per DB statement (`trace_engine`, from engine cursor events).
+
+Settings:
+
+- TRACING_EXPORTER: comma-separated list of `azure`, `file`, `memory` and
+  `console`. Defaults to `azure` when APPINSIGHTS_CONNECTION_STRING is set;
+  otherwise tracing is off.
+- TRACING_FILE: the `file` exporter's path (JSON lines; default
+  `traces.jsonl`).
+- TRACING_MEMORY_SPANS: how many finished spans the `memory` exporter keeps
+  for `/api/admin/traces` (default 2000).
+- TRACING_SAMPLE_RATIO: head sampling ratio for new traces (default 1.0).
+  Requests that carry a `traceparent` follow the caller's sampling decision.
+- TRACING_EXCLUDED_URLS: paths without server spans (default
+  `/metrics,/api/health`).
+
+With tracing off, `span()` returns a shared no-op context manager and no
+OpenTelemetry module is imported.
 """
 
+import contextlib
+import json
 import logging
 import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "grafanacopilot-backend"
+
+_NOOP = contextlib.nullcontext()
+
+# Set by configure_tracing: {"provider", "tracer", "memory", "exporters", "sample_ratio"}
+_STATE: Optional[Dict[str, Any]] = None
 
 
 def configure_logging():
@@ -14,23 +53,292 @@ def configure_logging():
     logging.getLogger("uvicorn.access").setLevel(level)
 
 
-def enable_appinsights_if_configured():
-    conn_str = os.environ.get("APPINSIGHTS_CONNECTION_STRING")
-    if not conn_str:
+# ---------------------------------------------------------------------------
+# Exporters
+# ---------------------------------------------------------------------------
+
+def span_to_dict(span) -> Dict[str, Any]:
+    """Compact JSON-friendly view of a finished span."""
+    ctx = span.get_span_context()
+    return {
+        "trace_id": format(ctx.trace_id, "032x"),
+        "span_id": format(ctx.span_id, "016x"),
+        "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "name": span.name,
+        "kind": span.kind.name.lower(),
+        "start_ns": span.start_time,
+        "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+        "status": span.status.status_code.name.lower(),
+        "attributes": dict(span.attributes or {}),
+    }
+
+
+class RecentSpanExporter:
+    """Keeps the most recent finished spans in memory, as dicts."""
+
+    def __init__(self, maxlen: int = 2000):
+        self.spans: deque = deque(maxlen=maxlen)
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        self.spans.extend(span_to_dict(s) for s in spans)
+        return SpanExportResult.SUCCESS
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+class JsonLinesSpanExporter:
+    """Appends one JSON object per finished span to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+
+        lines = "".join(json.dumps(span_to_dict(s), default=str) + "\n" for s in spans)
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(lines)
+        except OSError as e:
+            logger.warning("Could not write spans to %s: %s", self.path, e)
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+def _settings() -> Dict[str, Any]:
+    default = "azure" if os.environ.get("APPINSIGHTS_CONNECTION_STRING") else ""
+    exporters = os.environ.get("TRACING_EXPORTER", default)
+    return {
+        "exporters": [e.strip().lower() for e in exporters.split(",") if e.strip()],
+        "file": os.environ.get("TRACING_FILE", "traces.jsonl"),
+        "memory_spans": int(os.environ.get("TRACING_MEMORY_SPANS", "2000")),
+        "sample_ratio": float(os.environ.get("TRACING_SAMPLE_RATIO", "1.0")),
+        "excluded_urls": os.environ.get("TRACING_EXCLUDED_URLS", "/metrics,/api/health"),
+    }
+
+
+def _span_processors(settings: Dict[str, Any], state: Dict[str, Any]) -> list:
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+
+    processors = []
+    for name in settings["exporters"]:
+        if name == "memory":
+            state["memory"] = RecentSpanExporter(settings["memory_spans"])
+            # Appending to a deque is cheap enough to do inline
+            processors.append(SimpleSpanProcessor(state["memory"]))
+        elif name == "file":
+            processors.append(BatchSpanProcessor(JsonLinesSpanExporter(settings["file"])))
+        elif name == "console":
+            processors.append(BatchSpanProcessor(ConsoleSpanExporter()))
+        elif name == "azure":
+            from azure.monitor.opentelemetry.exporter import AzureMonitorTraceExporter
+
+            conn_str = os.environ["APPINSIGHTS_CONNECTION_STRING"]
+            processors.append(BatchSpanProcessor(AzureMonitorTraceExporter(connection_string=conn_str)))
+        else:
+            raise ValueError(f"Unknown TRACING_EXPORTER '{name}'")
+        state["exporters"].append(name)
+    return processors
+
+
+def configure_tracing(app=None) -> bool:
+    """Install the tracer provider (replacing any earlier one) and instrument `app`.
+
+    Returns False, leaving tracing off, when no exporter is configured or
+    OpenTelemetry is not installed.
+    """
+    global _STATE
+    settings = _settings()
+    if not settings["exporters"]:
+        shutdown_tracing()
         return False
-    # Try to configure OpenTelemetry exporter if installed; be optional.
     try:
+        from opentelemetry import trace
         from opentelemetry.sdk.resources import Resource
         from opentelemetry.sdk.trace import TracerProvider
-        from opentelemetry.sdk.trace.export import BatchSpanProcessor
-        from opentelemetry.exporter.azuremonitor import AzureMonitorTraceExporter
-
-        resource = Resource.create({"service.name": "grafanacopilot-backend"})
-        provider = TracerProvider(resource=resource)
-        exporter = AzureMonitorTraceExporter(connection_string=conn_str)
-        span_processor = BatchSpanProcessor(exporter)
-        provider.add_span_processor(span_processor)
-        return True
-    except Exception:
-        # No telemetry exports available; silently skip for prototype
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+        state: Dict[str, Any] = {"memory": None, "exporters": [], "sample_ratio": settings["sample_ratio"]}
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": os.environ.get("OTEL_SERVICE_NAME", SERVICE_NAME)}),
+            sampler=ParentBased(TraceIdRatioBased(settings["sample_ratio"])),
+        )
+        for processor in _span_processors(settings, state):
+            provider.add_span_processor(processor)
+    except Exception as e:
+        logger.warning("Tracing disabled: %s", e)
         return False
+
+    shutdown_tracing()
+    state["provider"] = provider
+    state["tracer"] = provider.get_tracer(__name__)
+    _STATE = state
+    # The global provider can only be set once per process; our own spans use _STATE
+    if not isinstance(trace.get_tracer_provider(), TracerProvider):
+        trace.set_tracer_provider(provider)
+
+    if app is not None:
+        try:
+            from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
+            FastAPIInstrumentor.instrument_app(
+                app,
+                tracer_provider=provider,
+                excluded_urls=settings["excluded_urls"],
+                # Per-message ASGI receive/send spans add noise, not insight
+                exclude_spans=["receive", "send"],
+            )
+        except Exception as e:
+            logger.warning("FastAPI server spans unavailable: %s", e)
+    logger.info("Tracing enabled (exporters=%s, sample_ratio=%s)", ",".join(state["exporters"]), settings["sample_ratio"])
+    return True
+
+
+def flush_tracing() -> None:
+    if _STATE is not None:
+        _STATE["provider"].force_flush()
+
+
+def shutdown_tracing() -> None:
+    global _STATE
+    state, _STATE = _STATE, None
+    if state is not None:
+        state["provider"].shutdown()
+
+
+def tracing_enabled() -> bool:
+    return _STATE is not None
+
+
+# ---------------------------------------------------------------------------
+# Spans
+# ---------------------------------------------------------------------------
+
+def _kind(kind: str):
+    from opentelemetry.trace import SpanKind
+
+    return SpanKind.CLIENT if kind == "client" else SpanKind.INTERNAL
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: str = "internal"):
+    """Context manager for a child span of the current one (yields None when tracing is off).
+
+    Exceptions raised inside are recorded on the span and set its status.
+    """
+    if _STATE is None:
+        return _NOOP
+    return _STATE["tracer"].start_as_current_span(name, kind=_kind(kind), attributes=attributes)
+
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: str = "internal"):
+    """Start a span without making it current, for async generators; end it with `end_span`."""
+    if _STATE is None:
+        return None
+    return _STATE["tracer"].start_span(name, kind=_kind(kind), attributes=attributes)
+
+
+def end_span(s, error: Optional[BaseException] = None, **attributes: Any) -> None:
+    if s is None:
+        return
+    for key, value in attributes.items():
+        s.set_attribute(key, value)
+    if error is not None:
+        from opentelemetry.trace import Status, StatusCode
+
+        s.record_exception(error)
+        s.set_status(Status(StatusCode.ERROR, str(error)))
+    s.end()
+
+
+def inject_headers(headers: Dict[str, str], parent=None) -> Dict[str, str]:
+    """`headers` plus W3C `traceparent` for `parent` or the current span (unchanged when tracing is off)."""
+    if _STATE is None:
+        return headers
+    from opentelemetry import propagate, trace
+
+    out = dict(headers)
+    propagate.inject(out, context=trace.set_span_in_context(parent) if parent is not None else None)
+    return out
+
+
+def trace_engine(engine) -> None:
+    """Emit one client span per statement executed through a SQLAlchemy (async) engine."""
+    if _STATE is None:
+        return
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    system = sync_engine.dialect.name
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        s = start_span(
+            statement.split(None, 1)[0].upper() if statement.strip() else "db.query",
+            {"db.system": system, "db.statement": statement[:2000]},
+            kind="client",
+        )
+        conn.info.setdefault("trace_spans", []).append(s)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            end_span(spans.pop(), **({"db.rowcount": cursor.rowcount} if cursor.rowcount >= 0 else {}))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(ctx):
+        spans = ctx.connection.info.get("trace_spans") if ctx.connection is not None else None
+        if spans:
+            end_span(spans.pop(), error=ctx.original_exception)
+
+
+# ---------------------------------------------------------------------------
+# Inspection
+# ---------------------------------------------------------------------------
+
+def recent_traces(limit: int = 20) -> List[Dict[str, Any]]:
+    """Most recent traces held by the `memory` exporter, newest first, spans in start order."""
+    memory = _STATE and _STATE["memory"]
+    if not memory:
+        return []
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    for s in list(memory.spans):
+        traces.setdefault(s["trace_id"], []).append(s)
+    out = []
+    for trace_id, spans in traces.items():
+        spans.sort(key=lambda s: s["start_ns"])
+        ids = {s["span_id"] for s in spans}
+        roots = [s for s in spans if s["parent_id"] not in ids] or spans
+        root = max(roots, key=lambda s: s["duration_ms"])
+        out.append({"trace_id": trace_id, "root": root["name"], "duration_ms": root["duration_ms"],
+                    "start_ns": spans[0]["start_ns"], "spans": spans})
+    out.sort(key=lambda t: t["start_ns"], reverse=True)
+    return out[:limit]
+
+
+def tracing_status() -> Dict[str, Any]:
+    if _STATE is None:
+        return {"enabled": False}
+    memory = _STATE["memory"]
+    return {
+        "enabled": True,
+        "exporters": _STATE["exporters"],
+        "sample_ratio": _STATE["sample_ratio"],
+        "buffered_spans": len(memory.spans) if memory else None,
+    }
@@ -0,0 +1,62 @@
+"""Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row on the previous page, encoded as
+URL-safe base64 JSON. Callers treat it as opaque and pass it back unchanged.
+The next page is then selected with a `WHERE (k1, k2) > (:k1, :k2)` predicate
+that an index on the sort key can seek to directly. OFFSET would instead scan
+and discard every earlier row.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, List, Optional, Union
+
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(key: List[Any]) -> str:
+    raw = json.dumps(key, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor produced by `encode_cursor`; raises ValueError when malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (binascii.Error, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(key, list) or len(key) != size:
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def parse_time(value: Union[str, datetime.datetime, None]) -> Optional[datetime.datetime]:
+    """Parse an ISO-8601 timestamp; naive values are taken as UTC."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.datetime):
+        dt = value
+    else:
+        try:
+            dt = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError as e:
+            raise ValueError(f"Invalid timestamp: {value}") from e
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt
+
+
+def clamp_limit(limit: Optional[int], default: int = 100) -> int:
+    if not limit or limit < 1:
+        return default
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def build_page(rows: List[Any], limit: int, key) -> dict:
+    """Turn `limit + 1` fetched rows into a page; the extra row only signals that more exist."""
+    items = rows[:limit]
+    next_cursor = encode_cursor(key(items[-1])) if len(rows) > limit and items else None
+    return {"items": items, "next_cursor": next_cursor}
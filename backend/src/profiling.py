@@ -0,0 +1,369 @@
+"""Opt-in sampling profiler for individual requests.
+
+With PROFILING_ENABLED=true, `ProfilingMiddleware` profiles a request when:
+
+- it carries `X-Profile: 1` and the admin key in `X-API-Key` (when
+  ADMIN_API_KEY is set), or
+- it is picked by PROFILE_SAMPLE_RATE (a fraction, default 0).
+
+A profiled request gets an id: its `X-Request-ID` if given, otherwise a
+random one. The id is returned in the `X-Profile-Id` response header.
+
+While at least one request is being profiled, a background thread samples
+stacks every PROFILE_INTERVAL_MS milliseconds (default 5). Each sample is
+attributed to the request whose coroutine it finds:
+
+- on the event loop thread, when the request is running;
+- otherwise, the chain of awaits it is suspended in, ending in e.g.
+  `<await Future>`;
+- plus the stacks of agent executor threads running blocking SDK calls for
+  the request.
+
+Concurrent requests therefore do not pollute each other's profiles. Each
+sample is weighted by the wall time since the previous one. While Python
+code holds the GIL, the sampler can only wake up once per switch interval,
+so counting samples would under-weight on-CPU work. The result is stored as
+"folded stacks" with values in microseconds, which flamegraph.pl and
+speedscope read directly. It is kept for the last PROFILE_KEEP requests
+(default 50) and served from `/api/admin/profiles/{request_id}`. With
+PROFILE_DIR set, profiles are also written there, so any worker can serve
+them.
+
+With PROFILING_ENABLED unset the middleware is not installed, the sampler
+thread never starts, and the request path is unchanged.
+"""
+
+import asyncio
+import collections
+import contextvars
+import datetime
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+_CURRENT: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("current_profile", default=None)
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def _settings() -> Dict[str, Any]:
+    return {
+        "sample_rate": float(os.environ.get("PROFILE_SAMPLE_RATE", "0")),
+        "interval_s": float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000.0,
+        "keep": int(os.environ.get("PROFILE_KEEP", "50")),
+        "dir": os.environ.get("PROFILE_DIR"),
+    }
+
+
+def current_profile() -> Optional["Profile"]:
+    return _CURRENT.get()
+
+
+# ---------------------------------------------------------------------------
+# Stack sampling
+# ---------------------------------------------------------------------------
+
+_LABELS: Dict[Any, str] = {}
+
+
+def _label(code) -> str:
+    label = _LABELS.get(code)
+    if label is None:
+        path = code.co_filename
+        if path.startswith(REPO_ROOT):
+            path = os.path.relpath(path, REPO_ROOT)
+        else:
+            path = "/".join(path.split(os.sep)[-2:])
+        name = getattr(code, "co_qualname", code.co_name)
+        label = _LABELS[code] = f"{name} ({path}:{code.co_firstlineno})"
+    return label
+
+
+def _stack_above(top, stop) -> Optional[List[str]]:
+    """Labels from `stop` (a frame, or a code object) up to `top`, or None if `stop` is not on the stack."""
+    labels = []
+    frame = top
+    while frame is not None:
+        if frame is stop or frame.f_code is stop:
+            if frame is stop:
+                labels.append(_label(frame.f_code))
+            labels.reverse()
+            return labels
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    return None
+
+
+def _await_chain(coro) -> List[str]:
+    """Labels of a suspended coroutine and everything it is awaiting, outermost first."""
+    labels = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        labels.append(_label(frame.f_code))
+        awaited = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+        if isinstance(awaited, asyncio.Task):
+            awaited = awaited.get_coro()
+        if awaited is not None and not hasattr(awaited, "cr_frame") and not hasattr(awaited, "gi_frame"):
+            labels.append(f"<await {type(awaited).__name__}>")
+            break
+        coro = awaited
+    return labels
+
+
+class Profile:
+    """Samples collected for one request."""
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.status: Optional[int] = None
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.counts: Dict[str, int] = collections.Counter()
+        self.samples = 0
+        self.threads: set = set()
+        self._coro = None
+        self._loop_thread: Optional[int] = None
+        self._start = self._end = self._last = 0.0
+
+    def start(self, coro) -> None:
+        self._coro = coro
+        self._loop_thread = threading.get_ident()
+        self._start = self._last = time.perf_counter()
+
+    def stop(self) -> None:
+        self._end = time.perf_counter()
+        self._coro = None
+
+    def run_in_thread(self, fn: Callable[[], Any]) -> Any:
+        """Run `fn` on the current (worker) thread, sampling it as part of this request."""
+        ident = threading.get_ident()
+        self.threads.add(ident)
+        try:
+            return fn()
+        finally:
+            self.threads.discard(ident)
+
+    def sample(self, frames: Dict[int, Any], now: float) -> None:
+        coro = self._coro
+        root = getattr(coro, "cr_frame", None)
+        if root is None:
+            return
+        weight = max(int((now - self._last) * 1e6), 1)
+        self._last = now
+        self.samples += 1
+        loop_top = frames.get(self._loop_thread)
+        stack = _stack_above(loop_top, root) if loop_top is not None else None
+        if stack is not None:
+            self.counts[";".join(stack)] += weight
+            return
+        chain = _await_chain(coro)
+        workers = [frames.get(t) for t in list(self.threads)]
+        workers = [f for f in workers if f is not None]
+        if not workers:
+            self.counts[";".join(chain)] += weight
+            return
+        for top in workers:
+            inner = _stack_above(top, Profile.run_in_thread.__code__) or []
+            self.counts[";".join(chain + ["[thread]"] + inner)] += weight
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in sorted(self.counts.items(), key=lambda kv: -kv[1]))
+
+    def to_dict(self, interval_s: float) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round((self._end - self._start) * 1000, 3),
+            "interval_ms": interval_s * 1000,
+            "samples": self.samples,
+            "units": "microseconds",
+            "folded": self.folded(),
+        }
+
+
+class Sampler:
+    """One background thread sampling all active profiles; it exits when none are left."""
+
+    def __init__(self):
+        self._active: Dict[int, Profile] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.interval = 0.005
+
+    def add(self, profile: Profile, interval: float) -> None:
+        with self._lock:
+            self._active[id(profile)] = profile
+            self.interval = interval
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.pop(id(profile), None)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                profiles = list(self._active.values())
+                if not profiles:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            frames.pop(own, None)
+            now = time.perf_counter()
+            for profile in profiles:
+                try:
+                    profile.sample(frames, now)
+                except Exception:
+                    # The sampled coroutine may finish mid-walk; drop the sample
+                    pass
+            del frames
+            time.sleep(self.interval)
+
+
+_SAMPLER = Sampler()
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+_PROFILES: "collections.OrderedDict[str, Dict[str, Any]]" = collections.OrderedDict()
+
+
+def _write_profile(directory: str, data: Dict[str, Any], keep: int) -> None:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{data['request_id']}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+    files = sorted(
+        (os.path.join(directory, n) for n in os.listdir(directory) if n.endswith(".json")),
+        key=os.path.getmtime,
+    )
+    for stale in files[:-keep] if keep > 0 else files:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
+
+async def store_profile(data: Dict[str, Any]) -> None:
+    settings = _settings()
+    _PROFILES[data["request_id"]] = data
+    _PROFILES.move_to_end(data["request_id"])
+    while len(_PROFILES) > max(settings["keep"], 0):
+        _PROFILES.popitem(last=False)
+    if settings["dir"]:
+        try:
+            await asyncio.to_thread(_write_profile, settings["dir"], data, settings["keep"])
+        except Exception as e:
+            logger.warning("Could not write profile %s to %s: %s", data["request_id"], settings["dir"], e)
+
+
+def get_profile(request_id: str) -> Optional[Dict[str, Any]]:
+    if request_id in _PROFILES:
+        return _PROFILES[request_id]
+    directory = _settings()["dir"]
+    if not directory or not _REQUEST_ID_RE.match(request_id):
+        return None
+    try:
+        with open(os.path.join(directory, f"{request_id}.json")) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """Summaries (no stacks) of stored profiles, newest first."""
+    profiles = dict(_PROFILES)
+    directory = _settings()["dir"]
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            request_id = name[: -len(".json")]
+            if name.endswith(".json") and request_id not in profiles:
+                data = get_profile(request_id)
+                if data is not None:
+                    profiles[request_id] = data
+    out = [{k: v for k, v in p.items() if k != "folded"} for p in profiles.values()]
+    out.sort(key=lambda p: p["started_at"], reverse=True)
+    return out
+
+
+def clear_profiles() -> None:
+    _PROFILES.clear()
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles requests asking for it (or sampled by rate)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def _request_id(self, scope) -> Optional[str]:
+        headers = dict(scope.get("headers") or ())
+        flag = headers.get(b"x-profile", b"").decode("latin-1").lower()
+        if flag in ("1", "true", "yes"):
+            admin_key = os.environ.get("ADMIN_API_KEY")
+            if admin_key and headers.get(b"x-api-key", b"").decode("latin-1") != admin_key:
+                return None
+        else:
+            rate = _settings()["sample_rate"]
+            if rate <= 0 or random.random() >= rate:
+                return None
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")
+        return request_id if _REQUEST_ID_RE.match(request_id) else uuid.uuid4().hex
+
+    async def __call__(self, scope, receive, send):
+        request_id = self._request_id(scope) if scope["type"] == "http" else None
+        if request_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(request_id, scope["method"], scope["path"])
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", request_id.encode())]
+            await send(message)
+
+        settings = _settings()
+        coro = self.app(scope, receive, send_with_id)
+        token = _CURRENT.set(profile)
+        profile.start(coro)
+        _SAMPLER.add(profile, settings["interval_s"])
+        try:
+            await coro
+        finally:
+            _SAMPLER.remove(profile)
+            profile.stop()
+            _CURRENT.reset(token)
+            await store_profile(profile.to_dict(settings["interval_s"]))
@@ -0,0 +1,530 @@
+"""Agent backend registry: resolve how to call the agent once, then just call it.
+
+Backends are registered by name with a factory. `resolve_agent_backends()`
+runs each configured factory once (normally from the app lifespan): the SDK
+factory imports `azure.ai.agents`, picks the client class, builds credentials
+and locates the invocation method; the REST factory prebuilds headers. The
+resulting chain is cached, so per-request work is only the call itself.
+
+Backend order comes from AGENT_BACKENDS (comma-separated, default "sdk,rest").
+The "foundry" backend is opt-in, e.g. AGENT_BACKENDS=foundry,sdk,rest; it
+needs PROJECT_ENDPOINT and AGENT_ID.
+STUB_MODE=true always resolves to the "stub" backend. If a backend fails at
+call time the next one in the chain is tried (SDK -> REST fallback).
+
+Answer text and citations are pulled out by `answer_extractor`. Each
+backend keeps its own `ResponseShape`, so the layout of its responses is
+detected once.
+"""
+
+import abc
+import asyncio
+import datetime
+import importlib
+import inspect
+import json
+import logging
+import os
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from backend.src.observability import end_span, inject_headers, span, start_span
+from backend.src.services.answer_extractor import CitationExtractor, ResponseShape
+
+logger = logging.getLogger(__name__)
+
+
+async def _maybe_await(value):
+    if asyncio.iscoroutine(value):
+        return await value
+    return value
+
+
+def _is_stub_mode() -> bool:
+    return os.environ.get("STUB_MODE", "true").lower() in ("1", "true", "yes")
+
+
+def _agent_config():
+    api_key = os.environ.get("AI_FOUNDRY_API_KEY")
+    endpoint = os.environ.get("AI_FOUNDRY_ENDPOINT")
+
+    if not api_key or not endpoint:
+        raise RuntimeError("AI_FOUNDRY_ENDPOINT and AI_FOUNDRY_API_KEY are required when STUB_MODE is False")
+    return api_key, endpoint
+
+
+def prompt_text(request: Dict[str, Any]) -> str:
+    """The user's query, prefixed with local docs-index passages when `run_query` found any."""
+    query = request.get("query", "")
+    candidates = request.get("candidates")
+    if not candidates:
+        return query
+    lines = ["Relevant documentation excerpts (cite the URLs you use):"]
+    for i, c in enumerate(candidates, 1):
+        url = c["url"] + (f"#{c['anchor']}" if c.get("anchor") else "")
+        lines.append(f"[{i}] {c.get('title') or url} ({url}): {c.get('snippet', '')}")
+    lines.append("")
+    lines.append(f"Question: {query}")
+    return "\n".join(lines)
+
+
+class AgentBackend(abc.ABC):
+    """Base class: `invoke` returns a contract-shaped dict, `stream` yields answer text."""
+
+    name = "base"
+    # True when the backend keeps conversation threads server-side
+    supports_threads = False
+
+    @abc.abstractmethod
+    async def invoke(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+    async def create_thread(self) -> str:
+        """Backends without server-side threads hand out a local session id."""
+        return f"local-{uuid.uuid4().hex}"
+
+    async def delete_thread(self, thread_id: str) -> None:
+        return None
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        result = await self.invoke(request)
+        yield result["answer"]
+
+    def build_result(
+        self,
+        answer: str,
+        request: Optional[Dict[str, Any]] = None,
+        extractor: Optional[CitationExtractor] = None,
+    ) -> Dict[str, Any]:
+        """Shape (streamed or buffered) answer text into a contract response.
+
+        A streamed answer passes the `extractor` that already saw its chunks;
+        a buffered one is scanned here.
+        """
+        if extractor is None:
+            extractor = CitationExtractor((request or {}).get("candidates"))
+            extractor.feed(answer)
+        result = {
+            "answer": answer or "(no text returned by agent)",
+            "citations": extractor.citations(),
+            "confidence": 0.5,
+            "fallback": False,
+        }
+        anchors = extractor.anchors()
+        if anchors:
+            result["anchors"] = anchors
+        return result
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+
+class StubBackend(AgentBackend):
+    name = "stub"
+
+    def _response(self, request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        candidates = (request or {}).get("candidates")
+        if candidates:
+            # Grounded on the local docs index: answer from the best passage
+            top = candidates[0]
+            return {
+                "answer": f"Stubbed answer: {top['snippet']} (see {top['url']})",
+                "citations": [{"url": c["url"], "anchor": c.get("anchor"), "snippet": c.get("snippet")} for c in candidates],
+                "confidence": 0.7,
+                "fallback": False,
+                "anchors": [c["anchor"] for c in candidates if c.get("anchor")],
+            }
+        # Return a canned response matching the contract
+        return {
+            "answer": "Stubbed answer: see https://docs.microsoft.com/azure/managed-grafana for details.",
+            "citations": [
+                {
+                    "url": "https://docs.microsoft.com/azure/managed-grafana",
+                    "anchor": "getting-started",
+                    "snippet": "Use the Azure portal to create a Managed Grafana workspace...",
+                }
+            ],
+            "confidence": 0.92,
+            "fallback": False,
+            "anchors": ["getting-started"],
+        }
+
+    async def invoke(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return self._response(request)
+
+    def build_result(self, answer: str, request: Optional[Dict[str, Any]] = None, extractor=None) -> Dict[str, Any]:
+        return self._response(request)
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        words = self._response(request)["answer"].split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+
+class SdkBackend(AgentBackend):
+    """azure.ai.agents client with a pre-resolved invocation method."""
+
+    name = "sdk"
+
+    def __init__(self, method: Callable, client_cls_name: str, method_name: str):
+        self.method = method
+        self.client_cls_name = client_cls_name
+        self.method_name = method_name
+        self.shape = ResponseShape()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "client_class": self.client_cls_name,
+            "method": self.method_name,
+            "response_shape": self.shape.describe(),
+        }
+
+    async def _call(self, prompt_text: str):
+        if not callable(self.method):
+            return self.method
+        if inspect.iscoroutinefunction(self.method):
+            return await self.method(prompt_text)
+        # Synchronous SDK methods block; run them on the bounded agent pool
+        from backend.src.services.agent_executor import get_agent_executor
+
+        out = await get_agent_executor().call(self.method, prompt_text)
+        return await _maybe_await(out)
+
+    async def invoke(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        from backend.src.services.agent_executor import get_agent_executor
+
+        async with get_agent_executor().slot():
+            resp = await self._call(prompt_text(request))
+        return self.build_result(self.shape.answer(resp), request)
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        """Forward chunks when the method returns an (async) iterator; otherwise emit the whole answer."""
+        from backend.src.services.agent_executor import get_agent_executor
+
+        executor = get_agent_executor()
+        async with executor.slot():
+            resp = await self._call(prompt_text(request))
+
+            if hasattr(resp, "__aiter__"):
+                async for item in resp:
+                    piece = self.shape.delta(item)
+                    if piece:
+                        yield piece
+                return
+
+            if hasattr(resp, "__iter__") and not isinstance(resp, (str, bytes, dict, list)):
+                # Blocking SDK iterators are advanced off the event loop
+                iterator = iter(resp)
+                sentinel = object()
+                while True:
+                    item = await executor.call(next, iterator, sentinel)
+                    if item is sentinel:
+                        return
+                    piece = self.shape.delta(item)
+                    if piece:
+                        yield piece
+
+        yield self.shape.answer(resp)
+
+
+class FoundryBackend(AgentBackend):
+    """Azure AI Foundry agent via threads/messages/runs (see `sample_ai_service_code.py`).
+
+    Every SDK call here is blocking, so the whole flow runs on the bounded
+    agent pool. Requests that carry a `thread_id` continue that thread.
+    Otherwise the run uses a throwaway thread, which is deleted (best-effort)
+    once the answer has been read; clients that want a conversation get a
+    thread from `/api/threads` first.
+    """
+
+    name = "foundry"
+    supports_threads = True
+
+    def __init__(self, client: Any, agent_id: str, endpoint: str):
+        self.client = client
+        self.agent_id = agent_id
+        self.endpoint = endpoint
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "endpoint": self.endpoint, "agent_id": self.agent_id}
+
+    def _run_sync(self, request: Dict[str, Any], thread_id: Optional[str]) -> Dict[str, Any]:
+        from azure.ai.agents.models import ListSortOrder
+
+        throwaway = not thread_id
+        if throwaway:
+            with span("agent.thread.create", {"agent.backend": self.name}):
+                thread_id = self.client.threads.create().id
+        try:
+            with span("agent.run", {"agent.backend": self.name, "agent.id": self.agent_id}):
+                self.client.messages.create(thread_id=thread_id, role="user", content=prompt_text(request))
+                run = self.client.runs.create_and_process(thread_id=thread_id, agent_id=self.agent_id)
+            if run.status == "failed":
+                raise RuntimeError(f"Agent run failed: {run.last_error}")
+
+            answer = ""
+            messages = self.client.messages.list(thread_id=thread_id, run_id=run.id, order=ListSortOrder.DESCENDING)
+            for message in messages:
+                if message.role == "assistant" and message.text_messages:
+                    answer = message.text_messages[-1].text.value
+                    break
+        finally:
+            if throwaway:
+                # Otherwise every stateless query would leave a thread behind on the server
+                try:
+                    self.client.threads.delete(thread_id)
+                except Exception as e:
+                    logger.debug("Failed to delete throwaway thread %s: %s", thread_id, e)
+        result = self.build_result(answer, request)
+        if not throwaway:
+            result["thread_id"] = thread_id
+        return result
+
+    async def invoke(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        from backend.src.services.agent_executor import get_agent_executor
+
+        return await get_agent_executor().run(self._run_sync, request, request.get("thread_id"))
+
+    async def create_thread(self) -> str:
+        from backend.src.services.agent_executor import get_agent_executor
+
+        with span("agent.thread.create", {"agent.backend": self.name}):
+            thread = await get_agent_executor().run(self.client.threads.create)
+        return thread.id
+
+    async def delete_thread(self, thread_id: str) -> None:
+        from backend.src.services.agent_executor import get_agent_executor
+
+        await get_agent_executor().run(self.client.threads.delete, thread_id)
+
+
+class RestBackend(AgentBackend):
+    """Plain HTTP POST to AI_FOUNDRY_ENDPOINT through the shared pooled client."""
+
+    name = "rest"
+
+    def __init__(self, endpoint: str, api_key: str):
+        self.endpoint = endpoint
+        headers = {"Content-Type": "application/json"}
+        # Try common header names for Azure/OpenAI style services
+        headers["api-key"] = api_key
+        headers.setdefault("Authorization", f"Bearer {api_key}")
+        self.headers = headers
+        self.stream_headers = dict(headers, Accept="text/event-stream, application/json")
+        self.shape = ResponseShape()
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "endpoint": self.endpoint, "response_shape": self.shape.describe()}
+
+    async def invoke(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        from backend.src.http_client import get_http_client, track_request
+
+        client = get_http_client()
+        attrs = {"http.method": "POST", "http.url": self.endpoint}
+        async with track_request():
+            with span("agent.http", attrs, kind="client") as s:
+                resp = await client.post(self.endpoint, headers=inject_headers(self.headers), json={"input": prompt_text(request)})
+                if s is not None:
+                    s.set_attribute("http.status_code", resp.status_code)
+                resp.raise_for_status()
+                data = resp.json()
+        return self.build_result(self.shape.answer(data), request)
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[str]:
+        """POST with `stream: true` and forward SSE `data:` frames; buffered JSON replies are emitted whole."""
+        from backend.src.http_client import get_http_client, track_request
+
+        client = get_http_client()
+        payload = {"input": prompt_text(request), "stream": True}
+        trace_span = start_span("agent.http", {"http.method": "POST", "http.url": self.endpoint, "http.stream": True}, kind="client")
+        headers = inject_headers(self.stream_headers, trace_span)
+        error = None
+        try:
+            async with track_request():
+                async with client.stream("POST", self.endpoint, headers=headers, json=payload) as resp:
+                    if trace_span is not None:
+                        trace_span.set_attribute("http.status_code", resp.status_code)
+                    resp.raise_for_status()
+                    content_type = resp.headers.get("content-type", "")
+                    if "text/event-stream" not in content_type:
+                        body = await resp.aread()
+                        try:
+                            data = json.loads(body)
+                        except ValueError:
+                            data = body.decode("utf-8", errors="replace")
+                        yield self.shape.answer(data)
+                        return
+
+                    async for line in resp.aiter_lines():
+                        piece = _parse_sse_line(line, self.shape)
+                        if piece is None:
+                            return
+                        if piece:
+                            yield piece
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            end_span(trace_span, error=error)
+
+
+# ---------------------------------------------------------------------------
+# Factories
+# ---------------------------------------------------------------------------
+
+def _sdk_factory() -> Optional[AgentBackend]:
+    """Resolve the azure.ai.agents client class, credentials and invocation method once."""
+    api_key, endpoint = _agent_config()
+    agents_mod = importlib.import_module("azure.ai.agents")
+    # Look for a plausible client class
+    client_cls = None
+    for candidate in ("AgentsClient", "AgentClient", "AgentServiceClient", "AgentRuntimeClient"):
+        if hasattr(agents_mod, candidate):
+            client_cls = getattr(agents_mod, candidate)
+            break
+
+    if client_cls is None:
+        return None
+
+    # Try to construct with AzureKeyCredential when available
+    try:
+        from azure.core.credentials import AzureKeyCredential
+
+        client = client_cls(endpoint, AzureKeyCredential(api_key))
+    except Exception:
+        # Fallback to trying the simpler constructor; give up on the SDK path if this fails too
+        client = client_cls(endpoint, api_key)
+
+    # Find a plausible invocation method on the client
+    for candidate in (
+        "get_response",
+        "get_responses",
+        "begin_get_responses",
+        "run",
+        "begin_run",
+        "invoke",
+        "invoke_agent",
+        "create_response",
+        # Some SDKs might expose a `responses` property that is itself callable
+        "responses",
+    ):
+        if hasattr(client, candidate):
+            return SdkBackend(getattr(client, candidate), client_cls.__name__, candidate)
+
+    raise RuntimeError("Found azure.ai.agents client but no known invocation method")
+
+
+def _foundry_factory() -> Optional[AgentBackend]:
+    endpoint = os.environ.get("PROJECT_ENDPOINT")
+    agent_id = os.environ.get("AGENT_ID")
+    if not endpoint or not agent_id:
+        raise RuntimeError("PROJECT_ENDPOINT and AGENT_ID are required for the Foundry backend")
+    from azure.ai.agents import AgentsClient
+    from azure.identity import DefaultAzureCredential
+
+    return FoundryBackend(AgentsClient(endpoint=endpoint, credential=DefaultAzureCredential()), agent_id, endpoint)
+
+
+def _rest_factory() -> Optional[AgentBackend]:
+    api_key, endpoint = _agent_config()
+    return RestBackend(endpoint, api_key)
+
+
+_REGISTRY: Dict[str, Callable[[], Optional[AgentBackend]]] = {
+    "foundry": _foundry_factory,
+    "sdk": _sdk_factory,
+    "rest": _rest_factory,
+}
+
+_CHAIN: Optional[List[AgentBackend]] = None
+_STATUS: Dict[str, Any] = {}
+
+
+def register_backend(name: str, factory: Callable[[], Optional[AgentBackend]]) -> None:
+    """Register (or replace) a backend factory. Takes effect on the next resolve."""
+    _REGISTRY[name] = factory
+
+
+def resolve_agent_backends(force: bool = False) -> List[AgentBackend]:
+    """Run the configured factories once and cache the resulting backend chain."""
+    global _CHAIN, _STATUS
+    if _CHAIN is not None and not force:
+        return _CHAIN
+
+    chain: List[AgentBackend] = []
+    unavailable: Dict[str, str] = {}
+    if _is_stub_mode():
+        chain.append(StubBackend())
+    else:
+        order = [n.strip() for n in os.environ.get("AGENT_BACKENDS", "sdk,rest").split(",") if n.strip()]
+        for name in order:
+            factory = _REGISTRY.get(name)
+            if factory is None:
+                unavailable[name] = "not registered"
+                continue
+            try:
+                backend = factory()
+            except Exception as e:
+                unavailable[name] = f"{type(e).__name__}: {e}"
+                continue
+            if backend is None:
+                unavailable[name] = "not available"
+                continue
+            chain.append(backend)
+
+    for name, reason in unavailable.items():
+        logger.info("Agent backend '%s' unavailable: %s", name, reason)
+    if chain:
+        logger.info("Active agent backend: %s", chain[0].name)
+    else:
+        logger.warning("No agent backend could be resolved: %s", unavailable)
+
+    _CHAIN = chain
+    _STATUS = {
+        "active": chain[0].name if chain else None,
+        "chain": [b.describe() for b in chain],
+        "unavailable": unavailable,
+        "resolved_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    return _CHAIN
+
+
+def get_agent_backends() -> List[AgentBackend]:
+    """Return the resolved chain, resolving lazily if the lifespan did not run."""
+    chain = resolve_agent_backends()
+    if not chain:
+        # Keep the pre-registry error message for misconfigured deployments
+        if not os.environ.get("PROJECT_ENDPOINT"):
+            _agent_config()
+        raise RuntimeError("No agent backend available; check AGENT_BACKENDS or use STUB_MODE=true")
+    return chain
+
+
+def active_backend_name() -> Optional[str]:
+    chain = resolve_agent_backends()
+    return chain[0].name if chain else None
+
+
+def backend_status() -> Dict[str, Any]:
+    chain = resolve_agent_backends()
+    # Re-describe so response shapes detected since resolution show up
+    return dict(_STATUS, chain=[b.describe() for b in chain])
+
+
+# ---------------------------------------------------------------------------
+# Response-shape helpers
+# ---------------------------------------------------------------------------
+
+def _parse_sse_line(line: str, shape: Optional[ResponseShape] = None) -> Optional[str]:
+    """Return the text carried by one SSE line, "" for non-data lines, None on `[DONE]`."""
+    if not line.startswith("data:"):
+        return ""
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return None
+    try:
+        frame = json.loads(data)
+    except ValueError:
+        return data
+    return (shape or ResponseShape()).delta(frame)
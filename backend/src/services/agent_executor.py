@@ -0,0 +1,153 @@
+"""Bounded executor and admission control for blocking agent calls.
+
+The Foundry flow (`threads.create`, `messages.create`, `runs.create_and_process`,
+`messages.list`) is synchronous. Running it on the event loop would stall every
+other request on the worker, so blocking agent calls run on a dedicated thread
+pool with at most AGENT_MAX_CONCURRENCY calls in flight.
+
+Callers beyond that wait for a slot. At most AGENT_QUEUE_MAX callers may wait,
+each for at most AGENT_QUEUE_TIMEOUT seconds. When the queue is full, or the
+wait times out, `AgentOverloadedError` is raised. It carries a `retry_after`
+hint, which the API turns into a fast 503 with a Retry-After header.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from backend.src.profiling import current_profile
+
+
+class AgentOverloadedError(RuntimeError):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Agent capacity exhausted ({reason}); retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AgentExecutor:
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, max_wait: float = 10.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.active = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.wait_count = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+        self.run_count = 0
+        self.run_total_s = 0.0
+
+    @classmethod
+    def from_env(cls) -> "AgentExecutor":
+        return cls(
+            max_concurrency=int(os.environ.get("AGENT_MAX_CONCURRENCY", "8")),
+            max_queue=int(os.environ.get("AGENT_QUEUE_MAX", "32")),
+            max_wait=float(os.environ.get("AGENT_QUEUE_TIMEOUT", "10")),
+        )
+
+    def start(self) -> None:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="agent")
+        # asyncio primitives bind to the running loop; recreate per lifespan
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+
+    def shutdown(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _retry_after(self) -> int:
+        avg_run = (self.run_total_s / self.run_count) if self.run_count else 1.0
+        backlog = 1 + self.waiting / self.max_concurrency
+        return max(1, math.ceil(avg_run * backlog))
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the AGENT_MAX_CONCURRENCY slots, waiting in the bounded queue if needed."""
+        if self._sem is None:
+            self.start()
+        sem = self._sem
+        if sem.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AgentOverloadedError("queue full", self._retry_after())
+            start = time.monotonic()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(sem.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise AgentOverloadedError("queue wait timed out", self._retry_after())
+            finally:
+                self.waiting -= 1
+            waited = time.monotonic() - start
+            self.wait_count += 1
+            self.wait_total_s += waited
+            self.wait_max_s = max(self.wait_max_s, waited)
+        else:
+            await sem.acquire()
+        self.admitted += 1
+        self.active += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self.run_count += 1
+            self.run_total_s += time.monotonic() - start
+            sem.release()
+
+    async def call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the agent pool (caller must hold a slot)."""
+        if self._pool is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        # Carry contextvars (e.g. the current trace span) into the worker thread
+        ctx = contextvars.copy_context()
+        work = functools.partial(ctx.run, fn, *args, **kwargs)
+        profile = current_profile()
+        if profile is not None:
+            work = functools.partial(profile.run_in_thread, work)
+        return await loop.run_in_executor(self._pool, work)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Admit, then run a blocking callable on the agent pool."""
+        async with self.slot():
+            return await self.call(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_avg_ms": (self.wait_total_s / self.wait_count * 1000.0) if self.wait_count else 0.0,
+            "wait_max_ms": self.wait_max_s * 1000.0,
+            "run_avg_ms": (self.run_total_s / self.run_count * 1000.0) if self.run_count else 0.0,
+        }
+
+
+_EXECUTOR: Optional[AgentExecutor] = None
+
+
+def get_agent_executor() -> AgentExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = AgentExecutor.from_env()
+    return _EXECUTOR
@@ -0,0 +1,304 @@
+"""Usage analytics from incrementally maintained rollups.
+
+Every batch of usage events is aggregated once, as it is written (see
+`telemetry_service._persist_batch`), into two rollup tables:
+
+- `usage_rollups`: one row per (bucket size, bucket start, event_type), for
+  per-minute and per-day buckets. Each row holds the event count, the
+  fallback count, and the count and sum of confidences, plus a 10-bin
+  confidence histogram.
+- `usage_query_rollups`: per-day counts by `query_hash`, for the top
+  queries.
+
+The rollup rows are upserted in the same transaction as the raw INSERT, with
+additive `ON CONFLICT DO UPDATE`. `/api/analytics` therefore reads at most
+a few thousand small rows, however many raw events exist. Without a DB the
+same deltas are applied to an in-memory `RollupStore`.
+
+An event counts as a fallback when its `event_type` is "fallback" or its
+metadata carries `"fallback": true`. Fields are coerced per event: an
+unparseable `event_time` counts as now and a non-numeric `confidence` as
+missing, so one malformed event cannot abort the rollup of its batch.
+Per-minute rows older than ANALYTICS_MINUTE_RETENTION_DAYS are pruned by the
+usage_events maintenance task; per-day rows are kept.
+"""
+
+import datetime
+import math
+import os
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+MINUTE = "minute"
+DAY = "day"
+BUCKET_SIZES = (MINUTE, DAY)
+CONFIDENCE_BINS = 10
+
+
+def bucket_start(dt: datetime.datetime, size: str) -> datetime.datetime:
+    dt = dt.astimezone(datetime.timezone.utc)
+    if size == MINUTE:
+        return dt.replace(second=0, microsecond=0)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def is_fallback(event: Dict[str, Any]) -> bool:
+    if (event.get("event_type") or event.get("event")) == "fallback":
+        return True
+    meta = event.get("metadata") or event.get("payload")
+    return isinstance(meta, dict) and meta.get("fallback") in (True, "true")
+
+
+def confidence_bin(confidence: float) -> int:
+    return min(max(int(confidence * CONFIDENCE_BINS), 0), CONFIDENCE_BINS - 1)
+
+
+class RollupDelta:
+    """Per-bucket increments for one batch of events, ready to add to the rollups."""
+
+    def __init__(self):
+        # (size, bucket_start, event_type) -> [events, fallbacks, confidence_count, confidence_sum, hist]
+        self.buckets: Dict[Tuple[str, datetime.datetime, str], list] = {}
+        # (day, query_hash) -> events
+        self.queries: Dict[Tuple[datetime.datetime, str], int] = defaultdict(int)
+
+    def __bool__(self) -> bool:
+        return bool(self.buckets)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "bucket_size": size,
+                "bucket_start": start,
+                "event_type": event_type,
+                "events": v[0],
+                "fallbacks": v[1],
+                "confidence_count": v[2],
+                "confidence_sum": v[3],
+                "confidence_hist": list(v[4]),
+            }
+            for (size, start, event_type), v in self.buckets.items()
+        ]
+
+    def query_rows(self) -> List[Dict[str, Any]]:
+        return [{"bucket_start": day, "query_hash": h, "events": n} for (day, h), n in self.queries.items()]
+
+
+def _event_time(value: Any, now: datetime.datetime) -> datetime.datetime:
+    from backend.src.pagination import parse_time
+
+    try:
+        return parse_time(value) or now
+    except (TypeError, ValueError):
+        return now
+
+
+def _confidence(value: Any) -> Optional[float]:
+    try:
+        confidence = float(value)
+    except (TypeError, ValueError):
+        return None
+    return confidence if math.isfinite(confidence) else None
+
+
+def aggregate(events: List[Dict[str, Any]]) -> RollupDelta:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    delta = RollupDelta()
+    for event in events:
+        when = _event_time(event.get("event_time"), now)
+        event_type = str(event.get("event_type") or event.get("event") or "event")
+        fallback = is_fallback(event)
+        confidence = _confidence(event.get("confidence"))
+        for size in BUCKET_SIZES:
+            key = (size, bucket_start(when, size), event_type)
+            acc = delta.buckets.get(key)
+            if acc is None:
+                acc = delta.buckets[key] = [0, 0, 0, 0.0, [0] * CONFIDENCE_BINS]
+            acc[0] += 1
+            acc[1] += fallback
+            if confidence is not None:
+                acc[2] += 1
+                acc[3] += confidence
+                acc[4][confidence_bin(confidence)] += 1
+        if event.get("query_hash"):
+            delta.queries[(bucket_start(when, DAY), str(event["query_hash"]))] += 1
+    return delta
+
+
+class RollupStore:
+    """In-memory rollups used when there is no database."""
+
+    def __init__(self):
+        self.buckets: Dict[Tuple[str, datetime.datetime, str], list] = {}
+        self.queries: Dict[Tuple[datetime.datetime, str], int] = defaultdict(int)
+
+    def apply(self, delta: RollupDelta) -> None:
+        for key, v in delta.buckets.items():
+            acc = self.buckets.get(key)
+            if acc is None:
+                self.buckets[key] = [v[0], v[1], v[2], v[3], list(v[4])]
+                continue
+            for i in range(4):
+                acc[i] += v[i]
+            acc[4] = [a + b for a, b in zip(acc[4], v[4])]
+        for key, n in delta.queries.items():
+            self.queries[key] += n
+
+    def rows(self, size: str, since, until, event_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        out = []
+        for (s, start, etype), v in self.buckets.items():
+            if s != size or start < since or start >= until:
+                continue
+            if event_type is not None and etype != event_type:
+                continue
+            out.append(
+                {
+                    "bucket_start": start,
+                    "event_type": etype,
+                    "events": v[0],
+                    "fallbacks": v[1],
+                    "confidence_count": v[2],
+                    "confidence_sum": v[3],
+                    "confidence_hist": v[4],
+                }
+            )
+        return out
+
+    def top_queries(self, since, until, limit: int) -> List[Tuple[str, int]]:
+        totals: Dict[str, int] = defaultdict(int)
+        for (day, h), n in self.queries.items():
+            if since <= day < until:
+                totals[h] += n
+        return sorted(totals.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+
+    def prune(self, size: str, before) -> int:
+        stale = [k for k in self.buckets if k[0] == size and k[1] < before]
+        for k in stale:
+            del self.buckets[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        self.buckets.clear()
+        self.queries.clear()
+
+
+_STORE = RollupStore()
+
+
+def get_rollup_store() -> RollupStore:
+    return _STORE
+
+
+def _granularity(since, until, requested: str) -> str:
+    if requested in BUCKET_SIZES:
+        return requested
+    if requested != "auto":
+        raise ValueError(f"granularity must be auto, {MINUTE} or {DAY}")
+    return MINUTE if until - since <= datetime.timedelta(days=1) else DAY
+
+
+async def _load(size, since, until, event_type, top):
+    try:
+        from backend.src.db.crud import query_usage_rollups, top_query_hashes
+
+        rows = await query_usage_rollups(size, since, until, event_type)
+        day_since, day_until = bucket_start(since, DAY), until
+        top_rows = await top_query_hashes(day_since, day_until, top) if top else []
+        return rows, top_rows, "postgres"
+    except Exception:
+        store = get_rollup_store()
+        rows = store.rows(size, since, until, event_type)
+        top_rows = store.top_queries(bucket_start(since, DAY), until, top) if top else []
+        return rows, top_rows, "memory"
+
+
+def _confidence_summary(count: int, total: float, hist: List[int]) -> Dict[str, Any]:
+    return {
+        "count": count,
+        "mean": (total / count) if count else None,
+        "histogram": [
+            {"ge": round(i / CONFIDENCE_BINS, 2), "lt": round((i + 1) / CONFIDENCE_BINS, 2), "count": n}
+            for i, n in enumerate(hist)
+        ],
+    }
+
+
+async def get_analytics(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    granularity: str = "auto",
+    event_type: Optional[str] = None,
+    top: int = 10,
+) -> Dict[str, Any]:
+    """Dashboard summary over [since, until) from the rollups; raises ValueError on bad input.
+
+    Defaults to the last 24 hours. With granularity "auto", ranges up to a
+    day use per-minute buckets and longer ranges per-day buckets. `since` is
+    aligned down to a bucket boundary.
+    """
+    from backend.src.pagination import parse_time
+
+    until_dt = parse_time(until) or datetime.datetime.now(datetime.timezone.utc)
+    since_dt = parse_time(since) or until_dt - datetime.timedelta(days=1)
+    if since_dt >= until_dt:
+        raise ValueError("since must be before until")
+    size = _granularity(since_dt, until_dt, granularity)
+    since_dt = bucket_start(since_dt, size)
+
+    rows, top_rows, backend = await _load(size, since_dt, until_dt, event_type, top)
+
+    series: Dict[datetime.datetime, Dict[str, Any]] = {}
+    by_type: Dict[str, int] = defaultdict(int)
+    events = fallbacks = conf_count = 0
+    conf_sum = 0.0
+    hist = [0] * CONFIDENCE_BINS
+    for r in rows:
+        point = series.setdefault(r["bucket_start"], {"events": 0, "fallbacks": 0, "by_event_type": {}})
+        point["events"] += r["events"]
+        point["fallbacks"] += r["fallbacks"]
+        point["by_event_type"][r["event_type"]] = r["events"]
+        by_type[r["event_type"]] += r["events"]
+        events += r["events"]
+        fallbacks += r["fallbacks"]
+        conf_count += r["confidence_count"]
+        conf_sum += r["confidence_sum"]
+        hist = [a + b for a, b in zip(hist, r["confidence_hist"] or [0] * CONFIDENCE_BINS)]
+
+    return {
+        "since": since_dt.isoformat(),
+        "until": until_dt.isoformat(),
+        "granularity": size,
+        "backend": backend,
+        "totals": {
+            "events": events,
+            "by_event_type": dict(by_type),
+            "fallbacks": fallbacks,
+            "fallback_rate": (fallbacks / events) if events else 0.0,
+            "confidence": _confidence_summary(conf_count, conf_sum, hist),
+        },
+        "series": [
+            {
+                "bucket": start.isoformat(),
+                "events": p["events"],
+                "fallback_rate": p["fallbacks"] / p["events"] if p["events"] else 0.0,
+                "by_event_type": p["by_event_type"],
+            }
+            for start, p in sorted(series.items())
+        ],
+        "top_queries": [{"query_hash": h, "events": n} for h, n in top_rows],
+    }
+
+
+async def prune_rollups(now: Optional[datetime.datetime] = None) -> int:
+    """Drop per-minute rollups older than ANALYTICS_MINUTE_RETENTION_DAYS (per-day rows are kept)."""
+    days = int(os.environ.get("ANALYTICS_MINUTE_RETENTION_DAYS", "7"))
+    if days <= 0:
+        return 0
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    before = now - datetime.timedelta(days=days)
+    try:
+        from backend.src.db.crud import delete_usage_rollups_before
+
+        return await delete_usage_rollups_before(MINUTE, before)
+    except Exception:
+        return get_rollup_store().prune(MINUTE, before)
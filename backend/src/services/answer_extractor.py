@@ -0,0 +1,206 @@
+"""Pull answer text and citations out of agent output.
+
+Two pieces, shared by every backend:
+
+- `ResponseShape` finds the answer text inside a buffered response or a
+  streamed frame (OpenAI-style `choices`, Responses-style `output_text`,
+  or a top-level `answer` / `output` / `text` field, from dicts or SDK
+  objects). The first path that yields text is remembered per backend, so
+  later responses of the same shape are read with a single lookup.
+
+- `CitationExtractor` consumes answer text chunk by chunk, as it is streamed,
+  or all at once for a buffered reply. In one linear pass it collects
+  numbered markers such as `[1]`, which refer to the candidates listed by
+  `agent_backends.prompt_text`, along with inline URLs and their `#anchor`s.
+  A marker or URL split across chunks is carried over to the next chunk, and
+  only that unfinished tail is scanned again.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_MISSING = object()
+
+Path = Tuple[Any, ...]
+
+
+def _answer_paths() -> Tuple[Path, ...]:
+    paths: List[Path] = [
+        ("choices", 0, "message", "content"),
+        ("choices", 0, "message", "text"),
+        ("choices", 0, "text"),
+        ("output_text",),
+        ("output", 0, "content", 0, "text"),
+    ]
+    for key in ("answer", "output", "result", "content", "generated_text", "text"):
+        paths += [(key,), (key, "output"), (key, "text")]
+    return tuple(paths)
+
+
+ANSWER_PATHS = _answer_paths()
+DELTA_PATHS: Tuple[Path, ...] = (
+    ("choices", 0, "delta", "content"),
+    ("choices", 0, "delta", "text"),
+    ("choices", 0, "message", "content"),
+    ("choices", 0, "text"),
+    ("delta",),
+    ("delta", "text"),
+    ("delta", "content"),
+    ("text",),
+    ("content",),
+    ("output",),
+    ("answer",),
+)
+
+
+def _resolve(data: Any, path: Path) -> Any:
+    for step in path:
+        if isinstance(step, int):
+            if not isinstance(data, (list, tuple)) or len(data) <= step:
+                return _MISSING
+            data = data[step]
+        elif isinstance(data, dict):
+            data = data.get(step, _MISSING)
+        elif isinstance(data, (str, bytes, list, tuple)):
+            return _MISSING
+        else:
+            data = getattr(data, step, _MISSING)
+        if data is _MISSING:
+            return _MISSING
+    return data
+
+
+class ResponseShape:
+    """Per-backend memo of where the answer (and stream delta) text lives."""
+
+    def __init__(self):
+        self.answer_path: Optional[Path] = None
+        self.delta_path: Optional[Path] = None
+        self.detections = 0
+
+    def _find(self, data: Any, cached: Optional[Path], paths: Tuple[Path, ...]) -> Tuple[Optional[str], Optional[Path]]:
+        if cached is not None:
+            value = _resolve(data, cached)
+            if isinstance(value, str):
+                return value, cached
+        for path in paths:
+            if path == cached:
+                continue
+            value = _resolve(data, path)
+            if isinstance(value, str) and value:
+                self.detections += 1
+                return value, path
+        return None, cached
+
+    def answer(self, data: Any) -> str:
+        """Answer text of a buffered response; unknown shapes are stringified."""
+        if isinstance(data, str):
+            return data
+        if data is None:
+            return ""
+        text, self.answer_path = self._find(data, self.answer_path, ANSWER_PATHS)
+        return text if text is not None else str(data)
+
+    def delta(self, data: Any) -> str:
+        """Incremental text of one streamed frame ("" for frames without text, e.g. role-only deltas)."""
+        if isinstance(data, str):
+            return data
+        if data is None:
+            return ""
+        text, self.delta_path = self._find(data, self.delta_path, DELTA_PATHS)
+        return text or ""
+
+    def describe(self) -> Dict[str, Any]:
+        def fmt(path):
+            return ".".join(str(p) for p in path) if path else None
+
+        return {"answer": fmt(self.answer_path), "delta": fmt(self.delta_path), "detections": self.detections}
+
+
+_TOKEN_RE = re.compile(r"\[(\d{1,3})\]|(https?://[^\s<>\"'()\[\]{}|\\^`]+)")
+# An unfinished marker or URL scheme at the very end of a chunk
+_PARTIAL_RE = re.compile(r"(?:\[\d{0,3}|h(?:t(?:t(?:p(?:s?(?::/{0,2})?)?)?)?)?)\Z")
+_URL_TRAILING = ".,;:!?*_'\""
+
+
+class CitationExtractor:
+    """Incremental scan of answer text for `[n]` markers and inline URLs."""
+
+    def __init__(self, candidates: Optional[List[Dict[str, Any]]] = None):
+        self.candidates = candidates or []
+        self._parts: List[str] = []
+        self._carry = ""
+        self._closed = False
+        # (url, anchor) -> citation, in order of first appearance
+        self._found: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        self.markers: List[int] = []
+
+    def feed(self, chunk: str) -> None:
+        if not chunk:
+            return
+        self._parts.append(chunk)
+        buf = self._carry + chunk
+        end = len(buf)
+        for m in _TOKEN_RE.finditer(buf):
+            if m.group(2) and m.end() == len(buf):
+                # The URL may continue in the next chunk
+                end = m.start()
+                break
+            self._token(m)
+        else:
+            partial = _PARTIAL_RE.search(buf, max(0, len(buf) - 8))
+            if partial:
+                end = partial.start()
+        self._carry = buf[end:]
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            for m in _TOKEN_RE.finditer(self._carry):
+                self._token(m)
+            self._carry = ""
+
+    def _token(self, m: "re.Match") -> None:
+        if m.group(1):
+            n = int(m.group(1))
+            if n not in self.markers:
+                self.markers.append(n)
+            if 1 <= n <= len(self.candidates):
+                c = self.candidates[n - 1]
+                self._add(c["url"], c.get("anchor"), c.get("snippet"))
+            return
+        url = m.group(2).rstrip(_URL_TRAILING)
+        url, _, anchor = url.partition("#")
+        snippet = None
+        for c in self.candidates:
+            if c["url"] == url and (not anchor or c.get("anchor") == anchor):
+                anchor = anchor or c.get("anchor")
+                snippet = c.get("snippet")
+                break
+        self._add(url, anchor or None, snippet)
+
+    def _add(self, url: str, anchor: Optional[str], snippet: Optional[str]) -> None:
+        key = (url, anchor)
+        if key not in self._found:
+            self._found[key] = {"url": url, "anchor": anchor, "snippet": snippet}
+        elif snippet and not self._found[key]["snippet"]:
+            self._found[key]["snippet"] = snippet
+
+    @property
+    def answer(self) -> str:
+        return "".join(self._parts)
+
+    def citations(self) -> List[Dict[str, Any]]:
+        self.close()
+        return list(self._found.values())
+
+    def anchors(self) -> List[str]:
+        return [c["anchor"] for c in self.citations() if c["anchor"]]
+
+
+def extract_citations(text: str, candidates: Optional[List[Dict[str, Any]]] = None) -> CitationExtractor:
+    """Run a buffered answer through a `CitationExtractor` in one call."""
+    extractor = CitationExtractor(candidates)
+    extractor.feed(text)
+    extractor.close()
+    return extractor
@@ -0,0 +1,216 @@
+"""Answer cache: two-tier cache in front of `query_service.run_query`.
+
+Tier 1 is an in-process LRU with a TTL. Tier 2 is the shared Postgres table
+`answer_cache` so answers computed by one uvicorn worker are reused by the
+others. When DATABASE_URL is not configured (or the DB is unreachable) only the
+in-process tier is used.
+
+Entries are keyed on the normalized query text plus `page_context.sectionId`
+(and whether the service runs in STUB_MODE, so canned answers never leak into
+live mode through the shared tier).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: Optional[str]) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    text = _WHITESPACE_RE.sub(" ", (query or "").strip().lower())
+    return text.rstrip("?!. ")
+
+
+def make_cache_key(request: Dict[str, Any]) -> str:
+    """Build a stable cache key for a query request."""
+    page_context = request.get("page_context") or {}
+    section_id = page_context.get("sectionId") if isinstance(page_context, dict) else None
+    stub = os.environ.get("STUB_MODE", "true").lower() in ("1", "true", "yes")
+    raw = "\x1f".join(("stub" if stub else "live", section_id or "", normalize_query(request.get("query"))))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUTTLCache:
+    """Bounded LRU mapping where every entry also expires after `ttl_seconds`."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        return self._data.pop(key, None) is not None
+
+    def clear(self) -> int:
+        count = len(self._data)
+        self._data.clear()
+        return count
+
+
+class AnswerCache:
+    """Two-tier answer cache (local LRU+TTL, shared Postgres)."""
+
+    # Purge expired shared rows roughly once every N writes per worker.
+    PURGE_EVERY = 500
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 300.0,
+        shared_ttl_seconds: float = 3600.0,
+        enabled: bool = True,
+        shared_enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.local = LRUTTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.shared_ttl_seconds = float(shared_ttl_seconds)
+        self._shared_enabled = shared_enabled
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self.shared_errors = 0
+        self.invalidations = 0
+        self._writes = 0
+
+    @classmethod
+    def from_env(cls) -> "AnswerCache":
+        return cls(
+            max_entries=int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "300")),
+            shared_ttl_seconds=float(os.environ.get("ANSWER_CACHE_SHARED_TTL_SECONDS", "3600")),
+            enabled=os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+            shared_enabled=os.environ.get("ANSWER_CACHE_SHARED", "true").lower() in ("1", "true", "yes"),
+        )
+
+    def _disable_shared(self, exc: Exception) -> None:
+        # A missing DATABASE_URL / crud module will not fix itself at runtime;
+        # stop paying for the failed lookup on every request.
+        if isinstance(exc, (RuntimeError, ImportError)):
+            self._shared_enabled = False
+            logger.info("Shared answer cache tier disabled: %s", exc)
+        else:
+            self.shared_errors += 1
+            logger.warning("Shared answer cache tier error: %s", exc)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        value = self.local.get(key)
+        if value is not None:
+            return dict(value)
+        if not self._shared_enabled:
+            return None
+        try:
+            from backend.src.db.crud import get_cached_answer
+
+            value = await get_cached_answer(key)
+        except Exception as e:
+            self._disable_shared(e)
+            return None
+        if value is None:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        self.local.set(key, value)
+        return dict(value)
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        self.local.set(key, dict(value))
+        if not self._shared_enabled:
+            return
+        try:
+            from backend.src.db.crud import put_cached_answer, purge_expired_cached_answers
+
+            await put_cached_answer(key, value, ttl_seconds=self.shared_ttl_seconds)
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                await purge_expired_cached_answers()
+        except Exception as e:
+            self._disable_shared(e)
+
+    async def invalidate(self, key: Optional[str] = None) -> int:
+        """Drop one entry (or everything when `key` is None) from both tiers.
+
+        Returns the number of local entries removed. Other workers clear their
+        local tier when the source registry's change notification arrives, or
+        otherwise within the local TTL.
+        """
+        self.invalidations += 1
+        removed = int(self.local.delete(key)) if key else self.local.clear()
+        if self._shared_enabled:
+            try:
+                from backend.src.db.crud import delete_cached_answers
+
+                await delete_cached_answers(key)
+            except Exception as e:
+                self._disable_shared(e)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        local_lookups = self.local.hits + self.local.misses
+        hits = self.local.hits + self.shared_hits
+        return {
+            "enabled": self.enabled,
+            "shared_enabled": self._shared_enabled,
+            "entries": len(self.local),
+            "max_entries": self.local.max_entries,
+            "hits": hits,
+            "misses": self.local.misses - self.shared_hits,
+            "local_hits": self.local.hits,
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+            "shared_errors": self.shared_errors,
+            "evictions": self.local.evictions,
+            "expirations": self.local.expirations,
+            "invalidations": self.invalidations,
+            "hit_ratio": (hits / local_lookups) if local_lookups else 0.0,
+        }
+
+
+_ANSWER_CACHE: Optional[AnswerCache] = None
+
+
+def get_answer_cache() -> AnswerCache:
+    global _ANSWER_CACHE
+    if _ANSWER_CACHE is None:
+        _ANSWER_CACHE = AnswerCache.from_env()
+    return _ANSWER_CACHE
@@ -0,0 +1,172 @@
+"""Conditional, concurrency-limited fetching of source pages for the docs index.
+
+`SourceCrawler` remembers each URL's ETag, Last-Modified and content hash.
+On later fetches it sends `If-None-Match` / `If-Modified-Since`; a 304, or a
+200 whose body hashes to the previous value, counts as a skip. Only pages
+whose content actually changed are returned for re-indexing.
+
+A fetch does not update that state itself: each result carries its new
+validators, and the caller `commit()`s them once the content is indexed. A
+failed index build therefore leaves the pages looking changed, and the next
+re-crawl picks them up again.
+
+Fetches run with at most CRAWL_CONCURRENCY requests in flight overall and
+CRAWL_PER_HOST_CONCURRENCY per host, so one slow site cannot hog the crawl
+and no site gets hammered.
+
+Only http(s) URLs are fetched. Anything else, such as `file://`, is reported
+as an error and never read, so a registered source cannot pull files from
+the server's disk into the public index.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+CHANGED = "changed"
+NOT_MODIFIED = "not_modified"
+UNCHANGED = "unchanged"
+ERROR = "error"
+
+
+class FetchResult:
+    __slots__ = ("source", "status", "content", "content_type", "error", "validators")
+
+    def __init__(self, source, status, content=None, content_type=None, error=None, validators=None):
+        self.source = source
+        self.status = status
+        self.content = content
+        self.content_type = content_type
+        self.error = error
+        # New etag / last_modified / content_hash for the URL, applied by SourceCrawler.commit
+        self.validators = validators
+
+
+class SourceCrawler:
+    def __init__(self, concurrency: int = 8, per_host: int = 2, client: Any = None):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self._client = client
+        self.state: Dict[str, Dict[str, Optional[str]]] = {}
+        self.runs = 0
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.bytes_fetched = 0
+        self.last_run: Dict[str, Any] = {}
+
+    @classmethod
+    def from_env(cls) -> "SourceCrawler":
+        return cls(
+            concurrency=int(os.environ.get("CRAWL_CONCURRENCY", "8")),
+            per_host=int(os.environ.get("CRAWL_PER_HOST_CONCURRENCY", "2")),
+        )
+
+    def forget(self, url: str) -> None:
+        self.state.pop(url, None)
+
+    def state_after(self, results: List[FetchResult]) -> Dict[str, Dict[str, Optional[str]]]:
+        """A copy of `state` updated with the validators of `results`."""
+        state = dict(self.state)
+        for r in results:
+            if r.validators is not None:
+                state[r.source["url"]] = r.validators
+        return state
+
+    def commit(self, results: List[FetchResult]) -> None:
+        """Remember the validators of `results`; call once their content has been indexed."""
+        self.state = self.state_after(results)
+
+    async def _fetch_http(self, source: Dict[str, Any], force: bool) -> FetchResult:
+        from backend.src.http_client import get_http_client, track_request
+
+        url = source["url"]
+        headers = {}
+        known = self.state.get(url, {})
+        if not force:
+            if known.get("etag"):
+                headers["If-None-Match"] = known["etag"]
+            if known.get("last_modified"):
+                headers["If-Modified-Since"] = known["last_modified"]
+        client = self._client or get_http_client()
+        async with track_request():
+            resp = await client.get(url, headers=headers, follow_redirects=True)
+        if resp.status_code == 304:
+            return FetchResult(source, NOT_MODIFIED)
+        resp.raise_for_status()
+        body = resp.content
+        self.bytes_fetched += len(body)
+        validators = {
+            "etag": resp.headers.get("etag"),
+            "last_modified": resp.headers.get("last-modified"),
+            "content_hash": hashlib.sha256(body).hexdigest(),
+        }
+        if validators["content_hash"] == known.get("content_hash") and not force:
+            return FetchResult(source, UNCHANGED, validators=validators)
+        return FetchResult(source, CHANGED, resp.text, resp.headers.get("content-type", "text/html"), validators=validators)
+
+    async def fetch(self, source: Dict[str, Any], force: bool = False) -> FetchResult:
+        try:
+            if urlsplit(source["url"]).scheme.lower() not in ("http", "https"):
+                raise ValueError("unsupported URL scheme; only http and https sources are crawled")
+            return await self._fetch_http(source, force)
+        except Exception as e:
+            logger.warning("Failed to fetch %s: %s", source.get("url"), e)
+            return FetchResult(source, ERROR, error=str(e))
+
+    async def fetch_all(self, sources: List[Dict[str, Any]], force: bool = False) -> List[FetchResult]:
+        """Fetch every source (results in input order), respecting global and per-host limits."""
+        start = time.perf_counter()
+        overall = asyncio.Semaphore(self.concurrency)
+        hosts: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+
+        async def one(source):
+            # Take the host slot first so a busy host does not hold global slots while waiting
+            async with hosts[urlsplit(source["url"]).netloc]:
+                async with overall:
+                    return await self.fetch(source, force)
+
+        results = await asyncio.gather(*(one(s) for s in sources))
+        elapsed = time.perf_counter() - start
+
+        run_counts: Dict[str, int] = defaultdict(int)
+        for r in results:
+            run_counts[r.status] += 1
+            self.counts[r.status] += 1
+        self.runs += 1
+        skipped = run_counts[NOT_MODIFIED] + run_counts[UNCHANGED]
+        self.last_run = {
+            "sources": len(sources),
+            CHANGED: run_counts[CHANGED],
+            NOT_MODIFIED: run_counts[NOT_MODIFIED],
+            UNCHANGED: run_counts[UNCHANGED],
+            ERROR: run_counts[ERROR],
+            "skip_rate": (skipped / len(sources)) if sources else 0.0,
+            "duration_ms": elapsed * 1000.0,
+            "pages_per_s": (len(sources) / elapsed) if elapsed > 0 else 0.0,
+            "finished_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        return list(results)
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.counts.values())
+        skipped = self.counts[NOT_MODIFIED] + self.counts[UNCHANGED]
+        return {
+            "runs": self.runs,
+            "fetches": total,
+            CHANGED: self.counts[CHANGED],
+            NOT_MODIFIED: self.counts[NOT_MODIFIED],
+            UNCHANGED: self.counts[UNCHANGED],
+            ERROR: self.counts[ERROR],
+            "skip_rate": (skipped / total) if total else 0.0,
+            "bytes_fetched": self.bytes_fetched,
+            "concurrency": self.concurrency,
+            "per_host_concurrency": self.per_host,
+            "last_run": dict(self.last_run) or None,
+        }
@@ -0,0 +1,558 @@
+"""Local docs index: ranked passages from the `sources` table.
+
+The indexer fetches each active source (http(s) only, through the shared
+HTTP client), splits the page into
+passages at headings, and builds an in-memory index. The heading `id` (or a
+slug of the heading text) becomes the passage anchor. After a successful
+fetch, the source's `last_indexed` is set. Ranking uses hashed TF-IDF
+vectors (`passage_ranker`), or BM25 when NumPy is not installed.
+
+Fetching goes through `crawler.SourceCrawler`. A periodic re-crawl
+(DOCS_RECRAWL_INTERVAL) therefore uses conditional requests and content
+hashes, and re-indexes only the pages that changed.
+
+`search()` returns the top passages for a query, each with a snippet built
+around the matched terms, in a few milliseconds. `query_service.run_query`
+uses the hits in two ways: it gives the agent a compact context, and it
+supplies grounded citations when the agent (or the stub) returns none.
+
+The index is immutable once built; a rebuild swaps in a new one, so searches
+never see a partial index. With DOCS_INDEX_STORE_DIR set, each build is also
+published to `index_store`, a versioned memory-mapped file. Every worker
+serves from that mapping instead of a private copy, and picks up versions
+published by other workers without restarting.
+"""
+
+import asyncio
+import contextlib
+import datetime
+import heapq
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.src.services.passage_ranker import DEFAULT_DIM
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or the this to what when where which "
+    "with you your".split()
+)
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def slugify(text: str) -> str:
+    return "-".join(_TOKEN_RE.findall(text.lower()))
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+class _SectionParser(HTMLParser):
+    """Split an HTML page into (heading, anchor, text) sections."""
+
+    _HEADINGS = {"h1", "h2", "h3", "h4"}
+    _SKIP = {"script", "style", "nav", "header", "footer", "noscript", "svg"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections: List[Tuple[str, Optional[str], List[str]]] = [("", None, [])]
+        self._skip_depth = 0
+        self._heading: Optional[Tuple[Optional[str], List[str]]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag in self._HEADINGS and not self._skip_depth:
+            self._heading = (dict(attrs).get("id"), [])
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self._HEADINGS and self._heading is not None:
+            anchor, parts = self._heading
+            title = " ".join("".join(parts).split())
+            self.sections.append((title, anchor or slugify(title) or None, []))
+            self._heading = None
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._heading is not None:
+            self._heading[1].append(data)
+        else:
+            self.sections[-1][2].append(data)
+
+
+def split_sections(content: str, content_type: str = "text/html") -> List[Tuple[str, Optional[str], str]]:
+    """Return (heading, anchor, text) tuples for HTML, Markdown or plain text."""
+    if "html" in content_type or content.lstrip().startswith("<"):
+        parser = _SectionParser()
+        parser.feed(content)
+        parser.close()
+        raw = parser.sections
+    else:
+        raw = [("", None, [])]
+        for line in content.splitlines():
+            m = re.match(r"^#{1,4}\s+(.*)$", line)
+            if m:
+                title = m.group(1).strip()
+                raw.append((title, slugify(title) or None, []))
+            else:
+                raw[-1][2].append(line + "\n")
+    sections = []
+    for heading, anchor, parts in raw:
+        text = " ".join(" ".join(parts).split())
+        if text:
+            sections.append((heading, anchor, text))
+    return sections
+
+
+def make_passages(source: Dict[str, Any], content: str, content_type: str, max_words: int = 120) -> List[Dict[str, Any]]:
+    passages = []
+    for heading, anchor, text in split_sections(content, content_type):
+        words = text.split(" ")
+        for start in range(0, len(words), max_words):
+            passages.append(
+                {
+                    "source_id": source.get("id"),
+                    "url": source["url"],
+                    "title": source.get("title") or heading,
+                    "heading": heading,
+                    "anchor": anchor,
+                    "priority": source.get("priority", 100),
+                    "text": " ".join(words[start:start + max_words]),
+                }
+            )
+    return passages
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+def make_snippet(text: str, terms: Iterable[str], max_chars: int = 300) -> str:
+    """Pick the sentence pair covering most query terms."""
+    terms = set(terms)
+    sentences = _SENTENCE_RE.split(text)
+    best, best_score = 0, -1
+    for i in range(len(sentences)):
+        window = " ".join(sentences[i:i + 2])
+        score = len(terms.intersection(tokenize(window)))
+        if score > best_score:
+            best, best_score = i, score
+    snippet = " ".join(sentences[best:best + 2])
+    if len(snippet) > max_chars:
+        snippet = snippet[: max_chars - 1].rsplit(" ", 1)[0] + "…"
+    return snippet
+
+
+class DocsIndex:
+    """Immutable index over passages.
+
+    Ranks with `passage_ranker.HashedTfidfRanker` (one NumPy matrix-vector
+    product per query) when `ranker` is "vector", or "auto" with NumPy
+    installed; otherwise with BM25 over an inverted index.
+    """
+
+    def __init__(
+        self,
+        passages: List[Dict[str, Any]],
+        k1: float = 1.2,
+        b: float = 0.75,
+        priority_weight: float = 0.2,
+        ranker: str = "auto",
+        dim: int = DEFAULT_DIM,
+    ):
+        from backend.src.services.passage_ranker import HashedTfidfRanker, numpy_available
+
+        self.passages = passages
+        self.version: Optional[int] = None
+        self.k1 = k1
+        self.b = b
+        self.priority_weight = priority_weight
+        token_lists = [tokenize(p.get("heading", "") + " " + p["text"]) for p in passages]
+        # Lower `priority` values rank first in the sources table; give them a mild boost
+        self.boost = [
+            1.0 + priority_weight * (200 - min(max(int(p.get("priority") or 100), 0), 200)) / 200 for p in passages
+        ]
+
+        self.vector = None
+        if ranker == "vector" or (ranker == "auto" and numpy_available()):
+            self.vector = HashedTfidfRanker(token_lists, dim=dim)
+            import numpy as np
+
+            self._weights = np.asarray(self.boost, dtype=np.float32)
+            self.ranker = "vector"
+            return
+
+        self.ranker = "bm25"
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+        for i, tokens in enumerate(token_lists):
+            self.lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings[term].append((i, tf))
+        self.avgdl = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        n = len(passages)
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    @classmethod
+    def from_store(cls, mapped) -> "DocsIndex":
+        """Serve a memory-mapped `index_store.MappedIndex` without copying it."""
+        from backend.src.services.passage_ranker import HashedTfidfRanker
+
+        index = cls.__new__(cls)
+        index.passages = mapped.passages
+        index.version = mapped.version
+        index.k1, index.b = 1.2, 0.75
+        index.priority_weight = mapped.meta.get("priority_weight", 0.2)
+        index.boost = mapped.weights
+        index.vector = HashedTfidfRanker.from_arrays(mapped.columns, mapped.idf)
+        index._weights = mapped.weights
+        index.ranker = "vector"
+        return index
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    @property
+    def terms(self) -> int:
+        return self.vector.dim if self.vector is not None else len(self.postings)
+
+    def _bm25_top(self, terms: List[str], k: int) -> List[Tuple[float, int]]:
+        scores: Dict[int, float] = defaultdict(float)
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avgdl)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, ((s * self.boost[i], i) for i, s in scores.items()))
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        tokens = tokenize(query)
+        terms = list(dict.fromkeys(tokens))
+        if not terms or not self.passages:
+            return []
+        if self.vector is not None:
+            top = self.vector.top_k(tokens, k, weights=self._weights)
+        else:
+            top = self._bm25_top(terms, k)
+        hits = []
+        for score, i in top:
+            if score <= min_score:
+                continue
+            p = self.passages[i]
+            hits.append(
+                {
+                    "url": p["url"],
+                    "anchor": p.get("anchor"),
+                    "title": p.get("title"),
+                    "snippet": make_snippet(p["text"], terms),
+                    "score": round(score, 4),
+                    "source_id": p.get("source_id"),
+                }
+            )
+        return hits
+
+
+# ---------------------------------------------------------------------------
+# Indexer
+# ---------------------------------------------------------------------------
+
+class DocsIndexer:
+    def __init__(
+        self,
+        max_words: int = 120,
+        top_k: int = 3,
+        min_score: float = 0.0,
+        crawler: Any = None,
+        ranker: str = "auto",
+        dim: int = DEFAULT_DIM,
+        store: Any = None,
+    ):
+        from backend.src.services.crawler import SourceCrawler
+
+        self.max_words = max_words
+        self.ranker = ranker
+        self.dim = dim
+        self.top_k = top_k
+        self.min_score = min_score
+        self.crawler = crawler or SourceCrawler.from_env()
+        self.store = store
+        self.index = DocsIndex([], ranker=ranker, dim=dim)
+        self._passages_by_source: Dict[str, List[Dict[str, Any]]] = {}
+        self._urls: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+        self.builds = 0
+        self.last_build: Dict[str, Any] = {}
+        self.searches = 0
+        self.search_total_s = 0.0
+
+    @classmethod
+    def from_env(cls) -> "DocsIndexer":
+        return cls(
+            max_words=int(os.environ.get("DOCS_INDEX_PASSAGE_WORDS", "120")),
+            top_k=int(os.environ.get("DOCS_INDEX_TOP_K", "3")),
+            min_score=float(os.environ.get("DOCS_INDEX_MIN_SCORE", "0")),
+            ranker=os.environ.get("DOCS_RANKER", "auto").lower(),
+            dim=int(os.environ.get("DOCS_VECTOR_DIM", str(DEFAULT_DIM))),
+            store=_store_from_env(),
+        )
+
+    def _adopt(self, mapped) -> None:
+        """Serve a mapped store version, including its per-source ranges and crawler state."""
+        self.index = DocsIndex.from_store(mapped)
+        meta = mapped.meta
+        self._passages_by_source = {k: mapped.passages.view(a, b) for k, (a, b) in meta.get("sources", {}).items()}
+        self._urls = dict(meta.get("urls", {}))
+        self.crawler.state = dict(meta.get("crawler", {}))
+
+    def load_from_store(self) -> bool:
+        """Switch to the store's current version if it is newer than the one served."""
+        if self.store is None:
+            return False
+        version = self.store.current_version()
+        if version is None or version == self.index.version:
+            return False
+        replacing = len(self.index) > 0
+        self._adopt(self.store.load(version))
+        if replacing:
+            # Another worker published; local cached answers were grounded on the old version
+            from backend.src.services.cache_service import get_answer_cache
+
+            get_answer_cache().local.clear()
+        return True
+
+    def _publish(self, by_source: Dict[str, Any], crawler_state: Dict[str, Any]):
+        ranges, pos = {}, 0
+        for source_id, passages in by_source.items():
+            ranges[source_id] = [pos, pos + len(passages)]
+            pos += len(passages)
+        meta = {
+            "dim": self.index.vector.dim,
+            "priority_weight": self.index.priority_weight,
+            "sources": ranges,
+            "urls": self._urls,
+            "crawler": crawler_state,
+            "built_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        return self.store.publish(
+            self.index.passages, self.index.vector.columns, self.index.vector.idf, self.index.boost, meta
+        )
+
+    async def build(self, sources: Optional[List[Dict[str, Any]]] = None, force: bool = True) -> Dict[str, Any]:
+        """Index `sources` (default: the active sources registry) and swap in the new index.
+
+        With `force=False` (a re-crawl) unchanged pages are skipped via the
+        crawler's conditional requests and content hashes; the index is only
+        rebuilt, and `last_indexed` only updated, for sources that changed or
+        went away.
+        """
+        from backend.src.services.crawler import CHANGED, ERROR
+
+        if sources is None:
+            from backend.src.services.source_registry import get_source_registry
+
+            registry = get_source_registry()
+            await registry.ensure_loaded()
+            sources = list(registry.snapshot())
+
+        # With a shared store only one worker builds at a time; the others pick up its version
+        owner = self.store.try_lock() if self.store is not None else contextlib.nullcontext(True)
+        async with self._lock:
+            with owner as owned:
+                if not owned:
+                    return {"rebuilt": False, "busy": True, "version": self.index.version}
+                self.load_from_store()
+                start = time.perf_counter()
+                results = await self.crawler.fetch_all(sources, force=force)
+
+                keep = {str(s.get("id")) for s in sources}
+                removed = [k for k in self._passages_by_source if k not in keep]
+                for source_id in removed:
+                    self.crawler.forget(self._urls.pop(source_id, ""))
+                by_source = {k: v for k, v in self._passages_by_source.items() if k in keep}
+                changed_ids = []
+                for r in results:
+                    if r.status == CHANGED:
+                        source_id = str(r.source.get("id"))
+                        by_source[source_id] = make_passages(r.source, r.content, r.content_type, self.max_words)
+                        self._urls[source_id] = r.source["url"]
+                        changed_ids.append(r.source.get("id"))
+
+                rebuilt = bool(changed_ids or removed)
+                if rebuilt:
+                    index = DocsIndex([p for ps in by_source.values() for p in ps], ranker=self.ranker, dim=self.dim)
+                    self._passages_by_source = by_source
+                    self.index = index
+                    if self.store is not None and index.vector is not None:
+                        mapped = await asyncio.to_thread(self._publish, by_source, self.crawler.state_after(results))
+                        self._adopt(mapped)
+                    self.builds += 1
+                # Only now: had indexing failed, the pages must still look changed to the next crawl
+                self.crawler.commit(results)
+                if rebuilt:
+                    await _mark_indexed(changed_ids)
+                failed = sum(1 for r in results if r.status == ERROR)
+                self.last_build = {
+                    "sources": len(sources),
+                    "indexed": len(changed_ids),
+                    "skipped": len(sources) - len(changed_ids) - failed,
+                    "failed": failed,
+                    "removed": len(removed),
+                    "rebuilt": rebuilt,
+                    "passages": len(self.index),
+                    "version": self.index.version,
+                    "duration_ms": (time.perf_counter() - start) * 1000.0,
+                    "finished_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                }
+
+        if rebuilt:
+            # Cached answers were grounded on the previous index
+            from backend.src.services.cache_service import get_answer_cache
+
+            await get_answer_cache().invalidate()
+        return dict(self.last_build)
+
+    async def recrawl(self) -> Dict[str, Any]:
+        return await self.build(force=False)
+
+    def search(self, query: str, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        if self.store is not None and self.store.poll_due():
+            try:
+                self.load_from_store()
+            except Exception as e:
+                logger.warning("Could not load docs index version from store: %s", e)
+        start = time.perf_counter()
+        hits = self.index.search(query, k or self.top_k, self.min_score)
+        self.searches += 1
+        self.search_total_s += time.perf_counter() - start
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "passages": len(self.index),
+            "ranker": self.index.ranker,
+            "version": self.index.version,
+            "features": self.index.terms,
+            "sources": len(self._passages_by_source),
+            "builds": self.builds,
+            "last_build": dict(self.last_build) or None,
+            "searches": self.searches,
+            "search_avg_ms": (self.search_total_s / self.searches * 1000.0) if self.searches else 0.0,
+            "crawler": self.crawler.stats(),
+            "store": self.store.stats() if self.store is not None else None,
+        }
+
+
+def _store_from_env():
+    from backend.src.services.index_store import IndexStore
+
+    return IndexStore.from_env()
+
+
+async def _mark_indexed(source_ids: List[Any]) -> None:
+    """Set `last_indexed` on the sources that were fetched successfully (one UPDATE)."""
+    if not source_ids:
+        return
+    now = datetime.datetime.now(datetime.timezone.utc)
+    try:
+        from backend.src.db.crud import mark_sources_indexed
+
+        await mark_sources_indexed([str(i) for i in source_ids], now)
+        return
+    except Exception:
+        pass
+    from backend.src.services.sources_service import _SOURCES
+
+    ids = {str(i) for i in source_ids}
+    for source in _SOURCES:
+        if str(source.get("id")) in ids:
+            source["last_indexed"] = now.isoformat()
+
+
+_INDEXER: Optional[DocsIndexer] = None
+_TASK: Optional[asyncio.Task] = None
+
+
+def get_docs_indexer() -> DocsIndexer:
+    global _INDEXER
+    if _INDEXER is None:
+        _INDEXER = DocsIndexer.from_env()
+    return _INDEXER
+
+
+def docs_index_enabled() -> bool:
+    return os.environ.get("DOCS_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def search_docs(query: str) -> List[Dict[str, Any]]:
+    """Top passages for `query`, or [] when the index is disabled or empty."""
+    if not docs_index_enabled() or _INDEXER is None:
+        return []
+    return _INDEXER.search(query)
+
+
+async def start_docs_indexer() -> None:
+    """Start the background indexing task.
+
+    With DOCS_INDEX_ON_STARTUP it builds the index once right away. With
+    DOCS_RECRAWL_INTERVAL > 0 it re-crawls incrementally every that many seconds.
+    """
+    global _TASK
+    if not docs_index_enabled():
+        return
+    indexer = get_docs_indexer()
+    if indexer.store is not None:
+        try:
+            # Mapping the published index is cheap, whatever the corpus size
+            indexer.load_from_store()
+        except Exception:
+            logger.exception("Could not open docs index store %s", indexer.store.directory)
+    on_startup = os.environ.get("DOCS_INDEX_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+    interval = float(os.environ.get("DOCS_RECRAWL_INTERVAL", "0"))
+    if on_startup or interval > 0:
+        _TASK = asyncio.create_task(_index_loop(on_startup, interval), name="docs-index")
+
+
+async def _index_loop(on_startup: bool, interval: float) -> None:
+    indexer = get_docs_indexer()
+    if on_startup:
+        try:
+            # A version loaded from the store only needs an incremental re-crawl
+            await (indexer.recrawl() if indexer.index.version is not None else indexer.build())
+        except Exception:
+            logger.exception("Initial docs index build failed")
+    while interval > 0:
+        await asyncio.sleep(interval)
+        try:
+            summary = await indexer.recrawl()
+            logger.info("Docs re-crawl: %s", summary)
+        except Exception:
+            logger.exception("Docs re-crawl failed")
+
+
+async def stop_docs_indexer() -> None:
+    global _TASK
+    task, _TASK = _TASK, None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
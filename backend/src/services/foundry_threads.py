@@ -0,0 +1,177 @@
+"""Pre-warmed pool of agent threads for `/api/threads`.
+
+Creating a Foundry thread is a blocking `threads.create()` round trip. To keep
+it off the session-start path, a background task keeps up to THREAD_POOL_SIZE
+ready-made threads. `acquire()` hands one out immediately (a hit) and only falls
+back to creating a thread inline when the pool is empty (a miss).
+
+Threads that sit unused for longer than THREAD_POOL_IDLE_TTL seconds are dropped
+and deleted best-effort. On shutdown, `stop()` deletes the threads still in the
+pool, waiting at most THREAD_POOL_SHUTDOWN_TIMEOUT seconds, so restarts do not
+leak them. Backends without server-side threads (stub, REST) get
+a local id straight away and never start the pool.
+"""
+
+import asyncio
+import collections
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PrewarmedThreadPool:
+    def __init__(
+        self,
+        create: Callable[[], Awaitable[str]],
+        delete: Optional[Callable[[str], Awaitable[None]]] = None,
+        target_size: int = 8,
+        idle_ttl: float = 900.0,
+        refill_interval: float = 5.0,
+        shutdown_timeout: float = 5.0,
+    ):
+        self.create = create
+        self.delete = delete
+        self.target_size = max(0, target_size)
+        self.idle_ttl = idle_ttl
+        self.refill_interval = refill_interval
+        self.shutdown_timeout = shutdown_timeout
+        self._ready: Deque[Tuple[str, float]] = collections.deque()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.expired = 0
+        self.failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running or self.target_size == 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._refill_loop(), name="thread-pool-refill")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        unused = [thread_id for thread_id, _ in self._ready]
+        self._ready.clear()
+        if unused and self.delete is not None:
+            # Best-effort and bounded: shutdown must not hang on the agent service
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(self._delete_quietly(t) for t in unused)), timeout=self.shutdown_timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Timed out deleting %d pooled threads on shutdown", len(unused))
+
+    async def acquire(self) -> str:
+        from backend.src.observability import span
+
+        now = time.monotonic()
+        self._expire(now)
+        with span("thread_pool.acquire", {"thread_pool.hit": bool(self._ready)}):
+            if self._ready:
+                thread_id, _ = self._ready.popleft()
+                self.hits += 1
+            else:
+                self.misses += 1
+                thread_id = await self.create()
+                self.created += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return thread_id
+
+    def _expire(self, now: float) -> None:
+        # Oldest threads sit at the left of the deque
+        while self._ready and now - self._ready[0][1] > self.idle_ttl:
+            thread_id, _ = self._ready.popleft()
+            self.expired += 1
+            if self.delete is not None and self.running:
+                asyncio.ensure_future(self._delete_quietly(thread_id))
+
+    async def _delete_quietly(self, thread_id: str) -> None:
+        try:
+            await self.delete(thread_id)
+        except Exception as e:
+            logger.debug("Failed to delete idle thread %s: %s", thread_id, e)
+
+    async def _refill_loop(self) -> None:
+        while True:
+            self._expire(time.monotonic())
+            while len(self._ready) < self.target_size:
+                try:
+                    thread_id = await self.create()
+                except Exception as e:
+                    # Back off until the next interval (e.g. agent pool saturated)
+                    self.failures += 1
+                    logger.warning("Thread pre-warm failed: %s", e)
+                    break
+                self.created += 1
+                self._ready.append((thread_id, time.monotonic()))
+            self._wakeup.clear()
+            # Not wait_for: it can swallow a cancel from stop() that races with acquire()'s wakeup
+            waiter = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=self.refill_interval)
+            finally:
+                waiter.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        acquired = self.hits + self.misses
+        return {
+            "running": self.running,
+            "size": len(self._ready),
+            "target_size": self.target_size,
+            "idle_ttl_s": self.idle_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / acquired) if acquired else 0.0,
+            "created": self.created,
+            "expired": self.expired,
+            "failures": self.failures,
+        }
+
+
+_POOL: Optional[PrewarmedThreadPool] = None
+
+
+def get_thread_pool() -> PrewarmedThreadPool:
+    """Build the pool around the active agent backend (resolved once)."""
+    global _POOL
+    if _POOL is None:
+        from backend.src.services.agent_backends import get_agent_backends
+
+        backend = get_agent_backends()[0]
+        size = int(os.environ.get("THREAD_POOL_SIZE", "8")) if backend.supports_threads else 0
+        _POOL = PrewarmedThreadPool(
+            backend.create_thread,
+            delete=backend.delete_thread if backend.supports_threads else None,
+            target_size=size,
+            idle_ttl=float(os.environ.get("THREAD_POOL_IDLE_TTL", "900")),
+            refill_interval=float(os.environ.get("THREAD_POOL_REFILL_INTERVAL", "5")),
+            shutdown_timeout=float(os.environ.get("THREAD_POOL_SHUTDOWN_TIMEOUT", "5")),
+        )
+    return _POOL
+
+
+async def start_thread_pool() -> None:
+    await get_thread_pool().start()
+
+
+async def stop_thread_pool() -> None:
+    global _POOL
+    pool, _POOL = _POOL, None
+    if pool is not None:
+        await pool.stop()
@@ -0,0 +1,280 @@
+"""Versioned, memory-mapped on-disk store for the docs index.
+
+Each published index is one file, `docs-index-<version>.idx`. It is
+little-endian, and every block is 64-byte aligned:
+
+    header   magic, format, version, passage count, dim, (offset, length) per block
+    meta     JSON: index settings, passage range per source, crawler validators
+    idf      float32[dim]
+    weights  float32[passages]        priority boost per passage
+    vectors  float32[dim, passages]   L2-normalised hashed TF-IDF vectors, column-major
+    offsets  uint64[passages + 1]     record boundaries in the text block
+    text     one UTF-8 JSON record per passage (url, anchor, title, text, ...)
+
+Workers map the file read-only. The vector block is used in place through
+`numpy.frombuffer`, so every worker shares the same page-cache pages instead
+of holding a private copy. A passage record is decoded only when it is
+returned as a hit. Opening an index costs one `mmap` plus parsing the small
+meta block, however large the corpus.
+
+Publishing writes a temp file, fsyncs it, renames it into place, and then
+atomically replaces `CURRENT` with the new version number. Readers poll
+`CURRENT` at most every DOCS_INDEX_STORE_POLL seconds and swap to the new
+mapping. A mapping that is still open stays readable after its file is
+pruned.
+"""
+
+import contextlib
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+MAGIC = b"DOCSIDX1"
+# 2: the vector block is column-major (dim, passages), as `HashedTfidfRanker.columns`
+FORMAT = 2
+_ALIGN = 64
+_BLOCKS = ("meta", "idf", "weights", "vectors", "offsets", "text")
+_HEADER = struct.Struct("<8sIQII" + "QQ" * len(_BLOCKS))
+_HEADER_SIZE = 128
+
+
+def _pad(n: int) -> int:
+    return -n % _ALIGN
+
+
+class PassageTable:
+    """Read-only sequence of passage dicts, decoded from the text block on access."""
+
+    def __init__(self, buf, offsets, text_offset: int, start: int = 0, stop: Optional[int] = None):
+        self._buf = buf
+        self._offsets = offsets
+        self._text_offset = text_offset
+        self._start = start
+        self._stop = len(offsets) - 1 if stop is None else stop
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        i += self._start
+        a = self._text_offset + int(self._offsets[i])
+        b = self._text_offset + int(self._offsets[i + 1])
+        return json.loads(self._buf[a:b])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def view(self, start: int, stop: int) -> "PassageTable":
+        return PassageTable(self._buf, self._offsets, self._text_offset, self._start + start, self._start + stop)
+
+
+class MappedIndex:
+    __slots__ = ("path", "version", "dim", "meta", "idf", "weights", "columns", "passages", "nbytes")
+
+    def __init__(self, path, version, dim, meta, idf, weights, columns, passages, nbytes):
+        self.path = path
+        self.version = version
+        self.dim = dim
+        self.meta = meta
+        self.idf = idf
+        self.weights = weights
+        self.columns = columns
+        self.passages = passages
+        self.nbytes = nbytes
+
+
+def write_index(
+    path: str,
+    version: int,
+    passages: List[Dict[str, Any]],
+    columns,
+    idf,
+    weights,
+    meta: Dict[str, Any],
+) -> int:
+    """Write one index file to `path` (via a temp file and rename); return its size."""
+    dim, n = columns.shape
+    records = [json.dumps(p, separators=(",", ":"), default=str).encode("utf-8") for p in passages]
+    offsets = np.zeros(n + 1, dtype="<u8")
+    if records:
+        offsets[1:] = np.cumsum([len(r) for r in records])
+    blocks = {
+        "meta": json.dumps(meta, separators=(",", ":"), default=str).encode("utf-8"),
+        "idf": np.ascontiguousarray(idf, dtype="<f4").tobytes(),
+        "weights": np.ascontiguousarray(weights, dtype="<f4").tobytes(),
+        "vectors": np.ascontiguousarray(columns, dtype="<f4").tobytes(),
+        "offsets": offsets.tobytes(),
+        "text": b"".join(records),
+    }
+
+    layout = []
+    pos = _HEADER_SIZE
+    for name in _BLOCKS:
+        layout += [pos, len(blocks[name])]
+        pos += len(blocks[name]) + _pad(len(blocks[name]))
+    header = _HEADER.pack(MAGIC, FORMAT, version, n, dim, *layout)
+
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as fh:
+        fh.write(header + b"\0" * (_HEADER_SIZE - len(header)))
+        for name in _BLOCKS:
+            fh.write(blocks[name])
+            fh.write(b"\0" * _pad(len(blocks[name])))
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+    return pos
+
+
+def open_index(path: str) -> MappedIndex:
+    """Map an index file read-only; arrays and passages are views into the mapping."""
+    with open(path, "rb") as fh:
+        buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    fields = _HEADER.unpack_from(buf, 0)
+    magic, fmt, version, n, dim = fields[:5]
+    if magic != MAGIC or fmt != FORMAT:
+        raise ValueError(f"{path}: not a docs index (format {fmt})")
+    block = {name: (fields[5 + 2 * i], fields[6 + 2 * i]) for i, name in enumerate(_BLOCKS)}
+
+    def array(name, dtype, count):
+        return np.frombuffer(buf, dtype=dtype, count=count, offset=block[name][0])
+
+    meta_off, meta_len = block["meta"]
+    offsets = array("offsets", "<u8", n + 1)
+    return MappedIndex(
+        path=path,
+        version=version,
+        dim=dim,
+        meta=json.loads(buf[meta_off:meta_off + meta_len]),
+        idf=array("idf", "<f4", dim),
+        weights=array("weights", "<f4", n),
+        columns=array("vectors", "<f4", dim * n).reshape(dim, n),
+        passages=PassageTable(buf, offsets, block["text"][0]),
+        nbytes=len(buf),
+    )
+
+
+class IndexStore:
+    """Directory of index versions plus the `CURRENT` pointer."""
+
+    def __init__(self, directory: str, keep: int = 2, poll_interval: float = 2.0):
+        self.directory = directory
+        self.keep = max(1, keep)
+        self.poll_interval = poll_interval
+        self._checked_at = 0.0
+        self.publishes = 0
+        self.loads = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["IndexStore"]:
+        directory = os.environ.get("DOCS_INDEX_STORE_DIR")
+        if not directory or np is None:
+            return None
+        return cls(
+            directory,
+            keep=int(os.environ.get("DOCS_INDEX_STORE_KEEP", "2")),
+            poll_interval=float(os.environ.get("DOCS_INDEX_STORE_POLL", "2")),
+        )
+
+    def path_for(self, version: int) -> str:
+        return os.path.join(self.directory, f"docs-index-{version}.idx")
+
+    def current_version(self) -> Optional[int]:
+        try:
+            with open(os.path.join(self.directory, "CURRENT")) as fh:
+                return int(fh.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def poll_due(self) -> bool:
+        """True at most once per poll interval; keeps the `CURRENT` check off most searches."""
+        now = time.monotonic()
+        if now - self._checked_at < self.poll_interval:
+            return False
+        self._checked_at = now
+        return True
+
+    def load(self, version: Optional[int] = None) -> Optional[MappedIndex]:
+        version = self.current_version() if version is None else version
+        if version is None:
+            return None
+        mapped = open_index(self.path_for(version))
+        self.loads += 1
+        return mapped
+
+    @contextlib.contextmanager
+    def try_lock(self):
+        """Yield True if this process holds the build lock, False if another one does."""
+        if fcntl is None:
+            yield True
+            return
+        with open(os.path.join(self.directory, ".lock"), "a") as fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def publish(self, passages, columns, idf, weights, meta: Dict[str, Any]) -> MappedIndex:
+        """Write a new version, point `CURRENT` at it, prune old files, and map it."""
+        version = max([self.current_version() or 0] + self._versions()) + 1
+        write_index(self.path_for(version), version, passages, columns, idf, weights, meta)
+        pointer = os.path.join(self.directory, "CURRENT")
+        tmp = f"{pointer}.tmp.{os.getpid()}"
+        with open(tmp, "w") as fh:
+            fh.write(f"{version}\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, pointer)
+        self.publishes += 1
+        self._prune(version)
+        return self.load(version)
+
+    def _versions(self) -> List[int]:
+        versions = []
+        for name in os.listdir(self.directory):
+            if name.startswith("docs-index-") and name.endswith(".idx"):
+                try:
+                    versions.append(int(name[len("docs-index-"):-len(".idx")]))
+                except ValueError:
+                    pass
+        return sorted(versions)
+
+    def _prune(self, current: int) -> None:
+        for version in self._versions():
+            if version <= current - self.keep:
+                with contextlib.suppress(OSError):
+                    os.remove(self.path_for(version))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "current_version": self.current_version(),
+            "versions": self._versions(),
+            "publishes": self.publishes,
+            "loads": self.loads,
+            "poll_interval_s": self.poll_interval,
+        }
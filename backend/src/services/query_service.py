@@ -1,198 +1,231 @@
 """Query service: prototype implementation with STUB_MODE support and optional Azure agent integration.
 
 When STUB_MODE=true (default), returns canned responses for local testing.
-When STUB_MODE=false, attempts to call azure.ai.agents library or the provided
-AI_FOUNDRY_ENDPOINT with AI_FOUNDRY_API_KEY. This implementation is best-effort
-and will raise clear errors if the configuration is missing.
+When STUB_MODE=false, calls the agent through the backend chain resolved once by
+`agent_backends` (azure.ai.agents SDK, then a REST POST to AI_FOUNDRY_ENDPOINT).
+This implementation is best-effort and will raise clear errors if the
+configuration is missing.
+
+`create_thread` hands out a conversation thread id from the pre-warmed pool in
+`foundry_threads`.
+
+`stream_query` is the streaming counterpart of `run_query`: it yields answer
+text as the agent produces it and finishes with a summary frame carrying
+`citations`, `confidence` and `fallback`.
+
+Both first look the query up in the local docs index (`docs_index`). The top
+passages are passed to the agent as `candidates`. Numbered `[n]` markers and
+URLs in the answer become its citations (`answer_extractor`); when the agent
+cites nothing, the candidates are used instead.
 """
 
-import os
-import asyncio
 import logging
-import importlib
-from typing import Dict, Any
+import time
+from typing import Dict, Any, AsyncIterator, Optional
+
+from backend.src.metrics import AGENT_CALLS, AGENT_FIRST_TOKEN
+from backend.src.observability import end_span, span, start_span
+from backend.src.services.agent_backends import get_agent_backends
+from backend.src.services.answer_extractor import CitationExtractor
+from backend.src.services.agent_executor import AgentOverloadedError
+from backend.src.services.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 
-async def _maybe_await(value):
-    if asyncio.iscoroutine(value):
-        return await value
-    return value
+_QUERY_FLIGHT = SingleFlight()
 
 
-async def run_query(request: Dict[str, Any]) -> Dict[str, Any]:
-    """Run a query and return a response conforming to the contract.
+def query_coalescing_stats() -> Dict[str, Any]:
+    return _QUERY_FLIGHT.stats()
 
-    Behavior:
-    - If STUB_MODE is enabled (default), return a canned response.
-    - Otherwise, try the Azure Agents SDK (if installed). If that fails, try a
-      simple HTTP POST to AI_FOUNDRY_ENDPOINT with AI_FOUNDRY_API_KEY.
 
-    The function strives to be robust to different SDK versions and REST
-    response shapes by using heuristics to locate the human-readable answer.
+async def run_query(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a query, serving repeated questions from the two-tier answer cache.
+
+    The cache key is the normalized query text plus `page_context.sectionId`
+    (see `cache_service.make_cache_key`). Fallback answers are not cached.
+    Requests with a `thread_id` bypass the cache: the answer depends on the
+    conversation so far, and the message must reach the thread.
+    On a miss, concurrent requests with the same key share one agent call;
+    threaded requests are never coalesced, each runs on its own thread.
     """
-    stub = os.environ.get("STUB_MODE", "true").lower() in ("1", "true", "yes")
-
-    if stub:
-        # Return a canned response matching the contract
-        return {
-            "answer": "Stubbed answer: see https://docs.microsoft.com/azure/managed-grafana for details.",
-            "citations": [
-                {
-                    "url": "https://docs.microsoft.com/azure/managed-grafana",
-                    "anchor": "getting-started",
-                    "snippet": "Use the Azure portal to create a Managed Grafana workspace...",
-                }
-            ],
-            "confidence": 0.92,
-            "fallback": False,
-            "anchors": ["getting-started"],
-        }
-
-    api_key = os.environ.get("AI_FOUNDRY_API_KEY")
-    endpoint = os.environ.get("AI_FOUNDRY_ENDPOINT")
-
-    if not api_key or not endpoint:
-        raise RuntimeError("AI_FOUNDRY_ENDPOINT and AI_FOUNDRY_API_KEY are required when STUB_MODE is False")
-
-    # FIRST: attempt to use the azure.ai.agents SDK (best-effort)
+    from backend.src.services.cache_service import get_answer_cache, make_cache_key
+
+    cache = get_answer_cache()
+    key = make_cache_key(request)
+    threaded = bool(request.get("thread_id"))
+    cached = None if threaded else await cache.get(key)
+    if cached is not None:
+        return _with_caller_thread(cached, request)
+
+    ran_here = False
+
+    async def compute() -> Dict[str, Any]:
+        nonlocal ran_here
+        ran_here = True
+        grounded = _with_candidates(request)
+        result = _ground(await _run_agent_query(grounded), grounded)
+        if not threaded:
+            await _cache_result(cache, key, result)
+        return result
+
+    if threaded:
+        return await compute()
+    # Each waiter gets its own copy of the shared result
+    result = dict(await _QUERY_FLIGHT.do(key, compute))
+    return result if ran_here else _with_caller_thread(result, request)
+
+
+def _with_caller_thread(result: Dict[str, Any], request: Dict[str, Any]) -> Dict[str, Any]:
+    """Never hand one session's thread id to another; echo the caller's own instead."""
+    result = {k: v for k, v in result.items() if k != "thread_id"}
+    if request.get("thread_id"):
+        result["thread_id"] = request["thread_id"]
+    return result
+
+
+def _with_candidates(request: Dict[str, Any]) -> Dict[str, Any]:
+    from backend.src.services.docs_index import search_docs
+
     try:
-        agents_mod = importlib.import_module("azure.ai.agents")
-        # Look for a plausible client class
-        client_cls = None
-        for candidate in ("AgentsClient", "AgentClient", "AgentServiceClient", "AgentRuntimeClient"):
-            if hasattr(agents_mod, candidate):
-                client_cls = getattr(agents_mod, candidate)
-                break
-
-        if client_cls is not None:
-            # Try to construct with AzureKeyCredential when available
-            try:
-                from azure.core.credentials import AzureKeyCredential
-
-                creds = AzureKeyCredential(api_key)
-                client = client_cls(endpoint, creds)
-            except Exception:
-                # Fallback to trying the simpler constructor
-                try:
-                    client = client_cls(endpoint, api_key)
-                except Exception:
-                    # Give up on SDK client construction path
-                    raise
-
-            prompt_text = request.get("query", "")
-
-            # Find a plausible invocation method on the client
-            method = None
-            for candidate in (
-                "get_response",
-                "get_responses",
-                "begin_get_responses",
-                "run",
-                "begin_run",
-                "invoke",
-                "invoke_agent",
-                "create_response",
-            ):
-                if hasattr(client, candidate):
-                    method = getattr(client, candidate)
-                    break
-
-            # Some SDKs might expose a `responses` property that is itself callable
-            if method is None and hasattr(client, "responses"):
-                method = getattr(client, "responses")
-
-            if method is None:
-                raise RuntimeError("Found azure.ai.agents client but no known invocation method")
-
-            # Call the method and await if it returns a coroutine
-            try:
-                out = method(prompt_text) if callable(method) else method
-                resp = await _maybe_await(out)
-            except Exception as e:
-                logger.exception("Error invoking agent SDK method: %s", e)
-                raise
-
-            # Extract human-friendly answer text using heuristics
-            answer = None
-            if isinstance(resp, dict):
-                for key in ("output", "answer", "result", "content", "text", "generated_text"):
-                    if key in resp:
-                        answer = resp[key]
-                        break
-                if answer is None and "choices" in resp and isinstance(resp["choices"], list) and resp["choices"]:
-                    ch = resp["choices"][0]
-                    if isinstance(ch, dict):
-                        if "message" in ch and isinstance(ch["message"], dict):
-                            answer = ch["message"].get("content") or ch["message"].get("text")
-                        else:
-                            answer = ch.get("text") or str(ch)
-            else:
-                # Non-dict responses -> stringify
-                answer = str(resp)
-
-            if not answer:
-                answer = "(no text returned by agent)"
-
-            return {
-                "answer": answer,
-                "citations": [],
-                "confidence": 0.5,
-                "fallback": False,
-            }
+        candidates = search_docs(request.get("query", ""))
     except Exception as e:
-        # SDK path failed; log and continue to REST fallback
-        logger.exception("Azure Agents SDK integration not available or failed: %s", e)
+        logger.warning("Docs index search failed: %s", e)
+        candidates = []
+    return dict(request, candidates=candidates) if candidates else request
+
+
+def _ground(result: Dict[str, Any], request: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill citations/anchors from the docs-index candidates when the agent gave none."""
+    candidates = request.get("candidates")
+    if candidates and not result.get("citations") and not result.get("fallback"):
+        result = dict(result)
+        result["citations"] = [{"url": c["url"], "anchor": c.get("anchor"), "snippet": c.get("snippet")} for c in candidates]
+        result["anchors"] = result.get("anchors") or [c["anchor"] for c in candidates if c.get("anchor")]
+    return result
 
-    # SECOND: fallback to a simple HTTP call to the configured endpoint
-    try:
-        headers = {"Content-Type": "application/json"}
-        # Try common header names for Azure/OpenAI style services
-        headers["api-key"] = api_key
-        headers.setdefault("Authorization", f"Bearer {api_key}")
 
-        payload = {"input": request.get("query", "")}
+async def _cache_result(cache, key: str, result: Dict[str, Any]) -> None:
+    if not result.get("fallback"):
+        # thread ids are per-session and must never be shared via the cache
+        await cache.set(key, {k: v for k, v in result.items() if k != "thread_id"})
 
-        # Import httpx lazily so STUB_MODE=true environments don't need it installed
+
+async def _run_agent_query(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a query against the resolved agent backend chain.
+
+    Each backend is tried in order (e.g. SDK, then REST); the first successful
+    response is returned.
+    """
+    last_error = None
+    for backend in get_agent_backends():
+        start = time.perf_counter()
         try:
-            import httpx
-        except Exception:
-            raise RuntimeError(
-                "httpx is required for non-stub REST requests. Install with: pip install httpx"
-            )
-
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            resp = await client.post(endpoint, headers=headers, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
-
-            answer = None
-            if isinstance(data, dict):
-                # openai-style choices
-                if "choices" in data and isinstance(data["choices"], list) and data["choices"]:
-                    choice = data["choices"][0]
-                    if isinstance(choice, dict):
-                        if "message" in choice and isinstance(choice["message"], dict):
-                            answer = choice["message"].get("content") or choice["message"].get("text")
-                        else:
-                            answer = choice.get("text") or str(choice)
-                # Try common top-level fields
-                if not answer:
-                    for key in ("answer", "output", "result", "content", "generated_text", "text"):
-                        if key in data:
-                            val = data[key]
-                            if isinstance(val, dict):
-                                answer = val.get("output") or val.get("text") or str(val)
-                            else:
-                                answer = val
-                            break
-
-            if answer is None:
-                # Fallback to raw JSON string
-                answer = str(data)
-
-            return {"answer": answer, "citations": [], "confidence": 0.5, "fallback": False}
+            with span("agent.invoke", {"agent.backend": backend.name}):
+                result = await backend.invoke(request)
+            AGENT_CALLS.observe(time.perf_counter() - start, backend.name, "invoke", "ok")
+            return result
+        except AgentOverloadedError:
+            AGENT_CALLS.observe(time.perf_counter() - start, backend.name, "invoke", "overloaded")
+            # Admission control must shed load, not spill it onto the next backend
+            raise
+        except Exception as e:
+            AGENT_CALLS.observe(time.perf_counter() - start, backend.name, "invoke", "error")
+            last_error = e
+            logger.warning("Agent backend '%s' failed, trying next: %s", backend.name, e)
+
+    logger.error("All agent backends failed: %s", last_error)
+    raise RuntimeError("Agent call failed; ensure AI_FOUNDRY_API_KEY and AI_FOUNDRY_ENDPOINT are set, or use STUB_MODE=true") from last_error
+
+
+async def stream_query(request: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+    """Stream a query as frames: `{"type": "token", "text": ...}` then one `{"type": "final", ...}`.
+
+    The final frame carries `citations`, `confidence`, `fallback` and `anchors`
+    (plus the full `answer`). Errors after the stream started are reported as
+    a `{"type": "error", "detail": ...}` frame instead of raising;
+    `AgentOverloadedError` is raised before the first frame when the agent
+    pool is saturated. As in `run_query`, threaded requests bypass the cache.
+    """
+    from backend.src.services.cache_service import get_answer_cache, make_cache_key
+
+    cache = get_answer_cache()
+    key = make_cache_key(request)
+    threaded = bool(request.get("thread_id"))
+    cached = None if threaded else await cache.get(key)
+    if cached is not None:
+        yield {"type": "token", "text": cached.get("answer", "")}
+        yield _final_frame(cached)
+        return
+
+    try:
+        backends = get_agent_backends()
     except Exception as e:
-        logger.exception("Failed to call AI_FOUNDRY_ENDPOINT: %s", e)
-        raise RuntimeError("Agent call failed; ensure AI_FOUNDRY_API_KEY and AI_FOUNDRY_ENDPOINT are set, or use STUB_MODE=true") from e
+        yield {"type": "error", "detail": str(e)}
+        return
+
+    request = _with_candidates(request)
+    result = None
+    for backend in backends:
+        # Markers and URLs are picked up as tokens pass through, not by re-reading the answer
+        extractor = CitationExtractor(request.get("candidates"))
+        # Not made current: the stream is resumed from other tasks, which can't detach it
+        trace_span = start_span("agent.stream", {"agent.backend": backend.name})
+        start = time.perf_counter()
+        first = True
+        try:
+            async for piece in backend.stream(request):
+                if first:
+                    AGENT_FIRST_TOKEN.observe(time.perf_counter() - start, backend.name)
+                    if trace_span is not None:
+                        trace_span.add_event("first_token")
+                    first = False
+                extractor.feed(piece)
+                yield {"type": "token", "text": piece}
+        except AgentOverloadedError as e:
+            AGENT_CALLS.observe(time.perf_counter() - start, backend.name, "stream", "overloaded")
+            end_span(trace_span, error=e)
+            if extractor.answer:
+                yield {"type": "error", "detail": "Agent stream interrupted"}
+                return
+            raise
+        except Exception as e:
+            AGENT_CALLS.observe(time.perf_counter() - start, backend.name, "stream", "error")
+            end_span(trace_span, error=e)
+            logger.warning("Agent backend '%s' stream failed: %s", backend.name, e)
+            if extractor.answer:
+                # Output already reached the client; a fallback would duplicate it
+                yield {"type": "error", "detail": "Agent stream interrupted"}
+                return
+            continue
+        AGENT_CALLS.observe(time.perf_counter() - start, backend.name, "stream", "ok")
+        end_span(trace_span, **{"agent.answer_chars": len(extractor.answer)})
+        result = _ground(backend.build_result(extractor.answer, request, extractor), request)
+        break
+
+    if result is None:
+        yield {"type": "error", "detail": "Agent call failed"}
+        return
+
+    if not threaded:
+        await _cache_result(cache, key, result)
+    yield _final_frame(result)
+
+
+def _final_frame(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "final",
+        "answer": result.get("answer", ""),
+        "citations": result.get("citations", []),
+        "confidence": result.get("confidence", 0.0),
+        "fallback": result.get("fallback", False),
+        "anchors": result.get("anchors"),
+    }
+
+
+async def create_thread(pseudo_user_id: Optional[str] = None) -> Dict[str, str]:
+    """Return a thread id for a new sidebar session without waiting on thread creation."""
+    from backend.src.services.foundry_threads import get_thread_pool
+
+    return {"thread_id": await get_thread_pool().acquire()}
@@ -0,0 +1,55 @@
+"""Single-flight request coalescing.
+
+Concurrent callers that use the same key share one in-flight call and all
+receive its result (or its exception). The shared call runs as its own task, so
+a caller that disconnects and gets cancelled does not cancel the work the
+other callers are waiting on.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.coalesced += 1
+            self._waiters[key] += 1
+            if self._waiters[key] > self.max_waiters:
+                self.max_waiters = self._waiters[key]
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+            self._waiters.pop(key, None)
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "waiting": sum(self._waiters.values()),
+            "max_waiters": self.max_waiters,
+            "coalescing_ratio": (self.coalesced / self.calls) if self.calls else 0.0,
+        }
@@ -0,0 +1,204 @@
+"""In-process snapshot of active sources, shared by every request on a worker.
+
+Readers call `get_source_registry().snapshot()`, which returns an immutable,
+priority-ordered tuple without touching the database. The snapshot is
+rebuilt:
+
+- right away, in the worker that changed the sources (`invalidate()`);
+- in every other worker, when Postgres delivers a NOTIFY on
+  SOURCE_REGISTRY_CHANNEL. Statement-level triggers on `sources` send it
+  (see `db/schema.py`), so writes from psql or other services count too;
+- every SOURCE_REGISTRY_REFRESH_INTERVAL seconds, in case a notification was
+  missed (e.g. while the LISTEN connection was reconnecting).
+
+A notification also clears this worker's local answer cache tier, since
+cached answers may depend on the old sources. The exception is the
+"INDEXED" payload: an UPDATE that only set `last_indexed` after a crawl
+changes no source an answer depends on.
+
+A dropped LISTEN connection is noticed through asyncpg's termination
+listener, so the worker reconnects (and refreshes) right away rather than at
+the next refresh interval.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payload of statements that only set `last_indexed`
+INDEXED_PAYLOAD = "INDEXED"
+
+
+class SourceRegistry:
+    def __init__(self, refresh_interval: float = 60.0, channel: str = "sources_changed"):
+        self.refresh_interval = refresh_interval
+        self.channel = channel
+        self._snapshot: Tuple[Dict[str, Any], ...] = ()
+        self._etag = self._compute_etag(())
+        self.version = 0
+        self.loaded = False
+        self.refreshed_at: Optional[float] = None
+        self.refreshes = 0
+        self.notifications = 0
+        self.listening = False
+        self._dirty: Optional[asyncio.Event] = None
+        self._tasks: list = []
+
+    @staticmethod
+    def _compute_etag(snapshot) -> str:
+        digest = hashlib.sha256(json.dumps(snapshot, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f'"{digest[:32]}"'
+
+    def snapshot(self) -> Tuple[Dict[str, Any], ...]:
+        return self._snapshot
+
+    @property
+    def etag(self) -> str:
+        return self._etag
+
+    async def _load(self):
+        try:
+            from backend.src.db.crud import list_active_sources
+
+            return await list_active_sources()
+        except Exception:
+            from backend.src.services.sources_service import _SOURCES
+
+            return sorted((s for s in _SOURCES if s.get("active", True)), key=lambda s: (s["priority"], s["id"]))
+
+    async def refresh(self) -> None:
+        rows = await self._load()
+        snapshot = tuple(dict(r) for r in rows)
+        etag = self._compute_etag(snapshot)
+        # Swap in one assignment so readers never see a half-built snapshot
+        if etag != self._etag:
+            self._snapshot, self._etag = snapshot, etag
+            self.version += 1
+        self.loaded = True
+        self.refreshed_at = time.time()
+        self.refreshes += 1
+
+    async def ensure_loaded(self) -> None:
+        if not self.loaded:
+            await self.refresh()
+
+    async def invalidate(self) -> None:
+        """Rebuild now (used after writes in this worker)."""
+        await self.refresh()
+
+    def _on_notify(self, connection=None, pid=None, channel=None, payload=None) -> None:
+        self.notifications += 1
+        if payload != INDEXED_PAYLOAD:
+            from backend.src.services.cache_service import get_answer_cache
+
+            get_answer_cache().local.clear()
+        if self._dirty is not None:
+            self._dirty.set()
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            # Not wait_for: it can swallow a cancel from stop() that races with a NOTIFY
+            waiter = asyncio.ensure_future(self._dirty.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=self.refresh_interval)
+            finally:
+                waiter.cancel()
+            self._dirty.clear()
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Source registry refresh failed: %s", e)
+
+    async def _listen_loop(self, dsn: str) -> None:
+        import asyncpg
+
+        backoff = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(dsn)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _conn: lost.set())
+                await conn.add_listener(self.channel, self._on_notify)
+                self.listening = True
+                backoff = 1.0
+                # Anything written while we were not listening
+                self._dirty.set()
+                await lost.wait()
+                logger.warning("Source registry LISTEN connection lost; reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Source registry LISTEN failed (retrying in %.0fs): %s", backoff, e)
+            finally:
+                self.listening = False
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._dirty = asyncio.Event()
+        await self.refresh()
+        self._tasks.append(asyncio.create_task(self._refresh_loop(), name="source-registry-refresh"))
+        dsn = os.environ.get("DATABASE_URL")
+        if dsn:
+            try:
+                import asyncpg  # noqa: F401
+            except ImportError:
+                logger.info("asyncpg not installed; source registry relies on periodic refresh")
+            else:
+                dsn = dsn.replace("+asyncpg", "")
+                self._tasks.append(asyncio.create_task(self._listen_loop(dsn), name="source-registry-listen"))
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._snapshot),
+            "version": self.version,
+            "etag": self._etag,
+            "refreshed_at": self.refreshed_at,
+            "refreshes": self.refreshes,
+            "notifications": self.notifications,
+            "listening": self.listening,
+            "refresh_interval_s": self.refresh_interval,
+        }
+
+
+_REGISTRY: Optional[SourceRegistry] = None
+
+
+def get_source_registry() -> SourceRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = SourceRegistry(
+            refresh_interval=float(os.environ.get("SOURCE_REGISTRY_REFRESH_INTERVAL", "60")),
+            channel=os.environ.get("SOURCE_REGISTRY_CHANNEL", "sources_changed"),
+        )
+    return _REGISTRY
+
+
+async def start_source_registry() -> None:
+    await get_source_registry().start()
+
+
+async def stop_source_registry() -> None:
+    if _REGISTRY is not None:
+        await _REGISTRY.stop()
@@ -1,14 +1,28 @@
 """Minimal in-memory Admin Sources service for prototype.
 
 This service provides add/list operations and is a placeholder for a DB-backed
-implementation (to be added later in `backend/src/db.py`).
+implementation (to be added later in `backend/src/db/`).
 """
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlsplit
 from uuid import uuid4
 
 _SOURCES: List[Dict] = []
 
+# The docs crawler fetches these; anything else (file://, ftp://, ...) is refused
+ALLOWED_URL_SCHEMES = ("http", "https")
+
+
+def validate_source_url(url: Any) -> str:
+    """Return `url` if it is an absolute http(s) URL, else raise ValueError."""
+    if not isinstance(url, str):
+        raise ValueError("url must be a string")
+    parts = urlsplit(url.strip())
+    if parts.scheme.lower() not in ALLOWED_URL_SCHEMES or not parts.netloc:
+        raise ValueError("url must be an absolute http:// or https:// URL")
+    return url.strip()
+
 
 async def add_source(payload) -> Dict[str, Any]:
     """Add a source using DB CRUD helpers when available; otherwise fall back to in-memory."""
@@ -19,7 +33,9 @@ async def add_source(payload) -> Dict[str, Any]:
     try:
         from backend.src.db.crud import create_source
 
-        return await create_source(url, title=title, priority=priority)
+        created = await create_source(url, title=title, priority=priority)
+        await _sources_changed()
+        return created
     except Exception:
         # Fallback to in-memory store
         source = {
@@ -31,9 +47,57 @@ async def add_source(payload) -> Dict[str, Any]:
             "active": True,
         }
         _SOURCES.append(source)
+        await _sources_changed()
         return source
 
 
+async def upsert_sources(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Create-or-update many sources keyed on URL in one round trip.
+
+    Returns one outcome per input item, in order: `created`, `updated`, or
+    `superseded` when a later item in the same batch has the same URL (the
+    last occurrence wins, as if the items were applied one by one).
+    """
+    last_index = {item["url"]: i for i, item in enumerate(items)}
+    unique = [item for i, item in enumerate(items) if last_index[item["url"]] == i]
+    try:
+        from backend.src.db.crud import upsert_sources_bulk
+
+        applied = await upsert_sources_bulk(unique)
+    except Exception:
+        applied = [_upsert_in_memory(item) for item in unique]
+    if unique:
+        await _sources_changed()
+
+    by_url = {item["url"]: outcome for item, outcome in zip(unique, applied)}
+    results = []
+    for i, item in enumerate(items):
+        if last_index[item["url"]] != i:
+            results.append({"status": "superseded", "url": item["url"]})
+        else:
+            outcome = by_url[item["url"]]
+            results.append({"status": outcome["status"], "url": item["url"], "id": outcome["source"]["id"]})
+    return results
+
+
+def _upsert_in_memory(item: Dict[str, Any]) -> Dict[str, Any]:
+    priority = 100 if item.get("priority") is None else item["priority"]
+    for source in _SOURCES:
+        if source["url"] == item["url"]:
+            source.update(title=item.get("title"), priority=priority, active=True)
+            return {"status": "updated", "source": source}
+    source = {
+        "id": str(uuid4()),
+        "url": item["url"],
+        "title": item.get("title"),
+        "priority": priority,
+        "last_indexed": None,
+        "active": True,
+    }
+    _SOURCES.append(source)
+    return {"status": "created", "source": source}
+
+
 async def list_sources() -> List[Dict[str, Any]]:
     try:
         from backend.src.db.crud import list_sources_db
@@ -43,6 +107,27 @@ async def list_sources() -> List[Dict[str, Any]]:
         return list(_SOURCES)
 
 
+async def list_sources_page(
+    limit: int = 100, cursor: Optional[str] = None, active: Optional[bool] = None
+) -> Dict[str, Any]:
+    """Keyset-paginated sources ordered by (priority, id); raises ValueError on a bad cursor."""
+    from backend.src.pagination import build_page, clamp_limit, decode_cursor
+
+    limit = clamp_limit(limit)
+    after = decode_cursor(cursor, 2) if cursor else None
+    try:
+        from backend.src.db.crud import list_sources_page as list_sources_page_db
+
+        return await list_sources_page_db(limit, after=after, active=active)
+    except Exception:
+        rows = sorted(_SOURCES, key=lambda r: (r["priority"], r["id"]))
+        if active is not None:
+            rows = [r for r in rows if r.get("active", True) == active]
+        if after is not None:
+            rows = [r for r in rows if (r["priority"], r["id"]) > (int(after[0]), str(after[1]))]
+        return build_page(rows[: limit + 1], limit, lambda r: [r["priority"], r["id"]])
+
+
 async def clear_sources() -> None:
     # Try DB path first
     try:
@@ -56,7 +141,21 @@ async def clear_sources() -> None:
                 pass
         # Also clear in-memory
         _SOURCES.clear()
+        await _sources_changed()
         return
     except Exception:
         _SOURCES.clear()
+        await _sources_changed()
         return
+
+
+async def _sources_changed() -> None:
+    """Rebuild this worker's source registry and drop cached answers that may depend on the old sources.
+
+    Other workers are told through the `sources` NOTIFY trigger (see `source_registry`).
+    """
+    from backend.src.services.cache_service import get_answer_cache
+    from backend.src.services.source_registry import get_source_registry
+
+    await get_answer_cache().invalidate()
+    await get_source_registry().invalidate()
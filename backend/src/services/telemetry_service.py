@@ -1,32 +1,152 @@
 """Telemetry service: record usage events to in-memory store or DB (prototype).
 
-This implementation records events in an in-memory list for local dev. Later,
-this should persist to Postgres using `backend/src/db.py`.
+When the background `TelemetryWriter` is running (started by the app lifespan)
+events are only enqueued here and written to Postgres in multi-row batches.
+When the writer is not running they are inserted directly; without a DB they
+go to an in-memory list for local dev.
+
+Every write also updates the analytics rollups (`analytics_service`) in the
+same transaction, or in memory.
+
+Events are validated against `UsageEvent` before they are queued, so a
+malformed event is rejected at the endpoint instead of failing a batch later.
+If the multi-row INSERT still fails, the batch is retried row by row; only
+the rows Postgres rejects are dropped (logged, and counted as `rejected` by
+the writer).
 """
 
-from typing import Dict, Any
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
 
 _USAGE_EVENTS = []
+_WRITER = None
 
 
-async def record_event(event: Dict[str, Any]) -> None:
+def normalize_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate one `/api/telemetry`-style event as a `UsageEvent` dict; raises ValueError."""
+    from backend.src.models.usage_events import usage_event_from_telemetry
+
+    if not isinstance(event, dict):
+        raise ValueError("event must be a JSON object")
+    ue = usage_event_from_telemetry(event)
     try:
-        from backend.src.db.crud import create_usage_event
+        return ue.model_dump(exclude_none=True)
+    except AttributeError:
+        # Fallback for Pydantic v1 compatibility
+        return ue.dict(exclude_none=True)
 
-        await create_usage_event(event)
-        return
-    except Exception:
-        # Fallback to in-memory
-        pass
 
+def _store_in_memory(event: Dict[str, Any]) -> None:
     import uuid, datetime
 
     e = dict(event)
     e.setdefault("id", str(uuid.uuid4()))
-    e.setdefault("event_time", datetime.datetime.utcnow().isoformat())
+    if isinstance(e.get("event_time"), datetime.datetime):
+        e["event_time"] = e["event_time"].isoformat()
+    e.setdefault("event_time", datetime.datetime.now(datetime.timezone.utc).isoformat())
     _USAGE_EVENTS.append(e)
 
 
+def _db_configured() -> bool:
+    try:
+        from backend.src.db import get_sessionmaker
+
+        return get_sessionmaker() is not None
+    except Exception:
+        return False
+
+
+async def _persist_batch(batch: List[Dict[str, Any]]) -> int:
+    """Writer sink: one multi-row INSERT plus rollups, or the in-memory stores without a DB.
+
+    Returns how many events Postgres rejected.
+    """
+    import datetime
+    from backend.src.services.analytics_service import aggregate, get_rollup_store
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    # Stamp once so the raw rows and the rollup buckets agree on the time
+    batch = [e if e.get("event_time") else dict(e, event_time=now) for e in batch]
+    rollups = aggregate(batch)
+    if not _db_configured():
+        for event in batch:
+            _store_in_memory(event)
+        get_rollup_store().apply(rollups)
+        return 0
+
+    from backend.src.db.crud import create_usage_events_bulk
+
+    try:
+        await create_usage_events_bulk(batch, rollups=rollups)
+        return 0
+    except Exception as e:
+        if len(batch) == 1:
+            raise
+        logger.warning("Multi-row insert of %d usage events failed (%s); retrying row by row", len(batch), e)
+
+    rejected = 0
+    last_error: Optional[Exception] = None
+    for event in batch:
+        try:
+            await create_usage_events_bulk([event], rollups=aggregate([event]))
+        except Exception as e:
+            rejected += 1
+            last_error = e
+            logger.warning("Usage event rejected by the database (%s): %s", e, event)
+    if rejected == len(batch):
+        # Nothing went in: more likely the database than the rows
+        raise last_error
+    return rejected
+
+
+def get_telemetry_writer():
+    global _WRITER
+    if _WRITER is None:
+        from backend.src.services.telemetry_writer import TelemetryWriter
+
+        _WRITER = TelemetryWriter.from_env(_persist_batch)
+    return _WRITER
+
+
+async def start_writer() -> None:
+    await get_telemetry_writer().start()
+
+
+async def stop_writer() -> None:
+    if _WRITER is not None:
+        await _WRITER.stop()
+
+
+async def record_event(event: Dict[str, Any]) -> bool:
+    """Validate and record one event; returns False only if the writer queue dropped it.
+
+    Raises ValueError for an invalid event.
+    """
+    event = normalize_event(event)
+    writer = _WRITER
+    if writer is not None and writer.running:
+        return await writer.enqueue(event)
+
+    await _persist_batch([event])
+    return True
+
+
+async def record_events(events: List[Dict[str, Any]]) -> int:
+    """Validate and record a batch of events in one round trip; returns how many were accepted.
+
+    Raises ValueError if any event is invalid (nothing is recorded then).
+    """
+    events = [normalize_event(e) for e in events]
+    writer = _WRITER
+    if writer is not None and writer.running:
+        return await writer.enqueue_many(events)
+
+    await _persist_batch(events)
+    return len(events)
+
+
 async def list_events() -> list:
     try:
         from backend.src.db.crud import list_usage_events
@@ -36,18 +156,59 @@ async def list_events() -> list:
         return list(_USAGE_EVENTS)
 
 
+async def list_events_page(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    event_type: Optional[str] = None,
+    pseudo_user_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Keyset-paginated usage events, newest first; raises ValueError on a bad cursor or timestamp."""
+    from backend.src.pagination import build_page, clamp_limit, decode_cursor, parse_time
+
+    limit = clamp_limit(limit)
+    after = decode_cursor(cursor, 2) if cursor else None
+    since_dt, until_dt = parse_time(since), parse_time(until)
+    after_key = (parse_time(after[0]), str(after[1])) if after else None
+    try:
+        from backend.src.db.crud import list_usage_events_page
+
+        return await list_usage_events_page(
+            limit, after=after, event_type=event_type, pseudo_user_id=pseudo_user_id, since=since_dt, until=until_dt
+        )
+    except Exception:
+        pass
+
+    def key(e):
+        return (parse_time(e["event_time"]), e["id"])
+
+    rows = []
+    for e in sorted(_USAGE_EVENTS, key=key, reverse=True):
+        if event_type is not None and e.get("event_type", e.get("event")) != event_type:
+            continue
+        if pseudo_user_id is not None and e.get("pseudo_user_id") != pseudo_user_id:
+            continue
+        t = key(e)
+        if (since_dt is not None and t[0] < since_dt) or (until_dt is not None and t[0] >= until_dt):
+            continue
+        if after_key is not None and t >= after_key:
+            continue
+        rows.append(e)
+        if len(rows) > limit:
+            break
+    return build_page(rows, limit, lambda e: [e["event_time"], e["id"]])
+
+
 async def clear_events() -> None:
+    """Delete all usage events and rollups with one TRUNCATE (in-memory stores without a DB)."""
+    from backend.src.services.analytics_service import get_rollup_store
+
     try:
-        from backend.src.db.crud import list_usage_events, delete_usage_event
-
-        rows = await list_usage_events(limit=1000)
-        for r in rows:
-            try:
-                await delete_usage_event(r.get("id"))
-            except Exception:
-                pass
-        _USAGE_EVENTS.clear()
-        return
+        from backend.src.db.crud import truncate_usage_events
+
+        await truncate_usage_events()
     except Exception:
-        _USAGE_EVENTS.clear()
-        return
+        pass
+    _USAGE_EVENTS.clear()
+    get_rollup_store().clear()
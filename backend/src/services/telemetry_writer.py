@@ -0,0 +1,190 @@
+"""Background telemetry writer: bounded asyncio queue flushed in batches.
+
+`/api/telemetry` only enqueues; a single background task drains the queue and
+hands batches to a sink (multi-row INSERT via `telemetry_service`), flushing
+when `batch_size` events are pending or `flush_interval` seconds have passed.
+The sink may return how many events of the batch it rejected; those are
+counted as `rejected` rather than `flushed_events`.
+
+When the queue is full the writer either drops the event (TELEMETRY_OVERFLOW=drop,
+the default) or waits up to TELEMETRY_ENQUEUE_TIMEOUT seconds for room
+(TELEMETRY_OVERFLOW=block) before dropping. Drops are counted. `stop()` signals
+the flusher, which writes its pending batch and whatever is still queued, then
+exits.
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Sink = Callable[[List[Dict[str, Any]]], Awaitable[Optional[int]]]
+
+
+class TelemetryWriter:
+    def __init__(
+        self,
+        sink: Sink,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        overflow: str = "drop",
+        enqueue_timeout: float = 0.05,
+    ):
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed_events = 0
+        self.rejected = 0
+        self.flush_batches = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+
+    @classmethod
+    def from_env(cls, sink: Sink) -> "TelemetryWriter":
+        return cls(
+            sink,
+            max_queue=int(os.environ.get("TELEMETRY_QUEUE_MAX", "10000")),
+            batch_size=int(os.environ.get("TELEMETRY_BATCH_SIZE", "500")),
+            flush_interval=float(os.environ.get("TELEMETRY_FLUSH_INTERVAL", "1.0")),
+            overflow=os.environ.get("TELEMETRY_OVERFLOW", "drop").lower(),
+            enqueue_timeout=float(os.environ.get("TELEMETRY_ENQUEUE_TIMEOUT", "0.05")),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="telemetry-writer")
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out everything still queued."""
+        task, self._task = self._task, None
+        if task is not None:
+            # Not cancelled: the flusher may hold a dequeued batch it has yet to write
+            self._stopping.set()
+            await task
+        if self._queue is not None:
+            while not self._queue.empty():
+                batch = self._take_nowait(self.batch_size)
+                await self._flush(batch)
+
+    async def enqueue(self, event: Dict[str, Any]) -> bool:
+        """Queue one event; returns False if it was dropped."""
+        event = dict(event)
+        # Stamp at enqueue time so delayed flushes keep the real event time
+        event.setdefault("event_time", datetime.datetime.now(datetime.timezone.utc))
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            if self.overflow != "block":
+                self.dropped += 1
+                return False
+            try:
+                await asyncio.wait_for(self._queue.put(event), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                return False
+        self.enqueued += 1
+        return True
+
+    async def enqueue_many(self, events: List[Dict[str, Any]]) -> int:
+        accepted = 0
+        for event in events:
+            accepted += await self.enqueue(event)
+        return accepted
+
+    def _take_nowait(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _get(self, timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        """Next queued event; None after `timeout` or, once stopping, when the queue is empty."""
+        if not self._queue.empty():
+            return self._queue.get_nowait()
+        if self._stopping.is_set():
+            return None
+        getter = asyncio.ensure_future(self._queue.get())
+        stopper = asyncio.ensure_future(self._stopping.wait())
+        try:
+            await asyncio.wait({getter, stopper}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stopper.cancel()
+            if not getter.done():
+                # An event handed to a cancelled get() stays in the queue
+                getter.cancel()
+        return getter.result() if getter.done() and not getter.cancelled() else None
+
+    async def _run(self) -> None:
+        while True:
+            first = await self._get(None)
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                batch.extend(self._take_nowait(self.batch_size - len(batch)))
+                if len(batch) >= self.batch_size or self._stopping.is_set():
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                event = await self._get(remaining)
+                if event is None:
+                    break
+                batch.append(event)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            rejected = await self.sink(batch) or 0
+            self.rejected += rejected
+            self.flushed_events += len(batch) - rejected
+            self.flush_batches += 1
+        except Exception as e:
+            self.flush_errors += 1
+            logger.warning("Telemetry flush of %d events failed: %s", len(batch), e)
+        finally:
+            self.last_flush_ms = (time.perf_counter() - start) * 1000.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "overflow": self.overflow,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "flushed_events": self.flushed_events,
+            "rejected": self.rejected,
+            "flush_batches": self.flush_batches,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": self.last_flush_ms,
+        }
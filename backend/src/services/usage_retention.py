@@ -0,0 +1,193 @@
+"""Partition maintenance and retention for `usage_events`.
+
+`usage_events` is range-partitioned by `event_time`, one partition per month
+(`usage_events_pYYYYMM`) plus a DEFAULT partition as a safety net (see
+`scripts/init_db.py`). A background task started by the app lifespan:
+
+- creates the current month's partition and USAGE_EVENTS_PARTITIONS_AHEAD
+  future months, so inserts never land in the default partition;
+- drops whole partitions that end before now - USAGE_EVENTS_RETENTION_DAYS.
+
+Dropping a partition is a catalog operation whose cost does not depend on how
+many rows it holds, unlike `DELETE ... WHERE event_time < ...`. Without a DB
+the in-memory event list is trimmed to the same retention window instead.
+Each run also prunes per-minute analytics rollups (`analytics_service`).
+"""
+
+import asyncio
+import datetime
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "usage_events"
+_PARTITION_RE = re.compile(r"^usage_events_p(\d{4})(\d{2})$")
+
+_TASK: Optional[asyncio.Task] = None
+_LAST_RUN: Dict[str, Any] = {}
+
+
+def month_start(dt: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(dt.year, dt.month, 1, tzinfo=datetime.timezone.utc)
+
+
+def add_months(dt: datetime.datetime, months: int) -> datetime.datetime:
+    index = dt.year * 12 + (dt.month - 1) + months
+    return datetime.datetime(index // 12, index % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def partition_name(start: datetime.datetime) -> str:
+    return f"{PARENT_TABLE}_p{start:%Y%m}"
+
+
+def partition_ddl(start: datetime.datetime) -> str:
+    end = add_months(start, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def partitions_to_create(now: datetime.datetime, ahead: int) -> List[datetime.datetime]:
+    current = month_start(now)
+    return [add_months(current, i) for i in range(max(0, ahead) + 1)]
+
+
+def upcoming_partitions_ddl(now: Optional[datetime.datetime] = None) -> List[str]:
+    """DDL for the current month's partition and USAGE_EVENTS_PARTITIONS_AHEAD future ones."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return [partition_ddl(start) for start in partitions_to_create(now, _settings()["partitions_ahead"])]
+
+
+def expired_partitions(names: List[str], cutoff: datetime.datetime) -> List[str]:
+    """Monthly partitions whose whole range lies before `cutoff`."""
+    expired = []
+    for name in names:
+        m = _PARTITION_RE.match(name)
+        if not m:
+            continue
+        start = datetime.datetime(int(m.group(1)), int(m.group(2)), 1, tzinfo=datetime.timezone.utc)
+        if add_months(start, 1) <= cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+def _settings() -> Dict[str, Any]:
+    return {
+        "retention_days": int(os.environ.get("USAGE_EVENTS_RETENTION_DAYS", "90")),
+        "partitions_ahead": int(os.environ.get("USAGE_EVENTS_PARTITIONS_AHEAD", "3")),
+        "interval_s": float(os.environ.get("USAGE_EVENTS_MAINTENANCE_INTERVAL", "3600")),
+    }
+
+
+async def _maintain_db(now: datetime.datetime, retention_days: int, ahead: int) -> Dict[str, Any]:
+    from backend.src.db import get_engine
+    from sqlalchemy import text
+
+    engine = get_engine()
+    if engine is None:
+        raise RuntimeError("DATABASE_URL not configured")
+
+    created: List[str] = []
+    dropped: List[str] = []
+    async with engine.begin() as conn:
+        relkind = await conn.scalar(
+            text("SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(:name)"), {"name": PARENT_TABLE}
+        )
+        if relkind != "p":
+            # Table predates partitioning (or does not exist); see scripts/init_db.py
+            return {"partitioned": False, "created": created, "dropped": dropped}
+
+        existing = set(
+            (
+                await conn.execute(
+                    text(
+                        "SELECT c.relname FROM pg_inherits i "
+                        "JOIN pg_class c ON c.oid = i.inhrelid "
+                        "WHERE i.inhparent = to_regclass(:name)"
+                    ),
+                    {"name": PARENT_TABLE},
+                )
+            ).scalars()
+        )
+        for start in partitions_to_create(now, ahead):
+            name = partition_name(start)
+            if name not in existing:
+                await conn.execute(text(partition_ddl(start)))
+                created.append(name)
+
+        if retention_days > 0:
+            cutoff = now - datetime.timedelta(days=retention_days)
+            for name in expired_partitions(sorted(existing), cutoff):
+                await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped.append(name)
+    return {"partitioned": True, "created": created, "dropped": dropped}
+
+
+def _trim_in_memory(now: datetime.datetime, retention_days: int) -> int:
+    from backend.src.pagination import parse_time
+    from backend.src.services import telemetry_service
+
+    if retention_days <= 0:
+        return 0
+    cutoff = now - datetime.timedelta(days=retention_days)
+    events = telemetry_service._USAGE_EVENTS
+    kept = [e for e in events if parse_time(e.get("event_time")) is None or parse_time(e["event_time"]) >= cutoff]
+    removed = len(events) - len(kept)
+    events[:] = kept
+    return removed
+
+
+async def run_maintenance(now: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+    """Create upcoming partitions and drop expired ones (or trim the in-memory store)."""
+    settings = _settings()
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    try:
+        result = await _maintain_db(now, settings["retention_days"], settings["partitions_ahead"])
+        result["backend"] = "postgres"
+    except Exception as e:
+        logger.debug("usage_events partition maintenance skipped: %s", e)
+        result = {"backend": "memory", "purged": _trim_in_memory(now, settings["retention_days"])}
+    from backend.src.services.analytics_service import prune_rollups
+
+    try:
+        result["rollups_pruned"] = await prune_rollups(now)
+    except Exception:
+        logger.exception("Pruning analytics rollups failed")
+    result["ran_at"] = now.isoformat()
+    _LAST_RUN.clear()
+    _LAST_RUN.update(result)
+    return result
+
+
+async def _loop(interval: float) -> None:
+    while True:
+        try:
+            await run_maintenance()
+        except Exception:
+            logger.exception("usage_events partition maintenance failed")
+        await asyncio.sleep(interval)
+
+
+async def start_partition_maintenance() -> None:
+    global _TASK
+    if _TASK is None or _TASK.done():
+        _TASK = asyncio.create_task(_loop(_settings()["interval_s"]), name="usage-events-maintenance")
+
+
+async def stop_partition_maintenance() -> None:
+    global _TASK
+    task, _TASK = _TASK, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def maintenance_status() -> Dict[str, Any]:
+    return {**_settings(), "running": _TASK is not None and not _TASK.done(), "last_run": dict(_LAST_RUN) or None}
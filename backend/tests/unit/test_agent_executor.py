@@ -0,0 +1,50 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import asyncio
+import threading
+import time
+import pytest
+from backend.src.services.agent_executor import AgentExecutor, AgentOverloadedError
+
+
+@pytest.mark.asyncio
+async def test_blocking_calls_run_off_loop_with_concurrency_cap():
+    executor = AgentExecutor(max_concurrency=2, max_queue=10, max_wait=5)
+    executor.start()
+    peak = 0
+    running = 0
+    lock = threading.Lock()
+
+    def blocking():
+        nonlocal peak, running
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return threading.current_thread().name
+
+    names = await asyncio.gather(*(executor.run(blocking) for _ in range(6)))
+    assert peak == 2
+    assert all(n.startswith("agent") for n in names)
+    assert executor.stats()["wait_max_ms"] > 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_queue_full_or_wait_times_out():
+    executor = AgentExecutor(max_concurrency=1, max_queue=1, max_wait=0.05)
+    executor.start()
+    results = await asyncio.gather(*(executor.run(time.sleep, 0.2) for _ in range(3)), return_exceptions=True)
+
+    errors = [r for r in results if isinstance(r, AgentOverloadedError)]
+    assert len(errors) == 2
+    assert all(e.retry_after >= 1 for e in errors)
+    stats = executor.stats()
+    assert stats["rejected_queue_full"] == 1 and stats["rejected_timeout"] == 1
+    executor.shutdown()
@@ -0,0 +1,104 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import datetime
+
+import pytest
+
+from backend.src.services import analytics_service, telemetry_service
+
+UTC = datetime.timezone.utc
+T0 = datetime.datetime(2026, 10, 18, 9, 30, 15, tzinfo=UTC)
+
+
+def _events():
+    return [
+        {"event_type": "query", "event_time": T0, "confidence": 0.92, "query_hash": "h1"},
+        {"event_type": "query", "event_time": T0 + datetime.timedelta(seconds=20), "confidence": 0.15, "query_hash": "h1",
+         "metadata": {"fallback": True}},
+        {"event_type": "query", "event_time": T0 + datetime.timedelta(minutes=2), "confidence": 1.0, "query_hash": "h2"},
+        {"event_type": "click", "event_time": T0 + datetime.timedelta(minutes=2)},
+    ]
+
+
+@pytest.fixture
+def rollups():
+    telemetry_service._USAGE_EVENTS.clear()
+    analytics_service.get_rollup_store().clear()
+    yield analytics_service.get_rollup_store()
+    telemetry_service._USAGE_EVENTS.clear()
+    analytics_service.get_rollup_store().clear()
+
+
+def test_aggregate_buckets_by_minute_and_day():
+    delta = analytics_service.aggregate(_events())
+    minute = delta.buckets[("minute", T0.replace(second=0), "query")]
+    assert minute[:4] == [2, 1, 2, pytest.approx(1.07)]
+    assert minute[4][1] == 1 and minute[4][9] == 1
+    day = delta.buckets[("day", T0.replace(hour=0, minute=0, second=0), "query")]
+    assert day[0] == 3 and day[4][9] == 2
+    assert dict(delta.queries) == {(T0.replace(hour=0, minute=0, second=0), "h1"): 2,
+                                   (T0.replace(hour=0, minute=0, second=0), "h2"): 1}
+
+
+@pytest.mark.asyncio
+async def test_analytics_are_served_from_rollups(rollups):
+    await telemetry_service.record_events(_events()[:2])
+    await telemetry_service.record_events(_events()[2:])
+    # Rollups are maintained as events are written; raw events are not read
+    telemetry_service._USAGE_EVENTS.clear()
+
+    since, until = T0 - datetime.timedelta(hours=1), T0 + datetime.timedelta(hours=1)
+    result = await analytics_service.get_analytics(since.isoformat(), until.isoformat())
+    assert result["granularity"] == "minute" and result["backend"] == "memory"
+    totals = result["totals"]
+    assert totals["events"] == 4 and totals["by_event_type"] == {"query": 3, "click": 1}
+    assert totals["fallback_rate"] == pytest.approx(0.25)
+    assert totals["confidence"]["count"] == 3
+    assert [b["count"] for b in totals["confidence"]["histogram"]] == [0, 1, 0, 0, 0, 0, 0, 0, 0, 2]
+    assert [p["events"] for p in result["series"]] == [2, 2]
+    assert result["top_queries"] == [{"query_hash": "h1", "events": 2}, {"query_hash": "h2", "events": 1}]
+
+    daily = await analytics_service.get_analytics(
+        (T0 - datetime.timedelta(days=7)).isoformat(), until.isoformat(), event_type="query"
+    )
+    assert daily["granularity"] == "day" and len(daily["series"]) == 1
+    assert daily["totals"]["events"] == 3
+
+
+@pytest.mark.asyncio
+async def test_minute_rollups_are_pruned_and_bad_input_rejected(rollups, monkeypatch):
+    monkeypatch.setenv("ANALYTICS_MINUTE_RETENTION_DAYS", "7")
+    rollups.apply(analytics_service.aggregate(_events()))
+    assert await analytics_service.prune_rollups(T0 + datetime.timedelta(days=8)) == 3
+    assert {k[0] for k in rollups.buckets} == {"day"}
+
+    with pytest.raises(ValueError):
+        await analytics_service.get_analytics(T0.isoformat(), (T0 - datetime.timedelta(hours=1)).isoformat())
+    with pytest.raises(ValueError):
+        await analytics_service.get_analytics(granularity="hour")
+
+
+@pytest.mark.asyncio
+async def test_malformed_event_does_not_abort_the_batch_rollup(rollups):
+    from backend.src.services.telemetry_writer import TelemetryWriter
+
+    bad = [
+        {"event_type": "query", "event_time": T0, "confidence": "high"},
+        {"event_type": "query", "event_time": "yesterday-ish", "confidence": float("nan")},
+        {"event_type": "query", "event_time": 12345, "confidence": [0.5], "query_hash": {"h": 1}},
+    ]
+    delta = analytics_service.aggregate(_events() + bad)
+    minute = delta.buckets[("minute", T0.replace(second=0), "query")]
+    # The first bad event still counts, without a confidence
+    assert minute[:3] == [3, 1, 2]
+
+    writer = TelemetryWriter(telemetry_service._persist_batch, batch_size=100, flush_interval=0.01)
+    await writer.start()
+    await writer.enqueue_many(_events() + bad)
+    await writer.stop()
+    assert writer.flush_errors == 0 and writer.flushed_events == 7
+    assert sum(v[0] for k, v in rollups.buckets.items() if k[0] == "day") == 7
@@ -0,0 +1,100 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+
+from backend.src.services import agent_backends
+from backend.src.services.agent_backends import AgentBackend
+from backend.src.services.answer_extractor import CitationExtractor, ResponseShape, extract_citations
+
+CANDIDATES = [
+    {"url": "https://learn.example/grafana", "anchor": "create-workspace", "snippet": "Open the Azure portal."},
+    {"url": "https://learn.example/alerts", "anchor": None, "snippet": "Alerting sends notifications."},
+]
+ANSWER = (
+    "Create the workspace in the portal [1], then configure alerting [2][1]. "
+    "More at https://learn.example/alerts#contact-points. Unrelated [7]."
+)
+
+
+def test_markers_and_urls_become_citations():
+    ex = extract_citations(ANSWER, CANDIDATES)
+    assert ex.markers == [1, 2, 7]
+    assert ex.citations() == [
+        {"url": "https://learn.example/grafana", "anchor": "create-workspace", "snippet": "Open the Azure portal."},
+        {"url": "https://learn.example/alerts", "anchor": None, "snippet": "Alerting sends notifications."},
+        {"url": "https://learn.example/alerts", "anchor": "contact-points", "snippet": None},
+    ]
+    assert ex.anchors() == ["create-workspace", "contact-points"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 11])
+def test_chunked_stream_matches_buffered(size):
+    ex = CitationExtractor(CANDIDATES)
+    for i in range(0, len(ANSWER), size):
+        ex.feed(ANSWER[i:i + size])
+    assert ex.answer == ANSWER
+    assert ex.citations() == extract_citations(ANSWER, CANDIDATES).citations()
+
+
+def test_response_shape_is_detected_once_per_backend():
+    shape = ResponseShape()
+    assert shape.answer({"choices": [{"message": {"content": "one"}}]}) == "one"
+    assert shape.answer({"choices": [{"message": {"content": "two"}}]}) == "two"
+    assert shape.detections == 1 and shape.describe()["answer"] == "choices.0.message.content"
+
+    # A different shape is re-detected and remembered
+    assert shape.answer({"output": [{"content": [{"text": "three"}]}]}) == "three"
+    assert shape.describe()["answer"] == "output.0.content.0.text"
+
+    assert ResponseShape().answer({"unknown": 1}) == "{'unknown': 1}"
+
+
+def test_delta_shape_skips_role_only_frames():
+    shape = ResponseShape()
+    frames = [
+        {"choices": [{"delta": {"role": "assistant"}}]},
+        {"choices": [{"delta": {"content": "Hel"}}]},
+        {"choices": [{"delta": {"content": "lo"}}]},
+        {"choices": [{"delta": {}, "finish_reason": "stop"}]},
+    ]
+    assert "".join(shape.delta(f) for f in frames) == "Hello"
+    assert shape.detections == 1
+
+
+class _CitingBackend(AgentBackend):
+    name = "citing"
+
+    async def invoke(self, request):
+        answer = "".join([piece async for piece in self.stream(request)])
+        return self.build_result(answer, request)
+
+    async def stream(self, request):
+        for piece in ("See the portal [", "1] or https://learn.ex", "ample/alerts."):
+            yield piece
+
+
+@pytest.fixture
+def citing_backend(monkeypatch):
+    monkeypatch.setenv("STUB_MODE", "false")
+    monkeypatch.setenv("AGENT_BACKENDS", "citing")
+    agent_backends.register_backend("citing", _CitingBackend)
+    agent_backends.resolve_agent_backends(force=True)
+    yield
+    monkeypatch.undo()
+    agent_backends.resolve_agent_backends(force=True)
+
+
+@pytest.mark.asyncio
+async def test_stream_query_reports_cited_sources(citing_backend, monkeypatch):
+    from backend.src.services import query_service
+
+    monkeypatch.setattr(query_service, "_with_candidates", lambda r: dict(r, candidates=CANDIDATES))
+    frames = [f async for f in query_service.stream_query({"query": "citation stream question"})]
+    final = frames[-1]
+    assert final["type"] == "final"
+    assert [c["url"] for c in final["citations"]] == ["https://learn.example/grafana", "https://learn.example/alerts"]
+    assert final["anchors"] == ["create-workspace"]
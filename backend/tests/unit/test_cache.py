@@ -0,0 +1,44 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+from backend.src.services.cache_service import AnswerCache, LRUTTLCache, make_cache_key
+
+
+def test_cache_key_normalizes_query_and_section():
+    a = make_cache_key({"query": "  Grafana vs Azure Monitor? ", "page_context": {"sectionId": "faq"}})
+    b = make_cache_key({"query": "grafana   vs azure monitor", "page_context": {"sectionId": "faq"}})
+    c = make_cache_key({"query": "grafana vs azure monitor", "page_context": {"sectionId": "pricing"}})
+    assert a == b
+    assert a != c
+
+
+def test_lru_ttl_cache_evicts_and_expires():
+    cache = LRUTTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.evictions == 1
+
+    cache.set("d", 4, ttl_seconds=0)
+    assert cache.get("d") is None
+    assert cache.expirations == 1
+
+
+@pytest.mark.asyncio
+async def test_answer_cache_local_tier_and_invalidate():
+    cache = AnswerCache(max_entries=8, ttl_seconds=60, shared_enabled=False)
+    assert await cache.get("k") is None
+    await cache.set("k", {"answer": "x"})
+    assert (await cache.get("k"))["answer"] == "x"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+    await cache.invalidate()
+    assert await cache.get("k") is None
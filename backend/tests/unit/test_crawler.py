@@ -0,0 +1,127 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+
+from backend.src.services import docs_index
+from backend.src.services.crawler import SourceCrawler
+
+
+class FakeSite:
+    """Local HTTP stand-in that honours If-None-Match and records per-host concurrency."""
+
+    def __init__(self, pages):
+        self.pages = dict(pages)
+        self.requests = 0
+        self.active = {}
+        self.max_active = {}
+
+    def etag_for(self, path):
+        return '"%s"' % hashlib.md5(self.pages[path].encode()).hexdigest()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.requests += 1
+        self.active[host] = self.active.get(host, 0) + 1
+        self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+        try:
+            await asyncio.sleep(0.01)
+            etag = self.etag_for(request.url.path)
+            if request.headers.get("if-none-match") == etag:
+                return httpx.Response(304, headers={"ETag": etag})
+            return httpx.Response(
+                200, text=self.pages[request.url.path], headers={"ETag": etag, "Content-Type": "text/html"}
+            )
+        finally:
+            self.active[host] -= 1
+
+
+def _sources(n, host="docs.example.com"):
+    return [{"id": f"s{i}", "url": f"https://{host}/p{i}", "title": None, "priority": 100} for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_recrawl_skips_unchanged_and_reindexes_changed(monkeypatch):
+    site = FakeSite({f"/p{i}": f"<h2 id='p{i}'>Page {i}</h2><p>content number {i}</p>" for i in range(4)})
+    client = httpx.AsyncClient(transport=httpx.MockTransport(site.handler))
+    indexer = docs_index.DocsIndexer(crawler=SourceCrawler(concurrency=4, per_host=2, client=client))
+    sources = _sources(4)
+
+    first = await indexer.build(sources)
+    assert first["indexed"] == 4 and first["rebuilt"] is True
+
+    site.pages["/p1"] = "<h2 id='p1'>Page 1</h2><p>refreshed grafana dashboards</p>"
+    second = await indexer.build(sources, force=False)
+    assert second["indexed"] == 1 and second["skipped"] == 3
+    assert indexer.crawler.last_run["not_modified"] == 3
+    assert indexer.search("refreshed dashboards")[0]["anchor"] == "p1"
+
+    third = await indexer.build(sources, force=False)
+    assert third["rebuilt"] is False
+    assert indexer.crawler.stats()["skip_rate"] > 0.5
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_content_hash_skips_200_with_identical_body():
+    site = FakeSite({"/p0": "<p>same</p>"})
+    client = httpx.AsyncClient(transport=httpx.MockTransport(site.handler))
+    crawler = SourceCrawler(client=client)
+    source = _sources(1)[0]
+    first = await crawler.fetch(source)
+    assert first.status == "changed"
+    crawler.commit([first])
+    crawler.state[source["url"]]["etag"] = None  # server stops honouring validators
+    assert (await crawler.fetch(source)).status == "unchanged"
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_per_host_limit_is_respected():
+    pages = {f"/p{i}": "<p>x</p>" for i in range(6)}
+    site = FakeSite(pages)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(site.handler))
+    crawler = SourceCrawler(concurrency=10, per_host=2, client=client)
+    await crawler.fetch_all(_sources(6, "a.example.com") + _sources(6, "b.example.com"))
+    assert site.max_active == {"a.example.com": 2, "b.example.com": 2}
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_non_http_sources_are_never_read(tmp_path):
+    secret = tmp_path / "leak.md"
+    secret.write_text("AI_FOUNDRY_API_KEY=supersecret123")
+    crawler = SourceCrawler(client=httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(500))))
+    result = await crawler.fetch({"id": "s1", "url": f"file://{secret}"})
+    assert result.status == "error" and result.content is None
+    assert crawler.bytes_fetched == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_index_build_does_not_mark_pages_crawled(monkeypatch):
+    site = FakeSite({"/p0": "<h2 id='p0'>Page 0</h2><p>alerting contact points</p>"})
+    client = httpx.AsyncClient(transport=httpx.MockTransport(site.handler))
+    indexer = docs_index.DocsIndexer(crawler=SourceCrawler(client=client))
+    sources = _sources(1)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("passage splitter crashed")
+
+    with monkeypatch.context() as m:
+        m.setattr(docs_index, "make_passages", broken)
+        with pytest.raises(RuntimeError):
+            await indexer.build(sources)
+    assert indexer.crawler.state == {}
+
+    summary = await indexer.build(sources, force=False)
+    assert summary["indexed"] == 1 and summary["rebuilt"] is True
+    assert indexer.search("contact points")[0]["anchor"] == "p0"
+    assert indexer.crawler.state[sources[0]["url"]]["etag"] == site.etag_for("/p0")
+    await client.aclose()
@@ -0,0 +1,48 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import sqlite3
+
+from fastapi.testclient import TestClient
+from backend.src import db
+
+
+def test_engine_kwargs_follow_env(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "5")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "false")
+    monkeypatch.setenv("DB_STATEMENT_CACHE_SIZE", "0")
+    kwargs = db._engine_kwargs("postgresql+asyncpg://u:p@h/db", db.pool_settings())
+    assert kwargs["poolclass"] is db.TimedQueuePool
+    assert kwargs["pool_size"] == 20 and kwargs["max_overflow"] == 5
+    assert kwargs["pool_pre_ping"] is False
+    assert kwargs["connect_args"] == {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+
+    monkeypatch.setenv("DB_POOL_CLASS", "null")
+    kwargs = db._engine_kwargs("postgresql+asyncpg://u:p@h/db", db.pool_settings())
+    assert kwargs["poolclass"] is db.NullPool and "pool_size" not in kwargs
+
+
+def test_timed_pool_records_checkouts_and_overflow():
+    before = db._POOL_STATS.checkouts
+    pool = db.TimedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=1)
+    first, second = pool.connect(), pool.connect()
+    assert pool.checkedout() == 2 and pool.overflow() == 1
+    first.close()
+    second.close()
+    assert db._POOL_STATS.checkouts == before + 2
+    assert db._POOL_STATS.snapshot()["checkout_max_ms"] >= 0
+
+
+def test_admin_db_pool_endpoint_without_database():
+    from backend.src.app import app
+
+    client = TestClient(app)
+    r = client.get("/api/admin/db/pool")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["configured"] is False
+    assert body["settings"]["pool_size"] > 0
@@ -0,0 +1,107 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import datetime
+import uuid
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from backend.src import db
+from backend.src.db import crud, models, schema
+from backend.src.services.analytics_service import aggregate
+from backend.src.services.usage_retention import partition_ddl
+
+
+def _sql(stmt) -> str:
+    return " ".join(str(stmt.compile(dialect=postgresql.dialect())).split())
+
+
+def test_db_is_a_package_exposing_models_and_crud():
+    assert db.Base is models.Base
+    assert {"sources", "usage_events", "usage_rollups", "usage_query_rollups", "answer_cache"} <= set(db.Base.metadata.tables)
+    assert db.create_source is crud.create_source
+
+
+def test_source_upsert_and_keyset_statements_compile():
+    sql = _sql(crud._upsert_sources_stmt([{"url": "https://a.example"}, {"url": "https://b.example", "priority": 5}]))
+    assert sql.startswith("INSERT INTO sources (url, title, priority, active) VALUES")
+    assert "ON CONFLICT (url) DO UPDATE SET title = excluded.title" in sql
+    assert "RETURNING" in sql and "(xmax = 0) AS inserted" in sql
+
+    sql = _sql(crud._sources_page_stmt(50, after=[10, str(uuid.uuid4())], active=True))
+    assert "(sources.priority, sources.id) > (" in sql
+    assert "ORDER BY sources.priority, sources.id LIMIT" in sql
+
+    sql = _sql(crud._usage_events_page_stmt(50, after=["2026-01-01T00:00:00+00:00", str(uuid.uuid4())], event_type="query"))
+    assert "usage_events.event_type = %(event_type_1)s" in sql
+    assert "(usage_events.event_time, usage_events.id) < (" in sql
+    assert "ORDER BY usage_events.event_time DESC, usage_events.id DESC" in sql
+
+
+def test_usage_event_insert_and_rollup_upserts_compile():
+    now = datetime.datetime(2026, 3, 4, 5, 6, tzinfo=datetime.timezone.utc)
+    events = [
+        {"event_type": "query", "confidence": 0.8, "query_hash": "h1", "event_time": now},
+        {"event_type": "query", "confidence": 0.1, "metadata": {"fallback": True}},
+    ]
+    sql = _sql(crud._usage_events_insert_stmt(events))
+    assert sql.startswith("INSERT INTO usage_events (")
+    # One multi-row VALUES list; the row without event_time gets the batch's timestamp
+    assert sql.count("event_time") == 3 and "), (" in sql
+
+    rollup, query_rollup = crud._usage_rollup_stmts(aggregate(events))
+    sql = _sql(rollup)
+    assert "ON CONFLICT (bucket_size, bucket_start, event_type) DO UPDATE SET" in sql
+    assert "events = (usage_rollups.events + excluded.events)" in sql
+    assert "unnest(usage_rollups.confidence_hist, excluded.confidence_hist)" in sql
+    sql = _sql(query_rollup)
+    assert "ON CONFLICT (bucket_start, query_hash) DO UPDATE SET events = (usage_query_rollups.events + excluded.events)" in sql
+
+
+def test_answer_cache_upsert_and_partitioned_ddl_compile():
+    sql = _sql(crud._put_cached_answer_stmt("k", {"answer": "a"}, 60))
+    assert "ON CONFLICT (key) DO UPDATE SET response = excluded.response, expires_at = excluded.expires_at" in sql
+
+    ddl = _sql(CreateTable(models.UsageEvent.__table__))
+    assert "PRIMARY KEY (id, event_time)" in ddl
+    assert ddl.endswith("PARTITION BY RANGE (event_time)")
+    start = datetime.datetime(2026, 3, 1, tzinfo=datetime.timezone.utc)
+    assert partition_ddl(start) == (
+        "CREATE TABLE IF NOT EXISTS usage_events_p202603 PARTITION OF usage_events "
+        "FOR VALUES FROM ('2026-03-01T00:00:00+00:00') TO ('2026-04-01T00:00:00+00:00')"
+    )
+
+
+class _RecordingConn:
+    def __init__(self, relkind):
+        self.relkind = relkind
+        self.executed = []
+
+    async def scalar(self, stmt):
+        return self.relkind
+
+    async def execute(self, stmt):
+        self.executed.append(str(stmt))
+
+
+@pytest.mark.asyncio
+async def test_extra_ddl_adds_trigger_and_partitions_only_when_partitioned(monkeypatch):
+    monkeypatch.setenv("USAGE_EVENTS_PARTITIONS_AHEAD", "2")
+    conn = _RecordingConn("p")
+    await schema.apply_extra_ddl(conn)
+    assert any("CREATE TRIGGER sources_changed" in s for s in conn.executed)
+    # Crawls only set last_indexed; that trigger sends its own payload
+    assert any("UPDATE OF url, title, priority, active" in s and "('UPDATE')" in s for s in conn.executed)
+    assert any("UPDATE OF last_indexed" in s and "('INDEXED')" in s for s in conn.executed)
+    assert schema.USAGE_EVENTS_DEFAULT_PARTITION_DDL in conn.executed
+    assert len([s for s in conn.executed if "PARTITION OF usage_events FOR VALUES" in s]) == 3
+
+    conn = _RecordingConn("r")
+    await schema.apply_extra_ddl(conn)
+    assert not any("PARTITION OF" in s for s in conn.executed)
+    assert any("CREATE TRIGGER sources_changed" in s for s in conn.executed)
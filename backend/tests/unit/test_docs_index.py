@@ -0,0 +1,79 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import httpx
+import pytest
+
+from backend.src.services import docs_index, sources_service
+from backend.src.services.cache_service import get_answer_cache
+from backend.src.services.crawler import SourceCrawler
+
+PAGE = """
+<html><head><script>var x = 1;</script></head><body>
+<nav>Home | Docs</nav>
+<h1 id="overview">Azure Managed Grafana overview</h1>
+<p>Azure Managed Grafana is a fully managed data visualization service.</p>
+<h2 id="create-workspace">Create a workspace</h2>
+<p>Open the Azure portal. Select Create a resource and search for Azure Managed Grafana.
+Choose a subscription and resource group, then select Review + create.</p>
+<h2>Configure alerts</h2>
+<p>Grafana alerting sends notifications to contact points such as email or Teams.</p>
+</body></html>
+"""
+
+
+def _serve(request: httpx.Request) -> httpx.Response:
+    if request.url.path != "/grafana.html":
+        return httpx.Response(404)
+    return httpx.Response(200, text=PAGE, headers={"Content-Type": "text/html"})
+
+
+@pytest.fixture
+def indexer(monkeypatch):
+    # Local HTTP stand-in; a MockTransport holds no connections, so nothing to close
+    client = httpx.AsyncClient(transport=httpx.MockTransport(_serve))
+    sources_service._SOURCES.clear()
+    sources_service._SOURCES.append(
+        {"id": "s1", "url": "https://docs.example.com/grafana.html", "title": "Grafana docs", "priority": 10, "last_indexed": None, "active": True}
+    )
+    idx = docs_index.DocsIndexer(top_k=2, crawler=SourceCrawler(client=client))
+    monkeypatch.setattr(docs_index, "_INDEXER", idx)
+    yield idx
+    sources_service._SOURCES.clear()
+
+
+def test_sections_use_heading_ids_and_skip_chrome():
+    sections = docs_index.split_sections(PAGE)
+    assert [a for _, a, _ in sections] == ["overview", "create-workspace", "configure-alerts"]
+    assert all("Home | Docs" not in text and "var x" not in text for _, _, text in sections)
+
+
+@pytest.mark.asyncio
+async def test_build_indexes_sources_and_marks_last_indexed(indexer):
+    summary = await indexer.build(list(sources_service._SOURCES))
+    assert summary["indexed"] == 1 and summary["passages"] == 3
+    assert sources_service._SOURCES[0]["last_indexed"] is not None
+
+    hits = indexer.search("how do I create a workspace in the portal")
+    assert hits[0]["anchor"] == "create-workspace"
+    assert "Azure portal" in hits[0]["snippet"]
+
+
+@pytest.mark.asyncio
+async def test_stub_query_is_grounded_on_index(indexer, monkeypatch):
+    monkeypatch.setenv("STUB_MODE", "true")
+    from backend.src.services.agent_backends import resolve_agent_backends
+    from backend.src.services.query_service import run_query
+
+    resolve_agent_backends(force=True)
+    await indexer.build(list(sources_service._SOURCES))
+    await get_answer_cache().invalidate()
+
+    result = await run_query({"query": "configure alert notifications"})
+    assert result["citations"][0]["anchor"] == "configure-alerts"
+    assert result["citations"][0]["url"].endswith("grafana.html")
+    assert "configure-alerts" in result["anchors"]
+    await get_answer_cache().invalidate()
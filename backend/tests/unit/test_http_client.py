@@ -0,0 +1,30 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+from fastapi.testclient import TestClient
+from backend.src import http_client
+
+
+def test_lifespan_opens_and_closes_shared_client():
+    from backend.src.app import app
+
+    with TestClient(app) as client:
+        assert http_client.pool_stats()["open"] is True
+        r = client.get("/api/admin/http/pool")
+        assert r.status_code == 200
+        assert r.json()["max_connections"] > 0
+    assert http_client.pool_stats()["open"] is False
+
+
+@pytest.mark.asyncio
+async def test_track_request_counts_in_flight():
+    before = http_client.pool_stats()["requests_total"]
+    async with http_client.track_request():
+        assert http_client.pool_stats()["in_flight"] >= 1
+    stats = http_client.pool_stats()
+    assert stats["requests_total"] == before + 1
+    assert stats["in_flight"] == 0
@@ -0,0 +1,101 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import httpx
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend.src.services import docs_index, sources_service
+from backend.src.services.crawler import SourceCrawler
+from backend.src.services.index_store import IndexStore, open_index
+
+PAGE = """# Alerts
+Grafana alerting sends notifications to contact points such as email or Teams.
+
+# Dashboards
+Import a dashboard from JSON or build panels with the query editor.
+"""
+
+
+def _index(passages):
+    return docs_index.DocsIndex(passages, ranker="vector", dim=64)
+
+
+def test_round_trip_is_zero_copy_and_ranks_like_memory(tmp_path):
+    passages = docs_index.make_passages({"id": "s1", "url": "https://docs/x", "priority": 10}, PAGE, "text/markdown")
+    index = _index(passages)
+    store = IndexStore(str(tmp_path))
+    mapped = store.publish(passages, index.vector.columns, index.vector.idf, index.boost, {"sources": {"s1": [0, 2]}})
+
+    assert mapped.version == 1 and store.current_version() == 1
+    assert not mapped.columns.flags.owndata and not mapped.columns.flags.writeable
+    assert list(mapped.passages) == passages
+    assert mapped.passages.view(1, 2)[0]["anchor"] == "dashboards"
+
+    served = docs_index.DocsIndex.from_store(mapped)
+    assert served.search("contact points email") == index.search("contact points email")
+
+
+def test_publish_swaps_current_and_prunes_old_versions(tmp_path):
+    passages = [{"url": "u", "text": "alpha beta", "priority": 100}]
+    index = _index(passages)
+    store = IndexStore(str(tmp_path), keep=2)
+    first = store.publish(passages, index.vector.columns, index.vector.idf, index.boost, {})
+    for _ in range(3):
+        store.publish(passages, index.vector.columns, index.vector.idf, index.boost, {})
+
+    assert store.current_version() == 4
+    assert store.stats()["versions"] == [3, 4]
+    # A mapping opened before its file was pruned keeps working
+    assert first.passages[0]["text"] == "alpha beta"
+
+
+def test_bad_magic_is_rejected(tmp_path):
+    path = tmp_path / "docs-index-1.idx"
+    path.write_bytes(b"\0" * 256)
+    with pytest.raises(ValueError):
+        open_index(str(path))
+
+
+def test_build_lock_is_exclusive(tmp_path):
+    store = IndexStore(str(tmp_path))
+    with store.try_lock() as first:
+        with IndexStore(str(tmp_path)).try_lock() as second:
+            assert first and not second
+
+
+@pytest.fixture
+def source():
+    sources_service._SOURCES.clear()
+    yield {"id": "s1", "url": "https://docs.example.com/alerts.md", "title": "Alerts", "priority": 10, "active": True}
+    sources_service._SOURCES.clear()
+
+
+def _crawler() -> SourceCrawler:
+    """Crawler fetching from a local HTTP stand-in serving PAGE as markdown."""
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text=PAGE, headers={"Content-Type": "text/markdown"}))
+    return SourceCrawler(client=httpx.AsyncClient(transport=transport))
+
+
+@pytest.mark.asyncio
+async def test_workers_share_published_versions(tmp_path, source):
+    store_dir = str(tmp_path / "store")
+    builder = docs_index.DocsIndexer(ranker="vector", dim=64, store=IndexStore(store_dir), crawler=_crawler())
+    reader = docs_index.DocsIndexer(ranker="vector", dim=64, store=IndexStore(store_dir, poll_interval=0))
+
+    summary = await builder.build([source])
+    assert summary["version"] == 1 and builder.index.version == 1
+
+    # Another worker serves the mapped version on its next search, without building
+    assert reader.search("contact points email")[0]["anchor"] == "alerts"
+    assert reader.index.version == 1 and reader.builds == 0
+
+    # A restarted worker keeps the crawler validators, so a re-crawl skips the page
+    restarted = docs_index.DocsIndexer(ranker="vector", dim=64, store=IndexStore(store_dir), crawler=_crawler())
+    assert restarted.load_from_store()
+    again = await restarted.build([source], force=False)
+    assert again["rebuilt"] is False and again["skipped"] == 1
@@ -0,0 +1,142 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.src import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    h = registry.register(metrics.Histogram("demo_seconds", "Demo", ("route",), buckets=(0.1, 1.0)))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        h.observe(value, "/a")
+    text = metrics.render([registry.snapshot()])
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a",le="1"} 3' in text
+    assert 'demo_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'demo_seconds_count{route="/a"} 4' in text
+    assert 'demo_seconds_sum{route="/a"} 4.25' in text
+
+
+def test_worker_snapshots_are_merged():
+    def snapshot(pid, hits, depth):
+        registry = metrics.Registry()
+        registry.register(metrics.Counter("hits_total", "Hits")).inc(amount=hits)
+        registry.register(metrics.Callback("depth", "Depth", "gauge", lambda: {(): depth}))
+        return dict(registry.snapshot(), pid=pid)
+
+    text = metrics.render([snapshot(11, 2, 5), snapshot(12, 3, 7)])
+    assert "hits_total 5" in text
+    assert 'depth{pid="11"} 5' in text and 'depth{pid="12"} 7' in text
+
+
+def _worker_snapshot(pid, age, hits, depth):
+    return {"pid": pid, "time": time.time() - age, "metrics": {
+        "fake_total": {"kind": "counter", "help": "Fake", "labelnames": [], "samples": [[[], hits]]},
+        "fake_seconds": {"kind": "histogram", "help": "Fake", "labelnames": [], "buckets": [1.0],
+                         "samples": [[[], [hits, 0, hits * 0.5]]]},
+        "fake_depth": {"kind": "gauge", "help": "Fake", "labelnames": [], "samples": [[[], depth]]}}}
+
+
+@pytest.mark.asyncio
+async def test_exited_workers_keep_counters_but_not_gauges(tmp_path, monkeypatch):
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    monkeypatch.setenv("METRICS_SNAPSHOT_TTL", "60")
+    for pid, age, hits in ((101, 0, 4.0), (102, 0, 3.0)):
+        (tmp_path / f"metrics-{pid}.json").write_text(json.dumps(_worker_snapshot(pid, age, hits, pid)))
+
+    text = await metrics.collect()
+    assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+    assert "fake_total 7" in text and "fake_seconds_count 7" in text
+    assert 'fake_depth{pid="102"} 102' in text
+
+    # Worker 102 dies: its snapshot stops updating and expires
+    (tmp_path / "metrics-102.json").write_text(json.dumps(_worker_snapshot(102, 3600, 3.0, 102)))
+    for _ in range(2):
+        text = await metrics.collect()
+        assert "fake_total 7" in text and "fake_seconds_count 7" in text and "fake_seconds_sum 3.5" in text
+        assert 'fake_depth{pid="101"} 101' in text and 'pid="102"' not in text
+    assert not (tmp_path / "metrics-102.json").exists()
+    assert (tmp_path / metrics.ACCUMULATED_FILE).exists()
+
+
+def test_retired_worker_counts_move_to_accumulated_file(tmp_path):
+    registry = metrics.Registry()
+    registry.register(metrics.Counter("fake_total", "Fake")).inc(amount=5)
+    registry.register(metrics.Callback("fake_depth", "Fake", "gauge", lambda: {(): 9}))
+    original, metrics.REGISTRY = metrics.REGISTRY, registry
+    try:
+        metrics.write_snapshot(str(tmp_path))
+        metrics.retire_snapshot(str(tmp_path))
+    finally:
+        metrics.REGISTRY = original
+    assert not (tmp_path / f"metrics-{os.getpid()}.json").exists()
+    text = metrics.render(metrics.read_snapshots(str(tmp_path), ttl_s=60))
+    assert "fake_total 5" in text and "fake_depth{" not in text
+
+
+def test_stalled_worker_is_not_counted_twice_after_its_snapshot_is_folded(tmp_path):
+    registry = metrics.Registry()
+    counter = registry.register(metrics.Counter("fake_total", "Fake"))
+    directory = str(tmp_path)
+    own = tmp_path / f"metrics-{os.getpid()}.json"
+
+    counter.inc(amount=5)
+    metrics.write_snapshot(directory, registry.snapshot())
+    # The worker stalls past the TTL and another worker's scrape folds its snapshot
+    snap = json.loads(own.read_text())
+    own.write_text(json.dumps(dict(snap, time=time.time() - 3600)))
+    assert "fake_total 5" in metrics.render(metrics.read_snapshots(directory, ttl_s=60))
+    assert not own.exists()
+
+    counter.inc(amount=2)
+    metrics.write_snapshot(directory, registry.snapshot())
+    assert "fake_total 7" in metrics.render(metrics.read_snapshots(directory, ttl_s=60))
+
+    counter.inc(amount=1)
+    metrics.retire_snapshot(directory, registry.snapshot())
+    assert "fake_total 8" in metrics.render(metrics.read_snapshots(directory, ttl_s=60))
+
+
+@pytest.mark.asyncio
+async def test_collect_snapshots_the_registry_on_the_loop_thread(tmp_path, monkeypatch):
+    import threading
+
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    threads = []
+    original = metrics.Registry.snapshot
+
+    def snapshot(self):
+        threads.append(threading.current_thread())
+        return original(self)
+
+    monkeypatch.setattr(metrics.Registry, "snapshot", snapshot)
+    await metrics.collect()
+    assert threads and all(t is threading.main_thread() for t in threads)
+
+
+def test_metrics_endpoint_labels_requests_by_route(monkeypatch):
+    monkeypatch.setenv("STUB_MODE", "true")
+    monkeypatch.delenv("METRICS_DIR", raising=False)
+    from backend.src.app import create_app
+
+    client = TestClient(create_app())
+    assert client.get("/api/health").status_code == 200
+    client.get("/no/such/path")
+    client.post("/api/query", json={"query": "metrics endpoint question"})
+
+    r = client.get("/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/health",status="200"}' in r.text
+    assert 'route="unmatched",status="404"' in r.text
+    assert 'agent_call_duration_seconds_count{backend="stub",mode="invoke",outcome="ok"}' in r.text
+    assert "# TYPE answer_cache_hit_ratio gauge" in r.text
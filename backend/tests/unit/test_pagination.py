@@ -0,0 +1,69 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.src.app import app
+from backend.src.pagination import decode_cursor, encode_cursor
+from backend.src.services import sources_service, telemetry_service
+
+
+@pytest.fixture(autouse=True)
+def _reset_stores():
+    sources_service._SOURCES.clear()
+    telemetry_service._USAGE_EVENTS.clear()
+    yield
+    sources_service._SOURCES.clear()
+    telemetry_service._USAGE_EVENTS.clear()
+
+
+def _collect(client, path, **params):
+    items, cursor = [], None
+    while True:
+        r = client.get(path, params={**params, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200
+        body = r.json()
+        items.extend(body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return items
+
+
+def test_cursor_roundtrip_and_validation():
+    assert decode_cursor(encode_cursor([5, "abc"]), 2) == [5, "abc"]
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", 2)
+
+
+def test_sources_pages_cover_every_row_once():
+    client = TestClient(app)
+    for i in range(7):
+        client.post("/api/admin/sources", json={"url": f"https://example.com/{i}", "priority": 10 * (i % 3)})
+    items = _collect(client, "/api/admin/sources/all", limit=3)
+    assert len(items) == 7 and len({s["id"] for s in items}) == 7
+    assert [s["priority"] for s in items] == sorted(s["priority"] for s in items)
+
+
+def test_usage_events_filters_and_keyset_order():
+    for i in range(9):
+        telemetry_service._store_in_memory(
+            {
+                "event_type": "query" if i % 2 else "click",
+                "pseudo_user_id": "anon-1" if i < 5 else "anon-2",
+                "event_time": f"2026-01-01T00:00:0{i}+00:00",
+            }
+        )
+    client = TestClient(app)
+    items = _collect(client, "/api/admin/usage-events", limit=2, event_type="query")
+    assert [e["event_time"][-9:-6] for e in items] == [":07", ":05", ":03", ":01"]
+
+    items = _collect(client, "/api/admin/usage-events", limit=2, pseudo_user_id="anon-1",
+                     since="2026-01-01T00:00:02Z", until="2026-01-01T00:00:04Z")
+    assert len(items) == 2
+
+    assert client.get("/api/admin/usage-events", params={"cursor": "garbage"}).status_code == 400
+
@@ -0,0 +1,76 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend.src.services.docs_index import DocsIndex, tokenize
+from backend.src.services.passage_ranker import HashedTfidfRanker
+
+TEXTS = [
+    "Create an Azure Managed Grafana workspace from the Azure portal",
+    "Configure Grafana alerting contact points for email and Teams",
+    "Import a dashboard JSON model into Grafana",
+    "Grant Grafana Admin role with Azure RBAC role assignments",
+    "Connect Azure Monitor as a Grafana data source",
+]
+
+
+def test_columns_are_contiguous_and_passages_normalised():
+    ranker = HashedTfidfRanker([tokenize(t) for t in TEXTS], dim=256)
+    assert ranker.columns.flags["C_CONTIGUOUS"] and ranker.columns.dtype == np.float32
+    assert ranker.columns.shape == (256, len(TEXTS))
+    assert np.allclose(np.linalg.norm(ranker.matrix, axis=1), 1.0, atol=1e-5)
+
+
+def test_top_k_matches_full_sort():
+    rng = np.random.default_rng(0)
+    vocab = [f"w{i}" for i in range(300)]
+    docs = [list(rng.choice(vocab, size=40)) for _ in range(500)]
+    ranker = HashedTfidfRanker(docs, dim=512)
+    query = docs[17][:6]
+    top = ranker.top_k(query, 10)
+    full = ranker.matrix @ ranker.query_vector(query)
+    assert [i for _, i in top] == list(np.argsort(-full)[:10])
+    assert top[0][1] == 17
+
+
+@pytest.mark.parametrize("ranker", ["vector", "bm25"])
+def test_docs_index_rankers_agree_on_obvious_match(ranker):
+    passages = [{"url": f"https://x/{i}", "anchor": f"a{i}", "text": t, "priority": 100} for i, t in enumerate(TEXTS)]
+    index = DocsIndex(passages, ranker=ranker)
+    assert index.ranker == ranker
+    hits = index.search("set up alerting contact points", k=2)
+    assert hits[0]["anchor"] == "a1"
+
+
+def _phrase_corpus(n=3000, vocab=4000, length=40, queries=200, seed=7):
+    """Zipf-distributed passages and short phrases lifted from a known passage."""
+    rng = np.random.default_rng(seed)
+    p = 1.0 / np.arange(1, vocab + 1)
+    words = [f"w{i}" for i in range(vocab)]
+    texts = [" ".join(rng.choice(words, size=length, p=p / p.sum())) for _ in range(n)]
+    cases = []
+    for target in rng.choice(n, size=queries, replace=False):
+        tokens = texts[target].split()
+        start = int(rng.integers(0, length - 3))
+        cases.append((f"a{target}", " ".join(tokens[start:start + 3])))
+    passages = [{"url": f"https://x/{i}", "anchor": f"a{i}", "text": t, "priority": 100} for i, t in enumerate(texts)]
+    return passages, cases
+
+
+def _recall_at_3(index, cases):
+    return sum(anchor in [h["anchor"] for h in index.search(q, k=3)] for anchor, q in cases) / len(cases)
+
+
+def test_default_dim_recall_is_not_worse_than_bm25():
+    passages, cases = _phrase_corpus()
+    vector = _recall_at_3(DocsIndex(passages, ranker="vector"), cases)
+    bm25 = _recall_at_3(DocsIndex(passages, ranker="bm25"), cases)
+    assert vector >= 0.8 and vector >= bm25
+    # Too few buckets: collisions flatten the IDF and recall collapses
+    assert _recall_at_3(DocsIndex(passages, ranker="vector", dim=256), cases) < vector - 0.1
@@ -0,0 +1,122 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.src import profiling
+from backend.src.services.agent_executor import AgentExecutor
+
+
+def busy_profiled_work(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def busy_other_request(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def blocking_sdk_call(seconds):
+    time.sleep(seconds)
+
+
+def _app(executor):
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        busy_profiled_work(0.05)
+        await asyncio.sleep(0.05)
+        await executor.run(blocking_sdk_call, 0.05)
+        return {"ok": True}
+
+    @app.get("/other")
+    async def other():
+        await asyncio.sleep(0.01)
+        busy_other_request(0.1)
+        return {"ok": True}
+
+    app.add_middleware(profiling.ProfilingMiddleware)
+    return app
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    monkeypatch.setenv("PROFILE_INTERVAL_MS", "1")
+    monkeypatch.delenv("PROFILE_DIR", raising=False)
+    monkeypatch.delenv("PROFILE_SAMPLE_RATE", raising=False)
+    profiling.clear_profiles()
+    ex = AgentExecutor(max_concurrency=2)
+    yield ex
+    ex.shutdown()
+    profiling.clear_profiles()
+
+
+@pytest.mark.asyncio
+async def test_profile_is_attributed_to_its_own_request(executor, monkeypatch):
+    monkeypatch.setenv("ADMIN_API_KEY", "secret")
+    transport = httpx.ASGITransport(app=_app(executor))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        profiled, other = await asyncio.gather(
+            client.get("/work", headers={"x-profile": "1", "x-api-key": "secret", "x-request-id": "req-1"}),
+            client.get("/other"),
+        )
+        denied = await client.get("/work", headers={"x-profile": "1", "x-api-key": "wrong"})
+
+    assert profiled.headers["x-profile-id"] == "req-1"
+    assert "x-profile-id" not in other.headers and "x-profile-id" not in denied.headers
+    data = profiling.get_profile("req-1")
+    assert data["status"] == 200 and data["samples"] > 0
+    folded = data["folded"]
+    # On-CPU work, suspended awaits and the executor thread all show up...
+    assert "busy_profiled_work" in folded
+    assert "<await" in folded
+    assert "[thread];blocking_sdk_call" in folded
+    # ...but not the other request that was running on the same loop
+    assert "busy_other_request" not in folded
+    assert [p["request_id"] for p in profiling.list_profiles()] == ["req-1"]
+
+
+def test_sample_rate_and_shared_directory(executor, tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_SAMPLE_RATE", "1")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    client = TestClient(_app(executor))
+    request_id = client.get("/work").headers["x-profile-id"]
+
+    # Another worker (empty memory) still finds it on disk
+    profiling.clear_profiles()
+    assert profiling.get_profile(request_id)["path"] == "/work"
+    assert (tmp_path / f"{request_id}.json").exists()
+
+
+def test_profiles_endpoint_and_disabled_by_default(monkeypatch):
+    monkeypatch.setenv("STUB_MODE", "true")
+    monkeypatch.delenv("ADMIN_API_KEY", raising=False)
+    monkeypatch.delenv("PROFILING_ENABLED", raising=False)
+    from backend.src.app import create_app
+
+    app = create_app()
+    assert profiling.ProfilingMiddleware not in [m.cls for m in app.user_middleware]
+    assert "x-profile-id" not in TestClient(app).get("/api/health", headers={"x-profile": "1"}).headers
+
+    monkeypatch.setenv("PROFILING_ENABLED", "true")
+    client = TestClient(create_app())
+    r = client.post("/api/query", json={"query": "profiled question"}, headers={"x-profile": "1", "x-request-id": "q-1"})
+    assert r.headers["x-profile-id"] == "q-1"
+    assert client.get("/api/admin/profiles").json()["profiles"][0]["request_id"] == "q-1"
+    assert client.get("/api/admin/profiles/q-1?format=json").json()["path"] == "/api/query"
+    assert client.get("/api/admin/profiles/q-1").headers["content-type"].startswith("text/plain")
+    assert client.get("/api/admin/profiles/nope").status_code == 404
+    assert client.get("/api/admin/profiles/q-1?format=svg").status_code == 400
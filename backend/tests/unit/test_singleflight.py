@@ -0,0 +1,48 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import asyncio
+import pytest
+from backend.src.services.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    runs = 0
+
+    async def slow():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return {"answer": "shared"}
+
+    results = await asyncio.gather(*(flight.do("k", slow) for _ in range(10)))
+    assert runs == 1
+    assert all(r["answer"] == "shared" for r in results)
+
+    stats = flight.stats()
+    assert stats["executions"] == 1 and stats["coalesced"] == 9
+    assert stats["coalescing_ratio"] == pytest.approx(0.9)
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_and_key_is_released():
+    flight = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("agent down")
+
+    results = await asyncio.gather(flight.do("k", boom), flight.do("k", boom), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def ok():
+        return 1
+
+    assert await flight.do("k", ok) == 1
+    assert flight.stats()["executions"] == 2
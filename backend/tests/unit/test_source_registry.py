@@ -0,0 +1,137 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.src.app import app
+from backend.src.services import sources_service
+from backend.src.services.cache_service import get_answer_cache
+from backend.src.services.source_registry import SourceRegistry, get_source_registry
+
+
+@pytest.fixture(autouse=True)
+def _reset_sources():
+    sources_service._SOURCES.clear()
+    yield
+    sources_service._SOURCES.clear()
+
+
+def test_get_sources_serves_snapshot_with_etag():
+    client = TestClient(app)
+    client.post("/api/admin/sources", json={"url": "https://example.com/low", "priority": 200})
+    client.post("/api/admin/sources", json={"url": "https://example.com/high", "priority": 1})
+
+    r = client.get("/api/admin/sources")
+    assert r.status_code == 200
+    assert [s["url"] for s in r.json()["sources"]] == ["https://example.com/high", "https://example.com/low"]
+    etag = r.headers["ETag"]
+
+    assert client.get("/api/admin/sources", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post("/api/admin/sources", json={"url": "https://example.com/new", "priority": 50})
+    r = client.get("/api/admin/sources", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+    assert get_source_registry().snapshot()[1]["url"] == "https://example.com/new"
+
+
+@pytest.mark.asyncio
+async def test_notification_clears_local_cache_and_triggers_refresh():
+    registry = SourceRegistry(refresh_interval=60)
+    await registry.start()
+    try:
+        get_answer_cache().local.set("k", {"answer": "stale"})
+        sources_service._SOURCES.append(
+            {"id": "1", "url": "https://example.com/x", "title": None, "priority": 1, "last_indexed": None, "active": True}
+        )
+        registry._on_notify(None, 0, "sources_changed", "INSERT")
+        for _ in range(50):
+            if registry.snapshot():
+                break
+            await asyncio.sleep(0.01)
+        assert registry.notifications == 1
+        assert len(registry.snapshot()) == 1
+        assert get_answer_cache().local.get("k") is None
+    finally:
+        await registry.stop()
+
+
+@pytest.mark.asyncio
+async def test_indexed_notification_refreshes_but_keeps_cache():
+    registry = SourceRegistry(refresh_interval=60)
+    await registry.start()
+    try:
+        get_answer_cache().local.set("k", {"answer": "still valid"})
+        refreshes = registry.refreshes
+        registry._on_notify(None, 0, "sources_changed", "INDEXED")
+        for _ in range(50):
+            if registry.refreshes > refreshes:
+                break
+            await asyncio.sleep(0.01)
+        assert registry.refreshes > refreshes
+        assert get_answer_cache().local.get("k") == {"answer": "still valid"}
+
+        registry._on_notify(None, 0, "sources_changed", "UPDATE")
+        assert get_answer_cache().local.get("k") is None
+    finally:
+        await registry.stop()
+
+
+class _FakeListenConnection:
+    def __init__(self):
+        self.closed = False
+        self.on_terminate = []
+
+    def add_termination_listener(self, callback):
+        self.on_terminate.append(callback)
+
+    async def add_listener(self, channel, callback):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    def drop(self):
+        self.closed = True
+        for callback in self.on_terminate:
+            callback(self)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_dropped_listen_connection_reconnects_without_waiting_for_refresh(monkeypatch):
+    import asyncpg
+
+    connections = []
+
+    async def connect(dsn):
+        connections.append(_FakeListenConnection())
+        return connections[-1]
+
+    monkeypatch.setattr(asyncpg, "connect", connect)
+    registry = SourceRegistry(refresh_interval=3600)
+    registry._dirty = asyncio.Event()
+    task = asyncio.create_task(registry._listen_loop("postgresql://db/x"))
+    try:
+        await asyncio.sleep(0.01)
+        assert registry.listening and len(connections) == 1
+        connections[0].drop()
+        await asyncio.sleep(0.01)
+        assert not registry.listening
+        # Reconnects after the 1s backoff, not after the hour-long refresh interval
+        for _ in range(300):
+            if len(connections) == 2 and registry.listening:
+                break
+            await asyncio.sleep(0.01)
+        assert len(connections) == 2 and registry.listening
+    finally:
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
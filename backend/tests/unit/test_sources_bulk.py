@@ -0,0 +1,58 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.src.app import app
+from backend.src.services import sources_service
+
+
+@pytest.fixture(autouse=True)
+def _reset_sources():
+    sources_service._SOURCES.clear()
+    yield
+    sources_service._SOURCES.clear()
+
+
+def test_bulk_upsert_is_idempotent_on_url():
+    client = TestClient(app)
+    rows = [{"url": f"https://learn.microsoft.com/azure/managed-grafana/{i}", "priority": i} for i in range(5)]
+    r = client.post("/api/admin/sources/bulk", json=rows)
+    assert r.status_code == 200
+    assert r.json()["created"] == 5
+
+    rows[0]["title"] = "Overview"
+    lines = "\n".join(json.dumps(row) for row in rows)
+    r = client.post("/api/admin/sources/bulk", content=lines, headers={"Content-Type": "application/x-ndjson"})
+    body = r.json()
+    assert body["updated"] == 5 and body["created"] == 0
+    assert len(sources_service._SOURCES) == 5
+    assert sources_service._SOURCES[0]["title"] == "Overview"
+
+
+def test_bulk_reports_rejected_and_superseded_rows():
+    client = TestClient(app)
+    rows = [
+        {"url": "https://example.com/a", "priority": 1},
+        {"title": "no url"},
+        {"url": "https://example.com/a", "priority": 2},
+        "not-an-object",
+    ]
+    body = client.post("/api/admin/sources/bulk", json=rows).json()
+    assert [r["status"] for r in body["results"]] == ["superseded", "rejected", "created", "rejected"]
+    assert sources_service._SOURCES[0]["priority"] == 2
+
+
+def test_non_http_source_urls_are_refused():
+    client = TestClient(app)
+    r = client.post("/api/admin/sources", json={"url": "file:///proc/self/environ"})
+    assert r.status_code == 400
+    body = client.post("/api/admin/sources/bulk", json=[{"url": "file:///etc/passwd"}, {"url": "https://example.com/ok"}]).json()
+    assert [r["status"] for r in body["results"]] == ["rejected", "created"]
+    assert [s["url"] for s in sources_service._SOURCES] == ["https://example.com/ok"]
@@ -0,0 +1,71 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.src import app as app_module
+
+
+@pytest.fixture
+def stub_env(monkeypatch):
+    monkeypatch.setenv("STUB_MODE", "true")
+    return monkeypatch
+
+
+def test_ready_only_after_lifespan_startup(stub_env):
+    app = app_module.create_app()
+    assert TestClient(app).get("/api/ready").status_code == 503
+
+    with TestClient(app) as client:
+        r = client.get("/api/ready")
+        assert r.status_code == 200
+        body = r.json()
+        assert body["status"] == "ready" and body["startup_ms"] > 0
+        assert list(body["steps"]) == [
+            "metrics", "http_client", "agent_executor", "agent_backends", "db", "telemetry_writer",
+            "partition_maintenance", "source_registry", "docs_indexer", "thread_pool", "warmup",
+        ]
+        assert body["steps"]["agent_backends"]["chain"] == ["stub"]
+        assert body["steps"]["db"]["configured"] is False
+        assert client.get("/api/health/db").json()["db_init"] is None
+    assert app.state.startup.phase == "stopping"
+
+
+def test_optional_step_failure_is_recorded_and_required_failure_aborts(stub_env):
+    async def broken():
+        raise RuntimeError("agent unavailable")
+
+    stub_env.setattr(app_module, "start_thread_pool", broken)
+    with TestClient(app_module.create_app()) as client:
+        body = client.get("/api/ready").json()
+        assert body["status"] == "ready"
+        assert body["steps"]["thread_pool"] == {"status": "error", "error": "agent unavailable", "ms": pytest.approx(0, abs=1000)}
+
+    stub_env.setattr(app_module, "start_writer", broken)
+    app = app_module.create_app()
+    with pytest.raises(RuntimeError):
+        with TestClient(app):
+            pass
+    assert app.state.startup.phase == "failed"
+    assert "thread_pool" not in app.state.startup.steps
+
+
+def test_warmup_request_is_not_timed(stub_env):
+    from backend.src import metrics
+
+    def health_requests():
+        for labels, value in metrics.HTTP_REQUESTS.samples():
+            if labels == ["GET", "/api/health", "200"]:
+                return sum(value[:-1])
+        return 0
+
+    before = health_requests()
+    with TestClient(app_module.create_app()) as client:
+        assert client.get("/api/ready").json()["steps"]["warmup"]["status"] == "ok"
+        assert health_requests() == before
+        client.get("/api/health")
+        assert health_requests() == before + 1
@@ -0,0 +1,36 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import json
+from fastapi.testclient import TestClient
+from backend.src.services.agent_backends import _parse_sse_line
+
+
+def test_stream_endpoint_emits_tokens_then_final():
+    os.environ.setdefault("STUB_MODE", "true")
+    from backend.src.app import app
+
+    client = TestClient(app)
+    r = client.post("/api/query/stream", json={"query": "How do I get started?"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+
+    events = [block.split("\n") for block in r.text.strip().split("\n\n")]
+    kinds = [lines[0].split(": ", 1)[1] for lines in events]
+    assert kinds[-1] == "final"
+    assert kinds.count("token") >= 1
+
+    final = json.loads(events[-1][1].split(": ", 1)[1])
+    tokens = "".join(json.loads(lines[1].split(": ", 1)[1])["text"] for lines in events[:-1])
+    assert tokens == final["answer"]
+    assert {"citations", "confidence", "fallback"} <= set(final)
+
+
+def test_parse_sse_line_handles_openai_deltas():
+    assert _parse_sse_line('data: {"choices": [{"delta": {"content": "Hel"}}]}') == "Hel"
+    assert _parse_sse_line("data: plain text") == "plain text"
+    assert _parse_sse_line(": keep-alive") == ""
+    assert _parse_sse_line("data: [DONE]") is None
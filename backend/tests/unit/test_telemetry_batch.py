@@ -0,0 +1,78 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def test_batch_accepts_json_array_and_reports_invalid_items():
+    from backend.src.app import app
+
+    client = TestClient(app)
+    events = [
+        {"event": "sidebar_open", "pseudo_user_id": "anon-1"},
+        {"event_type": "feedback", "confidence": 0.8, "metadata": {"helpful": True}},
+        {"pseudo_user_id": "anon-2"},  # no event type
+        "not-an-object",
+    ]
+    r = client.post("/api/telemetry/batch", json=events)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["accepted"] == 2
+    assert [item["index"] for item in body["rejected"]] == [2, 3]
+
+
+def test_batch_accepts_ndjson():
+    from backend.src.app import app
+
+    client = TestClient(app)
+    lines = "\n".join(json.dumps({"event": "copy_snippet", "payload": {"n": i}}) for i in range(3))
+    r = client.post("/api/telemetry/batch", content=lines, headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200
+    assert r.json()["accepted"] == 3
+
+    r = client.post("/api/telemetry/batch", content="{not json", headers={"Content-Type": "application/json"})
+    assert r.status_code == 400
+
+    r = client.post("/api/telemetry/batch", content=b'[{"event": "\xff"}]', headers={"Content-Type": "application/json"})
+    assert r.status_code == 400
+
+
+def test_single_event_is_validated_before_it_is_queued():
+    from backend.src.app import app
+
+    client = TestClient(app)
+    assert client.post("/api/telemetry", json={"event": "sidebar_open"}).json()["status"] == "accepted"
+    for bad in ({"pseudo_user_id": "anon-1"}, {"event": "x", "confidence": "high"}, {"event": "x", "event_time": "soon"}):
+        assert client.post("/api/telemetry", json=bad).status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_insert_failure_is_retried_row_by_row(monkeypatch):
+    from backend.src.db import crud
+    from backend.src.services import telemetry_service
+    from backend.src.services.telemetry_writer import TelemetryWriter
+
+    inserted = []
+
+    async def create_usage_events_bulk(events, rollups=None):
+        if any(e.get("pseudo_user_id") == "bad" for e in events):
+            raise ValueError("invalid input for query argument")
+        inserted.extend(events)
+        return len(events)
+
+    monkeypatch.setattr(telemetry_service, "_db_configured", lambda: True)
+    monkeypatch.setattr(crud, "create_usage_events_bulk", create_usage_events_bulk)
+    writer = TelemetryWriter(telemetry_service._persist_batch, batch_size=10, flush_interval=0.01)
+    await writer.start()
+    await writer.enqueue_many([{"event_type": "open", "pseudo_user_id": u} for u in ("a", "bad", "b", "c")])
+    await writer.stop()
+
+    assert [e["pseudo_user_id"] for e in inserted] == ["a", "b", "c"]
+    stats = writer.stats()
+    assert stats["flushed_events"] == 3 and stats["rejected"] == 1 and stats["flush_errors"] == 0
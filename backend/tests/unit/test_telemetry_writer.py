@@ -0,0 +1,62 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import asyncio
+import pytest
+from backend.src.services.telemetry_writer import TelemetryWriter
+
+
+class _Sink:
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, batch):
+        self.batches.append(batch)
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_on_batch_size_and_interval():
+    sink = _Sink()
+    writer = TelemetryWriter(sink, max_queue=100, batch_size=3, flush_interval=0.05)
+    await writer.start()
+    for i in range(4):
+        assert await writer.enqueue({"event": "click", "n": i})
+    await asyncio.sleep(0.2)
+
+    assert [len(b) for b in sink.batches] == [3, 1]
+    assert all("event_time" in e for b in sink.batches for e in b)
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_writer_drops_when_full_and_drains_on_stop():
+    sink = _Sink()
+    writer = TelemetryWriter(sink, max_queue=2, batch_size=10, flush_interval=60)
+    await writer.start()
+    # enqueue never suspends, so the flusher cannot drain between these calls
+    results = [await writer.enqueue({"event": "open"}) for _ in range(3)]
+    assert results == [True, True, False]
+    assert writer.stats()["dropped"] == 1
+
+    await writer.stop()
+    assert sum(len(b) for b in sink.batches) == 2
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_batch_already_taken_by_flusher():
+    sink = _Sink()
+    writer = TelemetryWriter(sink, max_queue=100, batch_size=10, flush_interval=60)
+    await writer.start()
+    for i in range(3):
+        await writer.enqueue({"event": "click", "n": i})
+    # Let the flusher dequeue all three and wait for more
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert writer.stats()["queue_depth"] == 0 and sink.batches == []
+
+    await writer.stop()
+    assert [[e["n"] for e in b] for b in sink.batches] == [[0, 1, 2]]
+    assert writer.stats()["dropped"] == 0 and not writer.running
@@ -0,0 +1,87 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import asyncio
+import itertools
+import pytest
+from fastapi.testclient import TestClient
+from backend.src.services.foundry_threads import PrewarmedThreadPool
+
+
+@pytest.mark.asyncio
+async def test_pool_prewarms_and_serves_hits():
+    counter = itertools.count()
+    deleted = []
+
+    async def create():
+        await asyncio.sleep(0.01)
+        return f"thread_{next(counter)}"
+
+    async def delete(thread_id):
+        deleted.append(thread_id)
+
+    pool = PrewarmedThreadPool(create, delete, target_size=2, idle_ttl=60, refill_interval=0.05)
+    await pool.start()
+    await asyncio.sleep(0.1)
+    assert pool.stats()["size"] == 2
+
+    first = await pool.acquire()
+    assert first == "thread_0"
+    assert pool.stats()["hits"] == 1
+
+    # Expire everything that is still idle, then acquire again
+    pool.idle_ttl = 0
+    await asyncio.sleep(0.01)
+    await pool.acquire()
+    await asyncio.sleep(0)
+    stats = pool.stats()
+    assert stats["expired"] >= 1 and deleted
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_deletes_unused_pooled_threads():
+    counter = itertools.count()
+    deleted = []
+
+    async def create():
+        return f"thread_{next(counter)}"
+
+    async def delete(thread_id):
+        deleted.append(thread_id)
+
+    pool = PrewarmedThreadPool(create, delete, target_size=3, idle_ttl=60, refill_interval=60)
+    await pool.start()
+    await asyncio.sleep(0.01)
+    handed_out = await pool.acquire()
+    await pool.stop()
+
+    assert handed_out not in deleted and sorted(deleted) == ["thread_1", "thread_2"]
+    assert pool.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stop_gives_up_on_slow_deletes():
+    async def create():
+        return "thread"
+
+    async def delete(thread_id):
+        await asyncio.sleep(10)
+
+    pool = PrewarmedThreadPool(create, delete, target_size=2, refill_interval=60, shutdown_timeout=0.05)
+    await pool.start()
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(pool.stop(), timeout=1)
+
+
+def test_threads_endpoint_returns_thread_id_in_stub_mode():
+    os.environ.setdefault("STUB_MODE", "true")
+    from backend.src.app import app
+
+    with TestClient(app) as client:
+        r = client.post("/api/threads", json={"pseudo_user_id": "anon-1"})
+        assert r.status_code == 200
+        assert r.json()["thread_id"]
@@ -0,0 +1,120 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.src import observability
+
+
+@pytest.fixture
+def tracing(monkeypatch):
+    monkeypatch.setenv("TRACING_EXPORTER", "memory")
+    monkeypatch.setenv("TRACING_SAMPLE_RATIO", "1.0")
+    yield monkeypatch
+    observability.shutdown_tracing()
+
+
+def _spans():
+    return list(observability._STATE["memory"].spans)
+
+
+def test_query_request_has_server_and_agent_spans(tracing):
+    tracing.setenv("STUB_MODE", "true")
+    tracing.setenv("ADMIN_API_KEY", "secret")
+    from backend.src.app import create_app
+
+    client = TestClient(create_app())
+    r = client.post("/api/query", json={"query": f"tracing question {uuid.uuid4()}"})
+    assert r.status_code == 200
+
+    spans = {s["name"]: s for s in _spans()}
+    server, agent = spans["POST /api/query"], spans["agent.invoke"]
+    assert server["kind"] == "server" and server["attributes"]["http.route"] == "/api/query"
+    assert agent["trace_id"] == server["trace_id"]
+    assert agent["attributes"]["agent.backend"] == "stub"
+
+    # The agent span nests under the server span
+    by_id = {s["span_id"]: s for s in _spans()}
+    parent = by_id.get(agent["parent_id"])
+    while parent is not None and parent["name"] != server["name"]:
+        parent = by_id.get(parent["parent_id"])
+    assert parent is not None
+
+    with client.stream("POST", "/api/query/stream", json={"query": f"streamed {uuid.uuid4()}"}) as r:
+        assert "event: final" in "".join(r.iter_text())
+    stream = [s for s in _spans() if s["name"] == "agent.stream"]
+    assert len(stream) == 1 and stream[0]["status"] == "unset"
+
+    body = client.get("/api/admin/traces", headers={"x-api-key": "secret"}).json()
+    assert body["tracing"]["exporters"] == ["memory"]
+    assert [t["root"] for t in body["traces"]] == ["POST /api/query/stream", "POST /api/query"]
+
+
+def test_head_sampling_follows_ratio_and_parent(tracing):
+    tracing.setenv("STUB_MODE", "true")
+    tracing.setenv("TRACING_SAMPLE_RATIO", "0")
+    from backend.src.app import create_app
+
+    client = TestClient(create_app())
+    client.post("/api/query", json={"query": f"unsampled {uuid.uuid4()}"})
+    assert _spans() == []
+
+    trace_id = uuid.uuid4().hex
+    client.post(
+        "/api/query",
+        json={"query": f"sampled upstream {uuid.uuid4()}"},
+        headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"},
+    )
+    assert _spans() and {s["trace_id"] for s in _spans()} == {trace_id}
+
+
+def test_db_statements_and_outgoing_headers_are_traced(tracing):
+    from sqlalchemy import create_engine, text
+
+    assert observability.configure_tracing()
+    engine = create_engine("sqlite://")
+    observability.trace_engine(engine)
+
+    with observability.span("parent") as parent:
+        headers = observability.inject_headers({"api-key": "k"})
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        with pytest.raises(Exception):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT * FROM missing_table"))
+
+    parent_id = format(parent.get_span_context().span_id, "016x")
+    assert headers["traceparent"].split("-")[2] == parent_id
+    db = [s for s in _spans() if s["attributes"].get("db.system") == "sqlite"]
+    assert [s["attributes"]["db.statement"] for s in db] == ["SELECT 1", "SELECT * FROM missing_table"]
+    assert all(s["parent_id"] == parent_id and s["kind"] == "client" for s in db)
+    assert db[1]["status"] == "error"
+
+
+def test_file_exporter_and_disabled_tracing(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setenv("TRACING_EXPORTER", "file")
+    monkeypatch.setenv("TRACING_FILE", str(path))
+    try:
+        assert observability.configure_tracing()
+        with observability.span("work", {"k": 1}):
+            pass
+        observability.flush_tracing()
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert lines[0]["name"] == "work" and lines[0]["attributes"] == {"k": 1}
+    finally:
+        observability.shutdown_tracing()
+
+    monkeypatch.delenv("TRACING_EXPORTER")
+    monkeypatch.delenv("APPINSIGHTS_CONNECTION_STRING", raising=False)
+    assert observability.configure_tracing() is False
+    with observability.span("ignored") as s:
+        assert s is None
+    assert observability.inject_headers({"a": "b"}) == {"a": "b"}
@@ -0,0 +1,43 @@
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import datetime
+
+import pytest
+from backend.src.services import telemetry_service, usage_retention
+
+UTC = datetime.timezone.utc
+
+
+def test_partitions_cover_current_and_future_months():
+    now = datetime.datetime(2026, 11, 20, tzinfo=UTC)
+    names = [usage_retention.partition_name(s) for s in usage_retention.partitions_to_create(now, ahead=2)]
+    assert names == ["usage_events_p202611", "usage_events_p202612", "usage_events_p202701"]
+    ddl = usage_retention.partition_ddl(datetime.datetime(2026, 12, 1, tzinfo=UTC))
+    assert "FROM ('2026-12-01T00:00:00+00:00') TO ('2027-01-01T00:00:00+00:00')" in ddl
+
+
+def test_only_fully_expired_partitions_are_dropped():
+    names = ["usage_events_p202606", "usage_events_p202607", "usage_events_p202608", "usage_events_default"]
+    cutoff = datetime.datetime(2026, 8, 1, tzinfo=UTC)
+    assert usage_retention.expired_partitions(names, cutoff) == ["usage_events_p202606", "usage_events_p202607"]
+
+
+@pytest.mark.asyncio
+async def test_in_memory_retention_and_clear(monkeypatch):
+    monkeypatch.setenv("USAGE_EVENTS_RETENTION_DAYS", "30")
+    now = datetime.datetime.now(UTC)
+    telemetry_service._USAGE_EVENTS.clear()
+    telemetry_service._store_in_memory({"event_type": "old", "event_time": now - datetime.timedelta(days=45)})
+    telemetry_service._store_in_memory({"event_type": "new", "event_time": now - datetime.timedelta(days=1)})
+
+    result = await usage_retention.run_maintenance(now)
+    assert result["backend"] == "memory" and result["purged"] == 1
+    assert [e["event_type"] for e in telemetry_service._USAGE_EVENTS] == ["new"]
+    assert usage_retention.maintenance_status()["last_run"]["purged"] == 1
+
+    await telemetry_service.clear_events()
+    assert telemetry_service._USAGE_EVENTS == []
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Latency/throughput benchmark for the backend API, runnable with no network.
+
+Starts a local fake agent (`fake_agent.FakeAgentServer`), points the REST agent
+backend at it, and drives the in-process app through httpx's ASGI transport at
+a set of concurrency levels. Reports p50/p95/p99 latency and requests/second
+per endpoint and writes the results as JSON so runs can be compared across
+commits.
+
+Example:
+
+    python tests/perf/bench.py --concurrency 1,10,50 --requests 500 --latency lognormal:40,0.4
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from tests.perf.fake_agent import FakeAgentServer  # noqa: E402
+
+SCENARIOS = ("query", "query_stream", "telemetry", "threads", "admin_sources")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": percentile(ordered, 50) * 1000.0,
+        "p95_ms": percentile(ordered, 95) * 1000.0,
+        "p99_ms": percentile(ordered, 99) * 1000.0,
+        "mean_ms": (sum(ordered) / len(ordered) * 1000.0) if ordered else 0.0,
+        "rps": (len(latencies) + errors) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def _git_sha() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+async def _one(client, scenario: str, i: int, repeat_queries: bool, admin_headers: Dict[str, str]):
+    """Issue one request; returns (latency_s, ttft_s or None, ok)."""
+    start = time.perf_counter()
+    ttft = None
+    if scenario == "query":
+        q = "How do I get started with Azure Managed Grafana?" if repeat_queries else f"bench question {i}"
+        r = await client.post("/api/query", json={"query": q})
+        ok = r.status_code == 200
+    elif scenario == "query_stream":
+        q = "How do I get started with Azure Managed Grafana?" if repeat_queries else f"bench stream question {i}"
+        async with client.stream("POST", "/api/query/stream", json={"query": q}) as r:
+            async for _ in r.aiter_bytes():
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+            ok = r.status_code == 200
+    elif scenario == "telemetry":
+        r = await client.post("/api/telemetry", json={"event": "bench", "pseudo_user_id": f"anon-{i % 50}", "payload": {"i": i}})
+        ok = r.status_code == 200
+    elif scenario == "threads":
+        r = await client.post("/api/threads", json={"pseudo_user_id": f"anon-{i}"})
+        ok = r.status_code == 200
+    elif scenario == "admin_sources":
+        r = await client.post(
+            "/api/admin/sources",
+            json={"url": f"https://learn.microsoft.com/azure/managed-grafana/bench-{i}", "title": "bench", "priority": i % 200},
+            headers=admin_headers,
+        )
+        ok = r.status_code in (200, 201)
+    else:
+        raise ValueError(scenario)
+    return time.perf_counter() - start, ttft, ok
+
+
+async def run_scenario(app, scenario: str, concurrency: int, total: int, repeat_queries: bool) -> Dict[str, Any]:
+    import httpx
+
+    admin_key = os.environ.get("ADMIN_API_KEY")
+    admin_headers = {"X-API-Key": admin_key} if admin_key else {}
+    latencies: List[float] = []
+    ttfts: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                try:
+                    latency, ttft, ok = await _one(client, scenario, i, repeat_queries, admin_headers)
+                except Exception:
+                    errors += 1
+                    continue
+                if not ok:
+                    errors += 1
+                    continue
+                latencies.append(latency)
+                if ttft is not None:
+                    ttfts.append(ttft)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    result = {"scenario": scenario, "concurrency": concurrency, **summarize(latencies, errors, elapsed)}
+    if ttfts:
+        ordered = sorted(ttfts)
+        result["ttft_p50_ms"] = percentile(ordered, 50) * 1000.0
+        result["ttft_p95_ms"] = percentile(ordered, 95) * 1000.0
+    return result
+
+
+async def run_benchmark(
+    scenarios=SCENARIOS,
+    concurrency_levels=(1, 10, 50),
+    requests_per_level: int = 200,
+    latency: str = "fixed:20",
+    error_rate: float = 0.0,
+    stream_chunks: int = 8,
+    cache: bool = False,
+    repeat_queries: bool = False,
+) -> Dict[str, Any]:
+    with FakeAgentServer(latency=latency, error_rate=error_rate, stream_chunks=stream_chunks) as agent:
+        # The app reads its configuration at startup, so set it before building it
+        os.environ.update(
+            {
+                "STUB_MODE": "false",
+                "AI_FOUNDRY_ENDPOINT": agent.url,
+                "AI_FOUNDRY_API_KEY": "bench",
+                "AGENT_BACKENDS": "rest",
+                "ANSWER_CACHE_ENABLED": "true" if cache else "false",
+            }
+        )
+        from backend.src.app import create_app
+
+        app = create_app()
+        results = []
+        async with app.router.lifespan_context(app):
+            for scenario in scenarios:
+                for concurrency in concurrency_levels:
+                    results.append(await run_scenario(app, scenario, concurrency, requests_per_level, repeat_queries))
+        agent_stats = {"requests": agent.requests, "injected_errors": agent.errors}
+
+    return {
+        "meta": {
+            "git_sha": _git_sha(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                "latency": latency,
+                "error_rate": error_rate,
+                "stream_chunks": stream_chunks,
+                "requests_per_level": requests_per_level,
+                "cache": cache,
+                "repeat_queries": repeat_queries,
+            },
+            "fake_agent": agent_stats,
+        },
+        "results": results,
+    }
+
+
+def write_results(report: Dict[str, Any], path: Optional[str] = None) -> str:
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = os.path.join(RESULTS_DIR, f"bench-{stamp}-{report['meta']['git_sha'] or 'nogit'}.json")
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    return path
+
+
+def _print_table(report: Dict[str, Any]) -> None:
+    print(f"{'scenario':<15}{'conc':>6}{'reqs':>7}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rps':>10}")
+    for r in report["results"]:
+        print(
+            f"{r['scenario']:<15}{r['concurrency']:>6}{r['requests']:>7}{r['errors']:>5}"
+            f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['rps']:>10.1f}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and level")
+    parser.add_argument("--latency", default="fixed:20", help="fake agent latency spec (fixed/uniform/lognormal)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    parser.add_argument("--cache", action="store_true", help="leave the answer cache enabled")
+    parser.add_argument("--repeat-queries", action="store_true", help="send the same question every time")
+    parser.add_argument("--output", default=None, help="JSON output path (default tests/perf/results/)")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(
+        run_benchmark(
+            scenarios=[s for s in args.scenarios.split(",") if s],
+            concurrency_levels=[int(c) for c in args.concurrency.split(",") if c],
+            requests_per_level=args.requests,
+            latency=args.latency,
+            error_rate=args.error_rate,
+            stream_chunks=args.stream_chunks,
+            cache=args.cache,
+            repeat_queries=args.repeat_queries,
+        )
+    )
+    _print_table(report)
+    print(f"results written to {write_results(report, args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Local stand-in for the Foundry/REST agent endpoint used by the benchmarks.
+
+Serves `POST /` on 127.0.0.1 with a configurable latency distribution, optional
+SSE streaming (when the request body has `"stream": true`) and error injection,
+so `/api/query` can be exercised end-to-end without network access.
+
+Latency specs:
+- "fixed:20"            -> always 20 ms
+- "uniform:10,50"       -> uniform between 10 and 50 ms
+- "lognormal:30,0.5"    -> lognormal with median 30 ms and sigma 0.5
+"""
+
+import asyncio
+import json
+import math
+import random
+import socket
+import threading
+import time
+from typing import Callable, Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Return a sampler yielding a delay in seconds for a latency spec."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000.0
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000.0
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class FakeAgentServer:
+    def __init__(
+        self,
+        latency: str = "fixed:20",
+        error_rate: float = 0.0,
+        stream_chunks: int = 8,
+        answer: str = "Azure Managed Grafana is a fully managed Grafana service on Azure [1].",
+        seed: int = 7,
+    ):
+        self.sample = parse_latency(latency)
+        self.error_rate = error_rate
+        self.stream_chunks = max(1, stream_chunks)
+        self.answer = answer
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.port: Optional[int] = None
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/"
+
+    async def _handle(self, request: Request):
+        self.requests += 1
+        body = await request.json()
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            await asyncio.sleep(self.sample(self.rng))
+            return JSONResponse({"error": "injected failure"}, status_code=500)
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.sample(self.rng))
+            return JSONResponse({"choices": [{"message": {"content": self.answer}}]})
+
+        words = self.answer.split(" ")
+        per_chunk = max(1, math.ceil(len(words) / self.stream_chunks))
+        total_delay = self.sample(self.rng)
+
+        async def frames():
+            for i in range(0, len(words), per_chunk):
+                await asyncio.sleep(total_delay / self.stream_chunks)
+                text = " ".join(words[i:i + per_chunk]) + (" " if i + per_chunk < len(words) else "")
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': text}}]})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(frames(), media_type="text/event-stream")
+
+    def start(self) -> "FakeAgentServer":
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        app = Starlette(routes=[Route("/", self._handle, methods=["POST"])])
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name="fake-agent", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("fake agent server did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "FakeAgentServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
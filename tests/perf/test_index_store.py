@@ -0,0 +1,69 @@
+"""Worker startup cost and private memory when serving a memory-mapped docs index.
+
+Not part of the default `pytest` run; run with `pytest tests/perf`. Each
+corpus size is opened in a fresh interpreter, standing in for a new uvicorn
+worker. The test reports how long opening takes and how much anonymous
+(non-shared) memory grows after opening and running a query.
+"""
+
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import json
+import subprocess
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend.src.services.index_store import IndexStore
+
+_WORKER = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+from backend.src.services.docs_index import DocsIndex
+from backend.src.services.index_store import IndexStore
+
+def rss_anon_kb():
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1])
+
+before = rss_anon_kb()
+start = time.perf_counter()
+index = DocsIndex.from_store(IndexStore(sys.argv[2]).load())
+open_ms = (time.perf_counter() - start) * 1000.0
+hits = index.search("term12 term7 term301", k=3)
+print(json.dumps({"open_ms": open_ms, "rss_anon_kb": rss_anon_kb() - before, "hits": len(hits)}))
+"""
+
+
+def _publish(directory, n, dim=256):
+    rng = np.random.default_rng(n)
+    columns = rng.standard_normal((dim, n), dtype=np.float32)
+    columns /= np.linalg.norm(columns, axis=0, keepdims=True)
+    passages = [{"url": f"https://docs/{i}", "anchor": None, "title": f"Page {i}", "text": f"term{i % 500} body"} for i in range(n)]
+    store = IndexStore(str(directory))
+    store.publish(passages, columns, np.ones(dim, dtype=np.float32), np.ones(n, dtype=np.float32), {})
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="needs /proc for RssAnon")
+def test_worker_startup_and_rss_stay_flat(tmp_path):
+    results = {}
+    for n in (5000, 80000):
+        _publish(tmp_path / str(n), n)
+        out = subprocess.run(
+            [sys.executable, "-c", _WORKER, REPO_ROOT, str(tmp_path / str(n))],
+            capture_output=True, text=True, check=True,
+        )
+        results[n] = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{n} passages: open={results[n]['open_ms']:.2f} ms rss_anon_growth={results[n]['rss_anon_kb']} KiB")
+
+    assert results[80000]["hits"] == 3
+    # 16x the corpus (~80 MB of vectors) must not mean 16x the startup or private memory
+    assert results[80000]["open_ms"] < 50.0
+    assert results[80000]["rss_anon_kb"] - results[5000]["rss_anon_kb"] < 8 * 1024
@@ -0,0 +1,36 @@
+"""Small, network-free latency smoke test (T021).
+
+Not part of the default `pytest` run (see pytest.ini `testpaths`); run with:
+
+    pytest tests/perf
+"""
+
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import json
+import pytest
+from tests.perf.bench import SCENARIOS, run_benchmark, write_results
+
+
+@pytest.mark.asyncio
+async def test_latency_smoke(tmp_path, monkeypatch):
+    # run_benchmark points the app at the fake agent via env vars; restore them afterwards
+    for name in ("STUB_MODE", "AI_FOUNDRY_ENDPOINT", "AI_FOUNDRY_API_KEY", "AGENT_BACKENDS", "ANSWER_CACHE_ENABLED"):
+        monkeypatch.setenv(name, os.environ.get(name, ""))
+
+    report = await run_benchmark(concurrency_levels=(1, 10), requests_per_level=20, latency="uniform:5,15")
+
+    assert {r["scenario"] for r in report["results"]} == set(SCENARIOS)
+    for r in report["results"]:
+        assert r["errors"] == 0, r
+        assert r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"]
+        assert r["rps"] > 0
+    assert report["meta"]["fake_agent"]["requests"] >= 40
+
+    path = write_results(report, str(tmp_path / "bench.json"))
+    with open(path, encoding="utf-8") as fh:
+        assert json.load(fh)["results"]
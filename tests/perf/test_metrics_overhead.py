@@ -0,0 +1,32 @@
+"""Per-observation cost of the hot-path metrics.
+
+Not part of the default `pytest` run; run with `pytest tests/perf`.
+"""
+
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import time
+
+from backend.src import metrics
+
+
+def test_histogram_observe_overhead():
+    registry = metrics.Registry()
+    h = registry.register(metrics.Histogram("bench_seconds", "Bench", ("method", "route", "status")))
+    routes = [f"/api/r{i}" for i in range(20)]
+    n = 200_000
+    start = time.perf_counter()
+    for i in range(n):
+        h.observe(0.003 * (i % 50), "GET", routes[i % 20], "200")
+    per_call_us = (time.perf_counter() - start) / n * 1e6
+
+    start = time.perf_counter()
+    text = metrics.render([registry.snapshot()])
+    render_ms = (time.perf_counter() - start) * 1000.0
+    print(f"observe: {per_call_us:.3f} us/call; render of 20 series: {render_ms:.2f} ms ({len(text)} bytes)")
+    # Generous bound for shared CI machines
+    assert per_call_us < 5.0
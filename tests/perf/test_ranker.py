@@ -0,0 +1,37 @@
+"""Passage ranking latency for tens of thousands of passages.
+
+Not part of the default `pytest` run; run with `pytest tests/perf`.
+"""
+
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from backend.src.services.passage_ranker import HashedTfidfRanker
+
+
+def test_vector_ranking_latency_20k_passages():
+    rng = np.random.default_rng(1)
+    vocab = [f"term{i}" for i in range(5000)]
+    docs = [list(rng.choice(vocab, size=80)) for _ in range(20000)]
+    ranker = HashedTfidfRanker(docs)
+
+    queries = [list(rng.choice(vocab, size=6)) for _ in range(200)]
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        ranker.top_k(q, 3)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    p50_ms = timings[len(timings) // 2] * 1000.0
+    print(f"vector top-3 over 20k passages: p50={p50_ms:.3f} ms p95={timings[int(len(timings) * 0.95)] * 1000.0:.3f} ms")
+    # The requested bound: sub-millisecond top-k over tens of thousands of passages
+    assert p50_ms < 1.0
@@ -0,0 +1,61 @@
+"""Cold-worker startup cost: imports, lifespan startup, and the first request.
+
+Each measurement runs in a fresh interpreter, so nothing is already imported
+or warmed. Not part of the default `pytest` run; run with `pytest tests/perf`.
+"""
+
+import os
+import sys
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import json
+import statistics
+import subprocess
+
+COLD_START = r"""
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from backend.src.app import create_app
+from fastapi.testclient import TestClient
+imported = time.perf_counter()
+app = create_app()
+with TestClient(app) as client:
+    started = time.perf_counter()
+    r = client.post("/api/query", json={"query": "cold start question"})
+    first = time.perf_counter()
+    assert r.status_code == 200, r.text
+    r = client.post("/api/query", json={"query": "second question"})
+    second = time.perf_counter()
+    ready = client.get("/api/ready").json()
+print(json.dumps({
+    "import_ms": (imported - t0) * 1000,
+    "startup_ms": ready["startup_ms"],
+    "lifespan_ms": (started - imported) * 1000,
+    "first_request_ms": (first - started) * 1000,
+    "warm_request_ms": (second - first) * 1000,
+    "to_first_response_ms": (first - t0) * 1000,
+    "steps": {k: v["ms"] for k, v in ready["steps"].items()},
+}))
+"""
+
+
+def _cold_start() -> dict:
+    env = dict(os.environ, STUB_MODE="true", DOCS_INDEX_ON_STARTUP="false")
+    env.pop("DATABASE_URL", None)
+    out = subprocess.run(
+        [sys.executable, "-c", COLD_START, REPO_ROOT], env=env, capture_output=True, text=True, timeout=120, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_cold_worker_time_to_first_response():
+    runs = [_cold_start() for _ in range(3)]
+    summary = {k: statistics.median(r[k] for r in runs) for k in runs[0] if k != "steps"}
+    print("cold start (median of 3):", json.dumps({k: round(v, 1) for k, v in summary.items()}))
+    print("startup steps (last run, ms):", json.dumps(runs[-1]["steps"]))
+    # Generous bounds for shared CI machines; the point is the breakdown above
+    assert summary["to_first_response_ms"] < 15000
+    assert summary["first_request_ms"] < 2000